@@ -0,0 +1,631 @@
+"""Local stand-in for the Business Central endpoints the tap calls.
+
+:class:`FakeBusinessCentral` serves synthetic data shaped by the tap's own
+stream schemas, so every stream of ``STREAM_TYPES`` can be synced against it
+with ``api_host`` pointing at the server:
+
+* the environment lists (``/environments/v1.1`` and the admin API);
+* ``companies`` and every ``companies({id})/<entity>`` path of the API v2.0,
+  analytics and reportsFinance APIs, with ``Prefer: odata.maxpagesize``
+  paging through ``@odata.nextLink`` (``aid`` + ``$skiptoken``), ``$top``,
+  ``$skip``, ``$filter``, ``$select``, ``$expand``, ``$count`` and
+  ``/$count``, navigation paths such as
+  ``generalLedgerEntries({id})/dimensionSetLines``, and JSON ``$batch``;
+* OData V4 ``$metadata`` and ``Company('<name>')/<entity set>``
+  (``VendorLedgerEntries``, ``G_LEntries``).
+
+Rows are generated deterministically from the row index, so repeated
+requests (and id lookups) see the same data. ``latency`` and ``jitter`` add
+a per-request delay, and :attr:`FakeBusinessCentral.stats` counts requests
+and response bytes. :meth:`FakeBusinessCentral.handle` is transport
+independent; :class:`FakeBCServer` serves it over HTTP.
+
+    python __benchmarks__/fake_bc.py --port 8080 --companies 2 --rows 5000
+"""
+
+import argparse
+import datetime
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+from tap_dynamics_bc.tap import STREAM_TYPES
+
+ENVIRONMENT = "Production"
+TENANT = "00000000-0000-0000-0000-0000000000aa"
+MAX_PAGE_SIZE = 20000
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+SPAN = datetime.timedelta(days=365)
+# Rows of child collections (document lines, dimension set lines) per parent.
+LINES_PER_RECORD = 2
+# Entities with a fixed size, whatever the configured row count.
+FIXED_ROWS = {"companyInformation": 1}
+# OData entity sets without a tap stream schema.
+ODATA_SCHEMAS = {
+    "G_LEntries": {
+        "properties": {
+            "Entry_No": {"type": ["integer", "null"]},
+            "Dimension_Set_ID": {"type": ["integer", "null"]},
+            "Posting_Date": {"type": ["string", "null"], "format": "date"},
+        }
+    },
+}
+_SCALARS = ("string", "integer", "number", "boolean")
+_NAMESPACE = uuid.UUID("5d0c2f4e-4a4c-4bd2-9a5e-2f4f2c8b7a10")
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+# -- $filter -----------------------------------------------------------------
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:(?P<open>\()|(?P<close>\))|'(?P<string>(?:[^']|'')*)'"
+    r"|(?P<word>[^\s()']+))"
+)
+_NUMBER_RE = re.compile(r"^-?\d+(\.\d+)?$")
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+
+
+class FilterError(ValueError):
+    """Raised for ``$filter`` expressions the stand-in cannot evaluate."""
+
+
+def _tokens(text: str) -> List[Tuple[str, Any]]:
+    tokens, position = [], 0
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match or match.end() == position:
+            if text[position:].strip():
+                raise FilterError(f"Cannot parse $filter near {text[position:]!r}")
+            break
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "string":
+            tokens.append(("literal", match.group("string").replace("''", "'")))
+        elif kind == "word":
+            tokens.append(("word", match.group("word")))
+        else:
+            tokens.append((kind, None))
+    return tokens
+
+
+def _literal(token: Tuple[str, Any]) -> Any:
+    kind, value = token
+    if kind == "literal":
+        return value
+    if value in ("true", "false"):
+        return value == "true"
+    if value == "null":
+        return None
+    if _NUMBER_RE.match(value):
+        return float(value) if "." in value else int(value)
+    # Dates, timestamps and GUIDs are compared as text.
+    return value
+
+
+def _compare(operator: str, left: Any, right: Any) -> bool:
+    if left is None or right is None:
+        return _OPERATORS[operator](left, right) if operator in ("eq", "ne") else False
+    if isinstance(left, str) != isinstance(right, str):
+        left, right = str(left), str(right)
+    return _OPERATORS[operator](left, right)
+
+
+class _FilterParser:
+    """Recursive-descent parser of ``field op value`` clauses joined by and/or."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens = _tokens(text)
+        self.position = 0
+
+    def peek(self) -> Optional[Tuple[str, Any]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, Any]:
+        if self.position >= len(self.tokens):
+            raise FilterError(f"Unexpected end of $filter {self.text!r}")
+        self.position += 1
+        return self.tokens[self.position - 1]
+
+    def parse(self) -> Callable[[dict], bool]:
+        predicate = self.disjunction()
+        if self.position != len(self.tokens):
+            raise FilterError(f"Unexpected token in $filter {self.text!r}")
+        return predicate
+
+    def disjunction(self) -> Callable[[dict], bool]:
+        parts = [self.conjunction()]
+        while self.peek() == ("word", "or"):
+            self.take()
+            parts.append(self.conjunction())
+        return parts[0] if len(parts) == 1 else lambda row: any(part(row) for part in parts)
+
+    def conjunction(self) -> Callable[[dict], bool]:
+        parts = [self.primary()]
+        while self.peek() == ("word", "and"):
+            self.take()
+            parts.append(self.primary())
+        return parts[0] if len(parts) == 1 else lambda row: all(part(row) for part in parts)
+
+    def primary(self) -> Callable[[dict], bool]:
+        token = self.take()
+        if token[0] == "open":
+            inner = self.disjunction()
+            if self.take()[0] != "close":
+                raise FilterError(f"Unbalanced parentheses in $filter {self.text!r}")
+            return inner
+        field = token[1]
+        operator_token = self.take()
+        if operator_token[0] != "word" or operator_token[1] not in _OPERATORS:
+            raise FilterError(f"Unsupported operator in $filter {self.text!r}")
+        operator = operator_token[1]
+        value = _literal(self.take())
+        return lambda row: _compare(operator, row.get(field), value)
+
+
+def parse_filter(text: str) -> Callable[[dict], bool]:
+    """Return a predicate for ``field op value`` clauses joined by and/or."""
+    return _FilterParser(text).parse()
+
+
+# -- synthetic rows ------------------------------------------------------------
+
+
+def _types(property_schema: dict) -> List[str]:
+    types = property_schema.get("type", ["string"])
+    return [types] if isinstance(types, str) else [t for t in types if t != "null"]
+
+
+def is_navigation(property_schema: dict) -> bool:
+    """Return whether a property is only returned when ``$expand``-ed."""
+    return not any(t in _SCALARS for t in _types(property_schema))
+
+
+class Dataset:
+    """Deterministic synthetic rows for each entity and company."""
+
+    def __init__(self, companies: int = 2, rows: int = 1000, seed: int = 0) -> None:
+        self.company_count = companies
+        self.rows = rows
+        self.seed = seed
+        self.schemas: Dict[str, dict] = dict(ODATA_SCHEMAS)
+        for stream_type in STREAM_TYPES:
+            entity = stream_type.path.rstrip("/").split("/")[-1]
+            self.schemas.setdefault(entity, stream_type.schema)
+        self.companies = [
+            {
+                "id": str(uuid.uuid5(_NAMESPACE, f"company/{seed}/{index}")),
+                "systemVersion": "24.0.0.0",
+                "name": f"CRONUS {index}",
+                "displayName": f"CRONUS {index}",
+                "businessProfileId": "",
+                "systemCreatedAt": START.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "systemCreatedBy": str(uuid.UUID(int=0)),
+                "systemModifiedAt": START.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "systemModifiedBy": str(uuid.UUID(int=0)),
+            }
+            for index in range(companies)
+        ]
+        self._rows: Dict[Tuple[str, int], List[dict]] = {}
+        self._by_id: Dict[Tuple[str, int], Dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def company_index(self, key: str, by: str = "id") -> Optional[int]:
+        for index, company in enumerate(self.companies):
+            if company[by] == key:
+                return index
+        return None
+
+    def row_count(self, entity: str) -> int:
+        return FIXED_ROWS.get(entity, self.rows)
+
+    def _moment(self, entity: str, index: int) -> datetime.datetime:
+        return START + SPAN * (index / max(1, self.row_count(entity)))
+
+    def _string(self, entity: str, name: str, property_schema: dict, index: int, key: str) -> str:
+        lowered = name.lower()
+        if property_schema.get("format") == "date-time":
+            return self._moment(entity, index).strftime("%Y-%m-%dT%H:%M:%SZ")
+        if property_schema.get("format") == "date":
+            return self._moment(entity, index).strftime("%Y-%m-%d")
+        if lowered in ("documentnumber", "document_no"):
+            return f"DOC{index:07d}"
+        if lowered.endswith("id"):
+            return str(uuid.uuid5(_NAMESPACE, f"{key}/{name}/{index}"))
+        if lowered in ("number", "no") or lowered.endswith(("number", "_no")):
+            return str(10000 + index)
+        return f"{name} {index % 97}"
+
+    def _integer(self, name: str, index: int) -> int:
+        lowered = name.lower()
+        if lowered.endswith(("no", "number")):
+            return index + 1
+        if "dimension_set" in lowered or "dimensionset" in lowered:
+            return index % 50
+        return index % 100
+
+    def value(self, entity: str, name: str, property_schema: dict, index: int, key: str) -> Any:
+        types = _types(property_schema)
+        if "string" in types:
+            return self._string(entity, name, property_schema, index, key)
+        if "integer" in types:
+            return self._integer(name, index)
+        if "number" in types:
+            return round((index % 1000) * 1.25, 2)
+        if "boolean" in types:
+            return index % 2 == 0
+        if "object" in types:
+            return self.record(entity, property_schema, index, f"{key}/{name}")
+        if "array" in types:
+            items = property_schema.get("items", {})
+            if "object" not in _types(items):
+                return []
+            return [
+                self.record(entity, items, index * LINES_PER_RECORD + line, f"{key}/{name}")
+                for line in range(LINES_PER_RECORD)
+            ]
+        return None
+
+    def record(self, entity: str, schema: dict, index: int, key: str) -> dict:
+        row = {}
+        for name, property_schema in schema.get("properties", {}).items():
+            if name in ("company_id", "company_name") or name.startswith("@odata"):
+                continue
+            row[name] = self.value(entity, name, property_schema, index, key)
+        return row
+
+    def rows_of(self, entity: str, company: int) -> List[dict]:
+        """Return every row of ``entity`` for the company at index ``company``."""
+        with self._lock:
+            rows = self._rows.get((entity, company))
+            if rows is None:
+                schema = self.schemas[entity]
+                key = f"{self.seed}/{company}/{entity}"
+                rows = [
+                    self.record(entity, schema, index, key)
+                    for index in range(self.row_count(entity))
+                ]
+                self._rows[(entity, company)] = rows
+                self._by_id[(entity, company)] = {row.get("id"): row for row in rows}
+            return rows
+
+    def lines_of(self, entity: str, company: int, parent_key: str, navigation: str) -> List[dict]:
+        """Return the ``navigation`` collection of the ``entity`` row with id ``parent_key``."""
+        self.rows_of(entity, company)
+        row = self._by_id[(entity, company)][parent_key]
+        return [dict(line, parentId=parent_key) for line in row.get(navigation) or []]
+
+
+# -- request handling ------------------------------------------------------------
+
+_ENVIRONMENTS_RE = re.compile(
+    r"^/(environments/v1\.1|admin/v2\.0/applications/BusinessCentral/environments)$"
+)
+_API_RE = re.compile(r"^/v2\.0/(?P<env>[^/]+)/api/(?P<api>.+?)/companies(?P<rest>/.*|\(.*)?$")
+_COMPANY_PATH_RE = re.compile(
+    r"^\((?P<company>[^)]+)\)/(?P<entity>\w+)"
+    r"(?:\((?P<key>[^)]+)\)/(?P<navigation>\w+))?(?P<count>/\$count)?$"
+)
+_ODATA_RE = re.compile(r"^/v2\.0/(?P<tenant>[^/]+)/(?P<env>[^/]+)/ODataV4(?P<rest>/.*)$")
+_ODATA_ENTITY_RE = re.compile(
+    r"^/Company\('(?P<company>(?:[^']|'')*)'\)/(?P<entity>\w+)(?P<count>/\$count)?$"
+)
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    body = json.dumps(payload).encode("utf-8")
+    return status, {"Content-Type": "application/json; odata.metadata=minimal"}, body
+
+
+def error_response(status: int, code: str, message: str) -> Response:
+    return json_response({"error": {"code": code, "message": message}}, status)
+
+
+def requested_page_size(headers: Dict[str, str]) -> int:
+    match = re.search(r"odata\.maxpagesize=(\d+)", headers.get("Prefer", ""))
+    return min(int(match.group(1)), MAX_PAGE_SIZE) if match else MAX_PAGE_SIZE
+
+
+def _edm_type(property_schema: dict) -> str:
+    types = _types(property_schema)
+    if property_schema.get("format") == "date":
+        return "Edm.Date"
+    if property_schema.get("format") == "date-time":
+        return "Edm.DateTimeOffset"
+    if "integer" in types:
+        return "Edm.Int32"
+    if "number" in types:
+        return "Edm.Decimal"
+    if "boolean" in types:
+        return "Edm.Boolean"
+    return "Edm.String"
+
+
+class FakeBusinessCentral:
+    """Request handler of the stand-in API, independent of the transport."""
+
+    odata_entities = ("VendorLedgerEntries", "G_LEntries")
+
+    def __init__(
+        self,
+        dataset: Optional[Dataset] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+    ) -> None:
+        self.dataset = dataset or Dataset()
+        self.latency = latency
+        self.jitter = jitter
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self.stats.clear()
+
+    def delay(self) -> float:
+        return self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def handle(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+    ) -> Response:
+        """Return ``(status, headers, body)`` for a request to the stand-in."""
+        headers = headers or {}
+        parts = urlsplit(url)
+        path = unquote(parts.path)
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        try:
+            if method == "POST" and path.endswith("/$batch"):
+                response = self._batch(parts, path[: -len("/$batch")], body)
+            else:
+                response = self._get(parts, path, query, headers)
+        except FilterError as error:
+            response = error_response(400, "BadRequest", str(error))
+        except KeyError as error:
+            response = error_response(404, "BadRequest_NotFound", f"Not found: {error}")
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += len(response[2])
+            self.stats[f"status_{response[0]}"] += 1
+        return response
+
+    def _get(self, parts, path: str, query: Dict[str, str], headers: Dict[str, str]) -> Response:
+        if _ENVIRONMENTS_RE.match(path):
+            return json_response(
+                {"value": [{"name": ENVIRONMENT, "aadTenantId": TENANT, "type": "Production"}]}
+            )
+        match = _API_RE.match(path)
+        if match:
+            rest = match.group("rest") or ""
+            if not rest:
+                return self._collection(parts, self.dataset.companies, query, headers)
+            return self._company_path(parts, rest, query, headers)
+        match = _ODATA_RE.match(path)
+        if match:
+            return self._odata(parts, match.group("rest"), query, headers)
+        return error_response(404, "BadRequest_NotFound", f"No route for {path}")
+
+    def _company_path(self, parts, rest: str, query, headers) -> Response:
+        match = _COMPANY_PATH_RE.match(rest)
+        if not match:
+            return error_response(404, "BadRequest_NotFound", f"No route for {rest}")
+        company = self.dataset.company_index(match.group("company"))
+        entity = match.group("entity")
+        if company is None or entity not in self.dataset.schemas:
+            return error_response(404, "BadRequest_NotFound", f"Unknown {entity}")
+        if match.group("navigation"):
+            rows = self.dataset.lines_of(
+                entity, company, match.group("key"), match.group("navigation")
+            )
+        else:
+            rows = self.dataset.rows_of(entity, company)
+        return self._collection(
+            parts, rows, query, headers, entity, count_only=bool(match.group("count"))
+        )
+
+    def _odata(self, parts, rest: str, query, headers) -> Response:
+        if rest == "/$metadata":
+            return 200, {"Content-Type": "application/xml"}, self.metadata().encode("utf-8")
+        match = _ODATA_ENTITY_RE.match(rest)
+        if not match or match.group("entity") not in self.odata_entities:
+            return error_response(404, "BadRequest_NotFound", f"No route for {rest}")
+        company = self.dataset.company_index(match.group("company").replace("''", "'"), by="name")
+        if company is None:
+            return error_response(404, "BadRequest_NotFound", "Unknown company")
+        entity = match.group("entity")
+        rows = self.dataset.rows_of(entity, company)
+        return self._collection(
+            parts, rows, query, headers, entity, count_only=bool(match.group("count"))
+        )
+
+    def _collection(
+        self,
+        parts,
+        rows: List[dict],
+        query: Dict[str, str],
+        headers: Dict[str, str],
+        entity: Optional[str] = None,
+        count_only: bool = False,
+    ) -> Response:
+        if query.get("$filter"):
+            predicate = parse_filter(query["$filter"])
+            rows = [row for row in rows if predicate(row)]
+        if count_only:
+            return 200, {"Content-Type": "text/plain"}, str(len(rows)).encode("utf-8")
+        total = len(rows)
+        offset = int(query.get("$skiptoken") or 0) + int(query.get("$skip") or 0)
+        if "$top" in query:
+            page, next_offset = rows[offset: offset + int(query["$top"])], None
+        else:
+            size = requested_page_size(headers)
+            page = rows[offset: offset + size]
+            next_offset = offset + size if offset + size < total else None
+        page = [self._shape(row, entity, query) for row in page]
+        payload: Dict[str, Any] = {
+            "@odata.context": f"{parts.scheme}://{parts.netloc}/$metadata#{entity or 'companies'}",
+            "value": page,
+        }
+        if query.get("$count") == "true":
+            payload["@odata.count"] = total
+        if next_offset is not None:
+            next_query = {
+                k: v for k, v in query.items() if k not in ("$skiptoken", "aid", "$skip")
+            }
+            next_query.update({"aid": "FINANCIALS", "$skiptoken": str(next_offset)})
+            payload["@odata.nextLink"] = (
+                f"{parts.scheme}://{parts.netloc}{parts.path}"
+                f"?{urlencode(next_query)}"
+            )
+        return json_response(payload)
+
+    def _shape(self, row: dict, entity: Optional[str], query: Dict[str, str]) -> dict:
+        schema = self.dataset.schemas.get(entity or "", {}).get("properties", {})
+        expand = query.get("$expand", "")
+        shaped = {
+            name: value for name, value in row.items()
+            if name not in schema or not is_navigation(schema[name]) or name in expand
+        }
+        if query.get("$select"):
+            selected = set(query["$select"].split(","))
+            shaped = {
+                name: value for name, value in shaped.items()
+                if name in selected or name in expand
+            }
+        shaped["@odata.etag"] = 'W/"JzE5OzEyMzQ1Njc4OTAxMjM0NTY3ODkwMTsn"'
+        return shaped
+
+    def _batch(self, parts, service_root: str, body: Optional[bytes]) -> Response:
+        requests_ = json.loads(body or b"{}").get("requests", [])
+        responses = []
+        for item in requests_:
+            url = item["url"]
+            if not url.startswith(("http://", "https://")):
+                url = f"{parts.scheme}://{parts.netloc}{service_root}/{url.lstrip('/')}"
+            status, _, sub_body = self.handle("GET", url, item.get("headers") or {})
+            responses.append({"id": item["id"], "status": status, "body": json.loads(sub_body)})
+        return json_response({"responses": responses})
+
+    def metadata(self) -> str:
+        """Return an EDMX document declaring the OData entity sets."""
+        types, sets = [], []
+        for entity in self.odata_entities:
+            properties = "".join(
+                f'<Property Name="{name}" Type="{_edm_type(property_schema)}"/>'
+                for name, property_schema in self.dataset.schemas[entity]["properties"].items()
+                if name not in ("company_id", "company_name")
+            )
+            types.append(f'<EntityType Name="{entity}">{properties}</EntityType>')
+            sets.append(f'<EntitySet Name="{entity}" EntityType="NAV.{entity}"/>')
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<edmx:Edmx Version="4.0" xmlns:edmx="http://docs.oasis-open.org/odata/ns/edmx">'
+            '<edmx:DataServices>'
+            '<Schema Namespace="NAV" xmlns="http://docs.oasis-open.org/odata/ns/edm">'
+            f'{"".join(types)}'
+            f'<EntityContainer Name="NAV">{"".join(sets)}</EntityContainer>'
+            '</Schema></edmx:DataServices></edmx:Edmx>'
+        )
+
+
+# -- HTTP server ------------------------------------------------------------------
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    api: FakeBusinessCentral
+
+    def _serve(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        time.sleep(self.api.delay())
+        url = f"http://{self.headers.get('Host', 'localhost')}{self.path}"
+        status, headers, payload = self.api.handle(
+            self.command, url, dict(self.headers.items()), body
+        )
+        try:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting, e.g. on a read timeout.
+            self.close_connection = True
+
+    do_GET = _serve
+    do_POST = _serve
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FakeBCServer:
+    """Serve a :class:`FakeBusinessCentral` over HTTP on a background thread."""
+
+    def __init__(self, api: FakeBusinessCentral, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.api = api
+        handler = type("Handler", (_Handler,), {"api": api})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeBCServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeBCServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--companies", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=1000, help="rows per entity and company")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds")
+    args = parser.parse_args()
+    api = FakeBusinessCentral(Dataset(args.companies, args.rows), args.latency, args.jitter)
+    server = FakeBCServer(api, args.host, args.port).start()
+    print(f"Serving a fake Business Central at {server.url} (api_host); Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Sync throughput on the tap's unhappy paths, with faults injected.
+
+Runs each scenario's stream against :mod:`fake_bc` behind a
+:class:`fault_injection.FaultInjector` (in a tap subprocess, as
+``throughput_benchmark.py`` does), next to a fault-free run of the same
+stream, and reports per scenario:
+
+* goodput: records/sec delivered, and as a share of the fault-free run;
+* wasted requests: responses the tap could not use (injected errors and
+  timed-out responses), and the extra requests sent compared to the
+  fault-free run (e.g. the id and batch requests of a dimension fallback);
+* time to recover: the longest time from an endpoint's first injected fault
+  to its next successful response.
+
+    python __benchmarks__/fault_benchmark.py
+    python __benchmarks__/fault_benchmark.py --scenarios read_timeout --rows 5000
+    python __benchmarks__/fault_benchmark.py --faults faults.json --stream vendors
+
+``--faults`` runs one custom scenario from a JSON list of faults (see
+:mod:`fault_injection`), inline or as a file path.
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from fake_bc import Dataset, FakeBCServer, FakeBusinessCentral
+from fault_injection import Fault, FaultInjector, Latency, load_faults
+from throughput_benchmark import run_stream, tap_config
+
+from tap_dynamics_bc.tap import TapdynamicsBc
+
+# Each scenario exercises one recovery path of the tap.
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    # _request pauses the environment for Retry-After and retries.
+    "throttle_burst": {
+        "stream": "vendors",
+        "faults": [{"kind": "throttle", "path": "vendors$", "count": 3, "retry_after": 1}],
+    },
+    # 429 without Retry-After: the scheduler's default pause.
+    "throttle_no_retry_after": {
+        "stream": "vendors",
+        "faults": [{"kind": "throttle", "path": "vendors$", "count": 1}],
+    },
+    # "Please try again later." 400s go through the SDK backoff.
+    "try_again_later": {
+        "stream": "vendors",
+        "faults": [{"kind": "busy", "path": "vendors$", "count": 2}],
+    },
+    "service_unavailable": {
+        "stream": "vendors",
+        "faults": [{"kind": "unavailable", "path": "vendors$", "count": 2}],
+    },
+    # make_request_with_adaptive_page_size halves the page until it fits.
+    "read_timeout": {
+        "stream": "sales_invoices",
+        "config": {"request_timeout": 1},
+        "faults": [
+            {"kind": "timeout", "path": "salesInvoices$", "page_size_above": 250, "delay": 1.5}
+        ],
+    },
+    # _handle_dimension_failure: ids first, then batches with dimensions.
+    "dimension_expansion_invoices": {
+        "stream": "sales_invoices",
+        "faults": [
+            {
+                "kind": "dimension",
+                "path": "salesInvoices$",
+                "query": "dimensionSetLines",
+                "exclude_query": "id eq",
+            }
+        ],
+    },
+    "dimension_expansion_gl_entries": {
+        "stream": "general_ledger_entries",
+        "faults": [
+            {
+                "kind": "dimension",
+                "path": "generalLedgerEntries$",
+                "query": "dimensionSetLines",
+                "exclude_query": "id eq",
+            }
+        ],
+    },
+    # No errors, but a heavy-tailed latency on every request.
+    "heavy_tail_latency": {
+        "stream": "vendors",
+        "latency": "pareto:0.01,1.5",
+        "faults": [],
+    },
+}
+
+
+def run_scenario(
+    api: FakeBusinessCentral,
+    stream: str,
+    faults: List[Fault],
+    latency: Optional[str],
+    config: Dict[str, Any],
+    catalog: dict,
+    seed: int,
+) -> Dict[str, Any]:
+    injector = FaultInjector(
+        api, faults, Latency.parse(latency, seed) if latency else None, seed
+    )
+    with FakeBCServer(injector) as server, tempfile.TemporaryDirectory() as workdir:
+        config_path = os.path.join(workdir, "config.json")
+        with open(config_path, "w") as config_file:
+            json.dump(tap_config(server.url, config), config_file)
+        result = run_stream(injector, workdir, config_path, catalog, stream)
+    recoveries = [
+        seconds for endpoint_recoveries in injector.recoveries.values()
+        for seconds in endpoint_recoveries
+    ]
+    result.update(
+        injected=injector.stats["injected"],
+        wasted_requests=injector.wasted_requests(),
+        recover_seconds=max(recoveries) if recoveries else None,
+        recoveries={
+            endpoint: [round(seconds, 3) for seconds in endpoint_recoveries]
+            for endpoint, endpoint_recoveries in injector.recoveries.items()
+        },
+    )
+    return result
+
+
+def print_table(results: Dict[str, Dict[str, Any]]) -> None:
+    header = (
+        f"{'scenario':<32}{'stream':<24}{'records':>9}{'rec/s':>9}{'goodput':>9}"
+        f"{'requests':>10}{'wasted':>8}{'extra':>7}{'recover s':>11}"
+    )
+    print(header)
+    print("-" * len(header))
+    for scenario, result in results.items():
+        recover = result["recover_seconds"]
+        failed = " FAILED" if result["exit_status"] else ""
+        print(
+            f"{scenario:<32}{result['stream']:<24}{result['records']:>9}"
+            f"{result['records_per_second']:>9,.0f}{result['goodput_ratio']:>9.0%}"
+            f"{result['requests']:>10}{result['wasted_requests']:>8}"
+            f"{result['extra_requests']:>7}"
+            f"{'-' if recover is None else f'{recover:.2f}':>11}{failed}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--companies", type=int, default=1)
+    parser.add_argument("--rows", type=int, default=2000, help="rows per entity and company")
+    parser.add_argument("--scenarios", help="comma-separated scenario names (default: all)")
+    parser.add_argument("--faults", help="JSON list of faults (or a file) to run instead")
+    parser.add_argument("--stream", default="vendors", help="stream synced with --faults")
+    parser.add_argument("--latency", help="latency distribution, e.g. lognormal:0.05,0.5")
+    parser.add_argument("--config", default="{}", help="extra tap settings as JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    if args.faults:
+        scenarios = {"custom": {"stream": args.stream, "faults": []}}
+    elif args.scenarios:
+        scenarios = {name: SCENARIOS[name] for name in args.scenarios.split(",")}
+    else:
+        scenarios = SCENARIOS
+    extra_config = json.loads(args.config)
+    api = FakeBusinessCentral(Dataset(args.companies, args.rows))
+    with FakeBCServer(api) as server, tempfile.TemporaryDirectory() as workdir:
+        config_path = os.path.join(workdir, "config.json")
+        with open(config_path, "w") as config_file:
+            json.dump(tap_config(server.url, extra_config), config_file)
+        catalog = TapdynamicsBc(config=[config_path]).catalog_dict
+
+    baselines: Dict[str, Dict[str, Any]] = {}
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, scenario in scenarios.items():
+        stream = scenario["stream"]
+        config = {**extra_config, **scenario.get("config", {})}
+        baseline_key = json.dumps([stream, config], sort_keys=True)
+        if baseline_key not in baselines:
+            baselines[baseline_key] = run_scenario(
+                api, stream, [], None, config, catalog, args.seed
+            )
+        faults = (
+            load_faults(args.faults) if args.faults
+            else [Fault.from_dict(spec) for spec in scenario["faults"]]
+        )
+        latency = args.latency or scenario.get("latency")
+        result = run_scenario(api, stream, faults, latency, config, catalog, args.seed)
+        baseline = baselines[baseline_key]
+        result.update(
+            stream=stream,
+            goodput_ratio=(
+                result["records_per_second"] / baseline["records_per_second"]
+                if baseline["records_per_second"] else 0.0
+            ),
+            extra_requests=result["requests"] - baseline["requests"],
+        )
+        results[name] = result
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
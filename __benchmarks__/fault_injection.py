@@ -0,0 +1,270 @@
+"""Fault injection in front of the fake Business Central.
+
+:class:`FaultInjector` wraps a :class:`fake_bc.FakeBusinessCentral` and
+exposes the same ``handle``/``delay``/``stats`` interface, so
+:class:`fake_bc.FakeBCServer` serves it unchanged. Each request first waits
+for a delay drawn from a :class:`Latency` distribution; then the first
+matching :class:`Fault` may answer it in place of the stand-in:
+
+* ``throttle``: ``429`` with an optional ``Retry-After`` header;
+* ``busy``: ``400`` whose body says "Please try again later.";
+* ``unavailable``: ``503`` without ``Retry-After``;
+* ``dimension``: ``400`` "Dimension Value does not exist", the error that
+  sends invoice and GL entry pages down ``_handle_dimension_failure``;
+* ``timeout``: the real response, but only after ``delay`` seconds, so a
+  client with a shorter ``request_timeout`` gets a ``ReadTimeout``.
+
+A fault matches requests whose path (and, when given, decoded query) match
+its regular expressions. It skips the first ``after`` matches, then fires on
+the next ``count`` (every one when ``count`` is not set) with the given
+``probability``; ``page_size_above`` limits it to pages larger than that.
+Faults only apply to top-level requests, not to the parts of a ``$batch``.
+
+Besides the request counters of :class:`fake_bc.FakeBusinessCentral`, the
+injector records per endpoint (the last path segment, e.g. ``salesInvoices``)
+how many faults it injected and how long each endpoint took to recover: the
+time from its first injected fault to its next successful response.
+
+Faults can be scripted as JSON, e.g.::
+
+    [{"kind": "throttle", "path": "salesInvoices", "count": 3, "retry_after": 1},
+     {"kind": "timeout", "path": "salesInvoices", "page_size_above": 250, "delay": 2}]
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, ClassVar, Dict, List, Optional
+from urllib.parse import parse_qsl, unquote, unquote_plus, urlsplit
+
+from fake_bc import FakeBusinessCentral, Response, error_response, requested_page_size
+
+FAULT_KINDS = ("throttle", "busy", "unavailable", "dimension", "timeout")
+DIMENSION_ERROR = (
+    "Dimension Value does not exist. Identification fields and values: "
+    "Dimension Code='DEPARTMENT',Code='ADM'"
+)
+_SEGMENT_RE = re.compile(r"\([^)]*\)")
+
+
+def endpoint_of(path: str) -> str:
+    """Return the entity a request path addresses, without keys."""
+    segments = [segment for segment in _SEGMENT_RE.sub("", path).split("/") if segment]
+    if segments and segments[-1] == "$count":
+        segments.pop()
+    return segments[-1] if segments else "/"
+
+
+class Latency:
+    """Per-request delay, in seconds, drawn from a named distribution.
+
+    ``constant:S``, ``uniform:LOW,HIGH``, ``normal:MEAN,STDDEV``,
+    ``lognormal:MEDIAN,SIGMA`` and ``pareto:SCALE,ALPHA`` (heavy tailed).
+    """
+
+    PARAMETERS: ClassVar[Dict[str, int]] = {"constant": 1, "uniform": 2, "normal": 2, "lognormal": 2, "pareto": 2}
+
+    def __init__(self, kind: str = "constant", *params: float, seed: Optional[int] = None) -> None:
+        if kind not in self.PARAMETERS:
+            raise ValueError(f"Unknown latency distribution: {kind!r}")
+        if len(params) != self.PARAMETERS[kind]:
+            raise ValueError(f"{kind} latency takes {self.PARAMETERS[kind]} parameter(s)")
+        self.kind = kind
+        self.params = params
+        self._random = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec: str, seed: Optional[int] = None) -> "Latency":
+        kind, _, params = spec.partition(":")
+        return cls(kind, *(float(param) for param in params.split(",") if param), seed=seed)
+
+    def sample(self) -> float:
+        rng, params = self._random, self.params
+        if self.kind == "constant":
+            return params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*params)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*params))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(params[0]), params[1])
+        return params[0] * rng.paretovariate(params[1])
+
+
+class Fault:
+    """One scripted failure mode and the requests it applies to."""
+
+    def __init__(
+        self,
+        kind: str,
+        path: str = ".*",
+        query: Optional[str] = None,
+        exclude_query: Optional[str] = None,
+        after: int = 0,
+        count: Optional[int] = None,
+        probability: float = 1.0,
+        page_size_above: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        delay: float = 0.0,
+    ) -> None:
+        if kind not in FAULT_KINDS:
+            raise ValueError(f"Unknown fault kind: {kind!r}")
+        self.kind = kind
+        self.path = re.compile(path)
+        self.query = re.compile(query) if query else None
+        self.exclude_query = re.compile(exclude_query) if exclude_query else None
+        self.after = after
+        self.count = count
+        self.probability = probability
+        self.page_size_above = page_size_above
+        self.retry_after = retry_after
+        self.delay = delay
+        self.matched = 0
+        self.injected = 0
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any]) -> "Fault":
+        return cls(**spec)
+
+    def reset(self) -> None:
+        self.matched = self.injected = 0
+
+    def _applies(self, path: str, query: str, headers: Dict[str, str]) -> bool:
+        if not self.path.search(path):
+            return False
+        if self.query and not self.query.search(query):
+            return False
+        if self.exclude_query and self.exclude_query.search(query):
+            return False
+        if self.page_size_above is not None:
+            params = dict(parse_qsl(query, keep_blank_values=True))
+            size = int(params["$top"]) if "$top" in params else requested_page_size(headers)
+            return size > self.page_size_above
+        return True
+
+    def fires(self, path: str, query: str, headers: Dict[str, str], rng: random.Random) -> bool:
+        """Return whether this fault answers the request; counts the match."""
+        if not self._applies(path, query, headers):
+            return False
+        self.matched += 1
+        if self.matched <= self.after:
+            return False
+        if self.count is not None and self.injected >= self.count:
+            return False
+        if self.probability < 1.0 and rng.random() >= self.probability:
+            return False
+        self.injected += 1
+        return True
+
+    def response(self) -> Response:
+        if self.kind == "throttle":
+            status, headers, body = error_response(
+                429, "Application_TooManyRequests", "Too Many Requests"
+            )
+            if self.retry_after is not None:
+                headers = dict(headers, **{"Retry-After": f"{self.retry_after:g}"})
+            return status, headers, body
+        if self.kind == "busy":
+            return error_response(
+                400, "Internal_ServerError", "The server is busy. Please try again later."
+            )
+        if self.kind == "unavailable":
+            return error_response(503, "ServiceUnavailable", "Service Unavailable")
+        return error_response(400, "Internal_RecordNotFound", DIMENSION_ERROR)
+
+
+def load_faults(text: str) -> List[Fault]:
+    """Return the faults of a JSON list, given inline or as a file path."""
+    if not text.lstrip().startswith("["):
+        with open(text) as faults_file:
+            text = faults_file.read()
+    return [Fault.from_dict(spec) for spec in json.loads(text)]
+
+
+class FaultInjector:
+    """A :class:`FakeBusinessCentral` with latency and faults injected."""
+
+    def __init__(
+        self,
+        api: FakeBusinessCentral,
+        faults: Optional[List[Fault]] = None,
+        latency: Optional[Latency] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.api = api
+        self.faults = faults or []
+        self.latency = latency or Latency("constant", 0.0)
+        self.stats: Counter = Counter()
+        self.recoveries: Dict[str, List[float]] = defaultdict(list)
+        self._random = random.Random(seed)
+        self._failing_since: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats.clear()
+            self.recoveries.clear()
+            self._failing_since.clear()
+            for fault in self.faults:
+                fault.reset()
+        self.api.reset_stats()
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.api.delay() + self.latency.sample()
+
+    def _pick(self, path: str, query: str, headers: Dict[str, str]) -> Optional[Fault]:
+        with self._lock:
+            for fault in self.faults:
+                if fault.fires(path, query, headers, self._random):
+                    return fault
+        return None
+
+    def handle(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+    ) -> Response:
+        """Return the injected fault's response, or the stand-in's."""
+        received = time.monotonic()
+        headers = headers or {}
+        parts = urlsplit(url)
+        path, query = unquote(parts.path), unquote_plus(parts.query)
+        fault = self._pick(path, query, headers)
+        if fault is not None and fault.kind == "timeout":
+            time.sleep(fault.delay)
+        if fault is None or fault.kind == "timeout":
+            response = self.api.handle(method, url, headers, body)
+        else:
+            response = fault.response()
+        self._record(endpoint_of(path), fault, response, received)
+        return response
+
+    def _record(
+        self, endpoint: str, fault: Optional[Fault], response: Response, received: float
+    ) -> None:
+        status = response[0]
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += len(response[2])
+            self.stats[f"status_{status}"] += 1
+            if fault is not None:
+                self.stats["injected"] += 1
+                self.stats[f"injected_{fault.kind}"] += 1
+                self._failing_since.setdefault(endpoint, received)
+            elif status < 400 and endpoint in self._failing_since:
+                recovered = time.monotonic() - self._failing_since.pop(endpoint)
+                self.recoveries[endpoint].append(recovered)
+
+    def wasted_requests(self) -> int:
+        """Requests whose response the tap could not use."""
+        return sum(
+            count for key, count in self.stats.items()
+            if key.startswith("status_") and int(key[len("status_"):]) >= 400
+        ) + self.stats["injected_timeout"]
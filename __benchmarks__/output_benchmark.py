@@ -0,0 +1,63 @@
+"""Messages/sec of singer.write_message against the buffered MessageWriter.
+
+Writes synthetic RECORD messages to stdout, so redirect it:
+
+    python __benchmarks__/output_benchmark.py --records 100000 > /dev/null
+"""
+
+import argparse
+import sys
+import time
+
+import singer
+from singer import RecordMessage
+
+from tap_dynamics_bc.output import MessageWriter, format_message
+
+
+def record(index: int) -> dict:
+    return {
+        "id": f"00000000-0000-0000-0000-{index:012d}",
+        "number": f"GL{index:08d}",
+        "postingDate": "2024-05-01",
+        "description": "Sales invoice posting",
+        "debitAmount": 1250.5,
+        "creditAmount": 0,
+        "lastModifiedDateTime": "2024-05-01T10:00:00Z",
+    }
+
+
+def measure(label: str, write, messages) -> None:
+    started = time.perf_counter()
+    write(messages)
+    rate = len(messages) / (time.perf_counter() - started)
+    print(f"{label:>24}: {rate:12,.0f} messages/sec", file=sys.stderr)
+
+
+def unbuffered(messages) -> None:
+    for message in messages:
+        singer.write_message(message)
+
+
+def buffered(buffer_size: int):
+    def write(messages) -> None:
+        writer = MessageWriter(buffer_size)
+        for message in messages:
+            writer.write(format_message(message))
+        writer.flush()
+    return write
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+    messages = [RecordMessage(stream="bench", record=record(i)) for i in range(args.records)]
+
+    measure("singer.write_message", unbuffered, messages)
+    for buffer_size in (0, 64 * 1024, 1024 * 1024):
+        measure(f"MessageWriter({buffer_size})", buffered(buffer_size), messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Records/sec of per-record post-processing, before and after RecordPlan.
+
+Times ``post_process`` plus RECORD message generation (selection, typing,
+stream maps) for synthetic rows covering every schema property of a stream,
+without writing the messages. "before" replays the schema loop and SDK
+conformer that ran for every record until the per-stream plan replaced them.
+
+    python __benchmarks__/post_process_benchmark.py [--stream sales_invoices] [--records 50000]
+"""
+
+import argparse
+import copy
+import json
+import logging
+import tempfile
+import time
+
+from hotglue_singer_sdk.streams import Stream
+
+from tap_dynamics_bc.tap import TapdynamicsBc
+
+CONFIG = {
+    "client_id": "benchmark",
+    "client_secret": "benchmark",
+    "refresh_token": "benchmark",
+    "redirect_uri": "https://localhost",
+    "start_date": "2024-01-01T00:00:00Z",
+    "environment_name": "Production",
+}
+CONTEXT = {"company_id": "00000000-0000-0000-0000-000000000001", "company_name": "CRONUS"}
+
+
+def sample_value(property_schema: dict):
+    types = property_schema.get("type", "string")
+    types = types if isinstance(types, list) else [types]
+    if "boolean" in types:
+        return True
+    if "integer" in types:
+        return 42
+    if "number" in types:
+        return 12.5
+    if "array" in types:
+        return [{"id": "line", "amount": 1.0}]
+    if "object" in types:
+        return {"id": "nested"}
+    if property_schema.get("format") == "date-time":
+        return "2024-05-01T10:00:00Z"
+    return "value"
+
+
+def sample_row(schema: dict) -> dict:
+    row = {
+        name: sample_value(property_schema)
+        for name, property_schema in schema.get("properties", {}).items()
+        if name not in CONTEXT
+    }
+    row["@odata.etag"] = 'W/"JzQ0OzE7MDsn"'
+    return row
+
+
+def legacy_post_process(stream, row: dict, context: dict) -> dict:
+    for schema_field in stream.schema.get("properties", {}):
+        if schema_field in (context or {}) and schema_field not in row:
+            row[schema_field] = context[schema_field]
+    return row
+
+
+def legacy(stream, row: dict) -> None:
+    row = legacy_post_process(stream, row, CONTEXT)
+    for _ in Stream._generate_record_messages(stream, row):
+        pass
+
+
+def planned(stream, row: dict) -> None:
+    row = stream.post_process(row, CONTEXT)
+    for _ in stream._generate_record_messages(row):
+        pass
+
+
+def measure(label: str, process, stream, rows) -> float:
+    started = time.perf_counter()
+    for row in rows:
+        process(stream, row)
+    rate = len(rows) / (time.perf_counter() - started)
+    print(f"{label:>7}: {rate:12,.0f} records/sec")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stream", default="sales_invoices")
+    parser.add_argument("--records", type=int, default=50000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as config_file:
+        json.dump(CONFIG, config_file)
+    tap = TapdynamicsBc(config=[config_file.name])
+    stream = tap.streams[args.stream]
+    template = sample_row(stream.schema)
+    print(f"{stream.name}: {len(stream.schema['properties'])} properties, {args.records} records")
+
+    # Each pass consumes its own copies: both paths mutate the rows.
+    before = measure("before", legacy, stream, [copy.deepcopy(template) for _ in range(args.records)])
+    after = measure("after", planned, stream, [copy.deepcopy(template) for _ in range(args.records)])
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
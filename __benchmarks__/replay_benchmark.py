@@ -0,0 +1,156 @@
+"""Per-stream sync benchmarks replaying the smoke-test cassettes in-process.
+
+Every ``__smoke-tests__`` directory with a ``fixtures/vcr.yaml`` cassette
+becomes one benchmark: its selected catalog is synced by a tap built in this
+process, with every stream's ``requests_session`` answered from memory by
+:class:`vcr_replay.CassetteAdapter`. The time measured is the tap's own work
+(``parse_response``, ``post_process``, pagination and message output), which
+makes regressions in those hot paths visible. Runs with pytest-benchmark:
+
+    poetry run pytest __benchmarks__/replay_benchmark.py --benchmark-autosave
+    poetry run pytest __benchmarks__/replay_benchmark.py \
+        --benchmark-compare --benchmark-compare-fail=mean:15%
+
+pytest-benchmark keeps the timing baselines (under ``.benchmarks/``).
+Allocation baselines are kept in ``replay_baselines.json`` next to this file:
+each sync is run once more under ``tracemalloc`` and fails when its peak
+traced memory grows by more than ``REPLAY_ALLOC_TOLERANCE`` (default 0.2,
+i.e. 20%) over the baseline. Rewrite the baselines after an intended change
+with ``REPLAY_UPDATE_BASELINES=1``.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import tracemalloc
+from typing import Dict, Tuple
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from vcr_replay import Cassette, CassetteAdapter, SmokeTest, replay_config, smoke_tests
+
+from tap_dynamics_bc.tap import TapdynamicsBc
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_baselines.json")
+ALLOC_TOLERANCE = float(os.environ.get("REPLAY_ALLOC_TOLERANCE", "0.2"))
+UPDATE_BASELINES = os.environ.get("REPLAY_UPDATE_BASELINES") == "1"
+
+SMOKE_TESTS = list(smoke_tests())
+_baselines_lock = threading.Lock()
+
+
+class RecordCounter:
+    """stdout stand-in that counts RECORD messages and discards the rest."""
+
+    def __init__(self) -> None:
+        self.records = 0
+        self.bytes = 0
+        self.buffer = self
+
+    def write(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bytes += len(data)
+        self.records += data.count(b'{"type":"RECORD"') + data.count(b'{"type": "RECORD"')
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+def expected_records(smoke_test: SmokeTest) -> int:
+    with open(os.path.join(smoke_test.path, "expected_output", "data.singer"), "rb") as data:
+        return sum(1 for line in data if b'"type": "RECORD"' in line or b'"type":"RECORD"' in line)
+
+
+def load_baselines() -> Dict[str, Dict[str, int]]:
+    try:
+        with open(BASELINES_PATH) as baselines_file:
+            return json.load(baselines_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(name: str, baseline: Dict[str, int]) -> None:
+    with _baselines_lock:
+        baselines = load_baselines()
+        baselines[name] = baseline
+        with open(BASELINES_PATH, "w") as baselines_file:
+            json.dump(dict(sorted(baselines.items())), baselines_file, indent=2)
+            baselines_file.write("\n")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def quiet_logging():
+    logging.disable(logging.WARNING)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture(params=SMOKE_TESTS, ids=[smoke_test.name for smoke_test in SMOKE_TESTS])
+def replay(request, tmp_path):
+    """Return a factory of ready-to-sync taps for one smoke test."""
+    smoke_test: SmokeTest = request.param
+    cassette = Cassette.load(smoke_test.cassette_path, strict=False)
+    config_path = tmp_path / "config.json"
+    config = replay_config(
+        smoke_test.config, {"environment_cache_path": str(tmp_path / "environments.json")}
+    )
+    config_path.write_text(json.dumps(config))
+    catalog = smoke_test.catalog
+    output = RecordCounter()
+
+    def make_tap() -> Tuple[TapdynamicsBc, CassetteAdapter]:
+        cassette.rewind()
+        adapter = CassetteAdapter(cassette)
+        tap = TapdynamicsBc(config=[str(config_path)], catalog=catalog)
+        for stream in tap.streams.values():
+            adapter.mount(stream.requests_session)
+        return tap, adapter
+
+    def sync(tap: TapdynamicsBc) -> None:
+        # pytest swaps sys.stdout around each test phase, so this is done here.
+        with contextlib.redirect_stdout(output):
+            tap.sync_all()
+
+    make_tap.smoke_test = smoke_test
+    make_tap.output = output
+    make_tap.sync = sync
+    return make_tap
+
+
+def test_sync_time(benchmark, replay):
+    def setup():
+        tap, _ = replay()
+        replay.output.records = 0
+        return (tap,), {}
+
+    benchmark.pedantic(replay.sync, setup=setup, rounds=10, warmup_rounds=1)
+    benchmark.extra_info["records"] = replay.output.records
+
+
+def test_sync_allocations(replay):
+    tap, adapter = replay()
+    tracemalloc.start()
+    try:
+        replay.sync(tap)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    name = replay.smoke_test.name
+    assert replay.output.records == expected_records(replay.smoke_test)
+    measured = {"peak_bytes": peak, "requests": adapter.requests, "records": replay.output.records}
+    baseline = load_baselines().get(name)
+    if UPDATE_BASELINES or baseline is None:
+        save_baseline(name, measured)
+        return
+    assert measured["requests"] <= baseline["requests"], "sync sends more requests than before"
+    assert peak <= baseline["peak_bytes"] * (1 + ALLOC_TOLERANCE), (
+        f"peak traced memory {peak:,} B exceeds the baseline of "
+        f"{baseline['peak_bytes']:,} B by more than {ALLOC_TOLERANCE:.0%}"
+    )
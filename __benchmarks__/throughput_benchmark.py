@@ -0,0 +1,141 @@
+"""End-to-end sync throughput of every stream against the fake Business Central.
+
+Starts :mod:`fake_bc` in-process, then syncs each stream of ``STREAM_TYPES``
+on its own (its parents are synced but not selected) in a tap subprocess,
+and reports records/sec, requests, response bytes and the subprocess's peak
+RSS per stream:
+
+    python __benchmarks__/throughput_benchmark.py --companies 2 --rows 5000
+    python __benchmarks__/throughput_benchmark.py --streams items,vendors --latency 0.05
+
+Extra tap settings can be passed as JSON with ``--config``, e.g.
+``--config '{"page_prefetch_depth": 2}'``, to compare features.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from fake_bc import Dataset, FakeBCServer, FakeBusinessCentral
+
+from tap_dynamics_bc.tap import STREAM_TYPES, TapdynamicsBc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAUNCHER = "from tap_dynamics_bc.tap import TapdynamicsBc; TapdynamicsBc.cli()"
+
+
+def tap_config(api_host: str, extra: dict) -> dict:
+    return {
+        "client_id": "benchmark",
+        "client_secret": "benchmark",
+        "refresh_token": "benchmark",
+        "redirect_uri": "https://localhost",
+        "access_token": "benchmark",
+        "access_token_expires_at": int(time.time()) + 86400,
+        "environment_name": "Production",
+        "start_date": "2023-01-01T00:00:00Z",
+        "api_host": api_host,
+        "environment_cache_ttl": 0,
+        **extra,
+    }
+
+
+def select_only(catalog: dict, stream_name: str) -> dict:
+    """Return ``catalog`` with only ``stream_name`` (and all its fields) selected."""
+    for entry in catalog["streams"]:
+        selected = entry["tap_stream_id"] == stream_name
+        for metadata in entry.get("metadata", []):
+            if selected or not metadata["breadcrumb"]:
+                metadata["metadata"]["selected"] = selected
+    return catalog
+
+
+def run_stream(
+    api: FakeBusinessCentral, workdir: str, config_path: str, catalog: dict, stream: str
+) -> Dict[str, float]:
+    catalog_path = os.path.join(workdir, f"catalog-{stream}.json")
+    with open(catalog_path, "w") as catalog_file:
+        json.dump(select_only(catalog, stream), catalog_file)
+    python_path = filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(python_path))
+
+    api.reset_stats()
+    records = output_bytes = 0
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", LAUNCHER, "--config", config_path, "--catalog", catalog_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+    for line in process.stdout:
+        output_bytes += len(line)
+        if line.startswith(b'{"type":"RECORD"') or line.startswith(b'{"type": "RECORD"'):
+            records += 1
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    return {
+        "records": records,
+        "seconds": elapsed,
+        "records_per_second": records / elapsed if elapsed else 0.0,
+        "requests": api.stats["requests"],
+        "response_bytes": api.stats["bytes"],
+        "output_bytes": output_bytes,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+        "exit_status": os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1,
+    }
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    header = f"{'stream':<42}{'records':>9}{'rec/s':>10}{'requests':>10}{'MB in':>8}{'RSS MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for stream, result in results.items():
+        failed = " FAILED" if result["exit_status"] else ""
+        print(
+            f"{stream:<42}{result['records']:>9}{result['records_per_second']:>10,.0f}"
+            f"{result['requests']:>10}{result['response_bytes'] / 1e6:>8.1f}"
+            f"{result['peak_rss_mb']:>8.0f}{failed}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--companies", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=2000, help="rows per entity and company")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds")
+    parser.add_argument("--streams", help="comma-separated stream names (default: all)")
+    parser.add_argument("--config", default="{}", help="extra tap settings as JSON")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    streams: List[str] = (
+        args.streams.split(",") if args.streams else [stream.name for stream in STREAM_TYPES]
+    )
+    api = FakeBusinessCentral(Dataset(args.companies, args.rows), args.latency, args.jitter)
+    results: Dict[str, Dict[str, float]] = {}
+    with FakeBCServer(api) as server, tempfile.TemporaryDirectory() as workdir:
+        config_path = os.path.join(workdir, "config.json")
+        with open(config_path, "w") as config_file:
+            json.dump(tap_config(server.url, json.loads(args.config)), config_file)
+        catalog = TapdynamicsBc(config=[config_path]).catalog_dict
+        for stream in streams:
+            results[stream] = run_stream(api, workdir, config_path, catalog, stream)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,23 @@
 
 
 from singer import utils
-import json
+import threading
 import requests
 from hotglue_singer_sdk.authenticators import OAuthAuthenticator, SingletonMeta
 from hotglue_singer_sdk.helpers._util import utc_now
 from hotglue_singer_sdk.streams import Stream as RESTStreamBase
 from typing import Optional
 
+from tap_dynamics_bc.serialization import write_json_atomic
+
+# Tokens are refreshed this many seconds before they actually expire, so a
+# request is never sent with a token that lapses in flight.
+TOKEN_EXPIRY_MARGIN = 60
+
+# Guards creation of the singleton and rewrites of the config file.
+_create_lock = threading.Lock()
+_config_file_lock = threading.Lock()
+
 # The SingletonMeta metaclass makes your streams reuse the same authenticator instance.
 # If this behaviour interferes with your use-case, you can remove the metaclass.
 class TapDynamicsBCAuth(OAuthAuthenticator, metaclass=SingletonMeta):
@@ -23,6 +33,26 @@ class TapDynamicsBCAuth(OAuthAuthenticator, metaclass=SingletonMeta):
     ) -> None:
         super().__init__(stream=stream, auth_endpoint=auth_endpoint, oauth_scopes=oauth_scopes)
         self._tap = stream._tap
+        self._load_cached_token()
+
+    def _load_cached_token(self) -> None:
+        """Reuse the token persisted by a previous run if it is still fresh.
+
+        ``access_token_expires_at`` (epoch seconds) is stored next to
+        ``access_token`` on every refresh, so warm runs skip the login.
+        """
+        access_token = self.config.get("access_token")
+        expires_at = self.config.get("access_token_expires_at")
+        if not access_token or not expires_at:
+            return
+        now = utils.now()
+        remaining = int(float(expires_at) - now.timestamp())
+        if remaining <= TOKEN_EXPIRY_MARGIN:
+            return
+        self.access_token = access_token
+        self.last_refreshed = now
+        self.expires_in = remaining
+        self.logger.info("Reusing cached OAuth access token (expires in %ss).", remaining)
 
     @property
     def oauth_request_body(self) -> dict:
@@ -54,12 +84,20 @@ class TapDynamicsBCAuth(OAuthAuthenticator, metaclass=SingletonMeta):
             return False
         if not self.expires_in:
             return True
-        if self.expires_in > (utils.now() - self.last_refreshed).total_seconds():
+        elapsed = (utils.now() - self.last_refreshed).total_seconds()
+        if self.expires_in - TOKEN_EXPIRY_MARGIN > elapsed:
             return True
         return False
 
     @classmethod
     def create_for_stream(cls, stream) -> "TapDynamicsBCAuth":
+        # Streams on worker threads must all get the same instance, so token
+        # refreshes (single-flighted by the SDK's token lock) happen only once.
+        with _create_lock:
+            return cls._create_for_stream(stream)
+
+    @classmethod
+    def _create_for_stream(cls, stream) -> "TapDynamicsBCAuth":
         if stream.config.get("refresh_token"):
             auth_endpoint = "https://login.microsoftonline.com/common/oauth2/token"
         else:
@@ -102,5 +140,10 @@ class TapDynamicsBCAuth(OAuthAuthenticator, metaclass=SingletonMeta):
             self._tap._config["refresh_token"] = token_json["refresh_token"]
 
         self._tap._config["access_token"] = token_json["access_token"]
-        with open(self._tap.config_file, "w") as outfile:
-            json.dump(self._tap._config, outfile, indent=4)
\ No newline at end of file
+        if self.expires_in:
+            self._tap._config["access_token_expires_at"] = int(
+                request_time.timestamp() + int(self.expires_in)
+            )
+        # Written atomically so concurrent readers never see a partial file.
+        with _config_file_lock:
+            write_json_atomic(self._tap.config_file, self._tap._config, indent=4)
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""Batched ``eq ... or ...`` lookups against OData filters.
+
+Looking records up one key at a time costs a round trip per key. The helpers
+here pack keys into ``field eq a or field eq b ...`` filters instead, as many
+as fit in ``max_filter_length`` characters of the URL-encoded ``$filter``
+value, so batches stay below the URL length Business Central accepts.
+
+:class:`BatchedChildSync` applies this to child streams: lookup values are
+collected while the parent pages and every full batch is synced on a small
+thread pool, so the parent keeps paging while the child requests run. Batches
+finish, and are emitted, in any order.
+
+:func:`iter_by_ids` fetches records by id the same way, several batches at a
+time, halving batches that fail before giving up on them. Records are yielded
+batch by batch as they arrive, so callers never hold a whole page of them.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote_plus
+
+DEFAULT_MAX_FILTER_LENGTH = 2000
+DEFAULT_BATCH_WORKERS = 2
+DEFAULT_FETCH_WORKERS = 4
+# Failing batches are halved down to this size before the fallback runs.
+MIN_SPLIT_BATCH = 10
+
+_OR = " or "
+
+
+def escape_literal(value: str) -> str:
+    """Double every single quote for an OData string literal."""
+    return value.replace("'", "''")
+
+
+def eq_clause(field: str, value: Any, quote: bool = True) -> str:
+    """Return ``field eq value``, quoting string values unless ``quote`` is False."""
+    if quote and isinstance(value, str):
+        return f"{field} eq '{escape_literal(value)}'"
+    return f"{field} eq {value}"
+
+
+def encoded_length(text: str) -> int:
+    """Return the length of ``text`` once encoded into a query string."""
+    return len(quote_plus(text))
+
+
+def or_filter(field: str, values: Iterable[Any], quote: bool = True) -> str:
+    """Return a filter matching any of ``values``."""
+    return _OR.join(eq_clause(field, value, quote) for value in values)
+
+
+def batch_filters(
+    field: str,
+    values: Iterable[Any],
+    max_length: int = DEFAULT_MAX_FILTER_LENGTH,
+    quote: bool = True,
+) -> Iterator[Tuple[List[Any], str]]:
+    """Split ``values`` into ``(batch, filter)`` pairs within ``max_length``.
+
+    A single value longer than the budget still gets a batch of its own.
+    """
+    separator = encoded_length(_OR)
+    batch: List[Any] = []
+    length = 0
+    for value in values:
+        size = encoded_length(eq_clause(field, value, quote))
+        if batch and length + separator + size > max_length:
+            yield batch, or_filter(field, batch, quote)
+            batch, length = [], 0
+        length += size + (separator if batch else 0)
+        batch.append(value)
+    if batch:
+        yield batch, or_filter(field, batch, quote)
+
+
+class StreamedRecords:
+    """Records of a page produced lazily, e.g. by :func:`iter_by_ids`.
+
+    Stands in for a payload's ``value`` list: it can be iterated once and
+    reports the page's row count without materializing the records.
+    """
+
+    def __init__(self, records: Iterable[dict], count: int) -> None:
+        self._records = iter(records)
+        self._count = count
+
+    def __iter__(self) -> Iterator[dict]:
+        return self._records
+
+    def __len__(self) -> int:
+        return self._count
+
+
+def iter_by_ids(
+    fetch: Callable[[List[Any]], List[dict]],
+    fallback: Callable[[List[Any]], List[dict]],
+    ids: Sequence[Any],
+    max_length: int = DEFAULT_MAX_FILTER_LENGTH,
+    max_workers: int = DEFAULT_FETCH_WORKERS,
+    on_split: Optional[Callable[[List[Any], Exception], None]] = None,
+    on_missing: Optional[Callable[[List[Any]], None]] = None,
+) -> Iterator[dict]:
+    """Yield the records of ``ids`` fetched in concurrent, URL-length-bounded batches.
+
+    ``fetch`` receives each batch of ids (GUIDs, unquoted in the filter). A
+    batch it fails on is halved and both halves are retried; batches of
+    :data:`MIN_SPLIT_BATCH` ids or fewer go to ``fallback`` instead. At most
+    ``max_workers`` batches are in flight, and records are yielded in the
+    order of ``ids`` as soon as their batch is done. Ids of a batch the
+    server returned no record for are passed to ``on_missing``.
+    """
+
+    def run(batch: List[Any]) -> List[dict]:
+        try:
+            return fetch(batch)
+        except Exception as error:
+            if len(batch) <= MIN_SPLIT_BATCH:
+                return fallback(batch)
+            if on_split:
+                on_split(batch, error)
+            middle = len(batch) // 2
+            return run(batch[:middle]) + run(batch[middle:])
+
+    max_workers = max(1, max_workers)
+    batches = (batch for batch, _ in batch_filters("id", ids, max_length, quote=False))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # A sliding window of in-flight batches, consumed in id order.
+        in_flight = deque(
+            (batch, executor.submit(run, batch)) for batch in islice(batches, max_workers)
+        )
+        while in_flight:
+            batch, future = in_flight.popleft()
+            records = future.result()
+            next_batch = next(batches, None)
+            if next_batch is not None:
+                in_flight.append((next_batch, executor.submit(run, next_batch)))
+            by_id = {record["id"]: record for record in records}
+            missing = [record_id for record_id in batch if record_id not in by_id]
+            if missing and on_missing:
+                on_missing(missing)
+            for record_id in batch:
+                if record_id in by_id:
+                    yield by_id[record_id]
+
+
+class BatchedChildSync:
+    """Sync a child stream for batches of lookup values on a thread pool.
+
+    Each batch is synced with ``child_stream.sync`` and a context made of
+    ``context`` plus ``{key: [values...]}``; the child builds its filter from
+    that list with :func:`or_filter`. At most twice ``max_workers`` batches
+    are pending at once, so a fast parent cannot queue unbounded work.
+    """
+
+    def __init__(
+        self,
+        child_stream,
+        context: dict,
+        key: str,
+        field: str,
+        max_length: int = DEFAULT_MAX_FILTER_LENGTH,
+        max_workers: int = DEFAULT_BATCH_WORKERS,
+    ) -> None:
+        self.child_stream = child_stream
+        self.context = context
+        self.key = key
+        self.field = field
+        self.max_length = max_length
+        self.max_workers = max(1, max_workers)
+        self._pending: List[Any] = []
+        self._length = 0
+        self._futures: Deque[Future] = deque()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"{child_stream.name}-batch",
+        )
+
+    def add(self, value: Any) -> None:
+        """Queue ``value``, submitting the current batch first if it is full."""
+        size = encoded_length(eq_clause(self.field, value))
+        separator = encoded_length(_OR) if self._pending else 0
+        if self._pending and self._length + separator + size > self.max_length:
+            self._submit()
+            separator = 0
+        self._pending.append(value)
+        self._length += separator + size
+
+    def _submit(self) -> None:
+        batch_context = dict(self.context, **{self.key: self._pending})
+        self._pending, self._length = [], 0
+        # Raise errors of finished batches early and bound the backlog.
+        while self._futures and (
+            self._futures[0].done() or len(self._futures) >= 2 * self.max_workers
+        ):
+            self._futures.popleft().result()
+        self._futures.append(self._executor.submit(self.child_stream.sync, batch_context))
+
+    def close(self) -> None:
+        """Submit the last batch and wait for every batch to be synced."""
+        try:
+            if self._pending:
+                self._submit()
+            while self._futures:
+                self._futures.popleft().result()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def cancel(self) -> None:
+        """Drop the unsubmitted batch and every batch not yet started.
+
+        Batches already running are waited for; their errors are not raised,
+        so the error that stopped the parent is the one reported.
+        """
+        self._pending, self._length = [], 0
+        self._futures.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -1,18 +1,62 @@
 """REST client handling, including dynamics-bcStream base class."""
 
-from typing import Any, Dict, Optional
-from urllib.parse import parse_qs, urlparse
+import copy
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, cast
+from urllib.parse import parse_qs, urlencode, urlparse
 
 import requests
+from backports.cached_property import cached_property
+from hotglue_singer_sdk.exceptions import FatalAPIError, RetriableAPIError
+from hotglue_singer_sdk.helpers._catalog import pop_deselected_record_properties
+from hotglue_singer_sdk.helpers._util import utc_now
 from hotglue_singer_sdk.helpers.jsonpath import extract_jsonpath
 from hotglue_singer_sdk.streams import RESTStream
+from singer import RecordMessage, StateMessage
 
 from tap_dynamics_bc.auth import TapDynamicsBCAuth
-from backports.cached_property import cached_property
-import copy
-from hotglue_singer_sdk.exceptions import FatalAPIError, RetriableAPIError
-import singer
-from singer import StateMessage
+from tap_dynamics_bc.backfill import window_filter
+from tap_dynamics_bc.batching import (
+    DEFAULT_FETCH_WORKERS,
+    DEFAULT_MAX_FILTER_LENGTH,
+    StreamedRecords,
+    iter_by_ids,
+)
+from tap_dynamics_bc.environments import api_host, find_environment, get_environments
+from tap_dynamics_bc.file_sink import FileSink, get_file_sink
+from tap_dynamics_bc.odata_batch import (
+    build_batch_payload,
+    chunked,
+    is_retriable_item,
+    parse_batch_response,
+)
+from tap_dynamics_bc.output import MessageWriter, format_message, get_message_writer
+from tap_dynamics_bc.page_size import DEFAULT_TARGET_LATENCY, PageSizeController
+from tap_dynamics_bc.projection import build_projection
+from tap_dynamics_bc.record_plan import RecordPlan, is_empty_row
+from tap_dynamics_bc.request_metrics import (
+    KIND_BATCH,
+    KIND_CALL,
+    RequestMetric,
+    RequestMetrics,
+    company_of,
+    current_kind,
+    get_request_metrics,
+    note_backoff,
+    page_size_of,
+    request_kind,
+    take_backoff_tries,
+)
+from tap_dynamics_bc.scheduler import (
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_RETRY_AFTER,
+    RequestScheduler,
+    get_scheduler,
+    parse_retry_after,
+)
+from tap_dynamics_bc.serialization import response_json
 
 # Business Central stamps unmodified records with this sentinel timestamp on
 # system audit fields (e.g. SystemModifiedAt, lastModifiedDateTime). Such
@@ -20,12 +64,43 @@ from singer import StateMessage
 # "greater than" replication filter, so initial syncs must explicitly keep them.
 BC_DEFAULT_MODIFIED_SENTINEL = "0001-01-01T00:00:00Z"
 
+# Company partitions may be synced from a worker pool (see
+# ``max_company_concurrency``). Singer output and the shared tap state are
+# guarded by one re-entrant lock so that messages never interleave and a STATE
+# message is never serialized while another partition is mutating its bookmark.
+_SYNC_LOCK = threading.RLock()
+
+# Throttled requests retried in place, after the environment-wide pause, before
+# the response is handed to validate_response and the SDK backoff.
+THROTTLE_RETRIES = 5
+
+# Marks the end of the page queue used by the pipelined request_records mode.
+_PAGES_DONE = object()
+
+
+class _PageFetchError:
+    """Carries an exception raised by the page fetcher thread to the consumer."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
 
 class dynamicsBcStream(RESTStream):
     """dynamics-bc stream class."""
-    envs_list = None
-    page_size = 5000 # 20,000 is the Dynamics BC maximum and default size
-    timeout = 600 # 10 minutes (same as Dynamics BC API)
+    default_page_size = 5000 # 20,000 is the Dynamics BC maximum and default size
+    default_timeout = 600 # 10 minutes (same as Dynamics BC API)
+    # Guards the shared tap state; see _SYNC_LOCK.
+    _state_lock = _SYNC_LOCK
+    # Fields the stream's own code reads, kept even when deselected in the catalog.
+    projection_required_fields: List[str] = []
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # One page-size controller per company; the active one is tracked per
+        # thread because companies may be paged concurrently.
+        self._page_size_lock = threading.Lock()
+        self._page_size_controllers: Dict[Any, PageSizeController] = {}
+        self._active_page_size = threading.local()
 
     def get_environment(self):
         env_name = self.config.get("environment_name", "production")
@@ -39,32 +114,21 @@ class dynamicsBcStream(RESTStream):
     @cached_property
     def url_base(self) -> str:
         """Return the API URL root, configurable via tap settings."""
-        url_template = "https://api.businesscentral.dynamics.com/v2.0/{}/api/v2.0"
-        env_name = self.get_environment()      
-        return url_template.format(env_name)
+        env_name = self.get_environment()
+        return f"{api_host(self.config)}/v2.0/{env_name}/api/v2.0"
+
+    @property
+    def timeout(self) -> int:
+        """Return the read timeout of a request, ``request_timeout`` when configured."""
+        return self.config.get("request_timeout") or self.default_timeout
 
     records_jsonpath = "$.value[*]"
     next_page_token_jsonpath = "$.['@odata.nextLink']"
     expand = None
 
     def get_environments_list(self):
-        if self.envs_list:
-            return self.envs_list
-        headers = {}
-        authenticator = self.authenticator
-        if authenticator:
-            headers.update(authenticator.auth_headers or {})
-        # separate the url for client credentials and refresh token
-        if self.config.get("refresh_token"):
-            url = "https://api.businesscentral.dynamics.com/environments/v1.1"
-        else:
-            url = "https://api.businesscentral.dynamics.com/admin/v2.0/applications/BusinessCentral/environments"
-        envs_list = requests.get(url=url,headers=headers)
-        self.validate_response(envs_list)
-        envs_list = envs_list.json()
-        self.envs_list = envs_list
-        return self.envs_list
-        
+        # Shared across all stream instances and cached on disk between runs.
+        return get_environments(self)
 
     def validate_env(self,env_name):
         env_name = env_name.lower()
@@ -93,13 +157,59 @@ class dynamicsBcStream(RESTStream):
             headers["User-Agent"] = self.config.get("user_agent")
         return headers
 
+    @property
+    def page_size(self) -> int:
+        """Page size of the partition being paged on the current thread."""
+        controller = getattr(self._active_page_size, "controller", None)
+        if controller is None:
+            return self.default_page_size
+        return controller.page_size
+
+    def get_page_size_controller(self, context: Optional[dict]) -> PageSizeController:
+        """Return the page-size controller of the context's company.
+
+        A new controller starts from the size the previous run stored in the
+        stream state under ``page_sizes``, if any.
+        """
+        company_id = (context or {}).get("company_id", "")
+        with self._page_size_lock:
+            controller = self._page_size_controllers.get(company_id)
+            if controller is None:
+                with _SYNC_LOCK:
+                    learned = self.stream_state.get("page_sizes", {}).get(company_id)
+                controller = PageSizeController(
+                    self.default_page_size,
+                    initial_size=learned,
+                    target_latency=float(
+                        self.config.get("page_target_latency", DEFAULT_TARGET_LATENCY)
+                    ),
+                )
+                self._page_size_controllers[company_id] = controller
+            return controller
+
+    def _observe_page(
+        self, context: Optional[dict], requested_size: int, resp, latency: float
+    ) -> None:
+        controller = self.get_page_size_controller(context)
+        payload = response_json(resp)
+        rows = len(payload.get("value") or []) if isinstance(payload, dict) else 0
+        page_size = controller.observe(requested_size, rows, latency, len(resp.content))
+        if page_size != requested_size:
+            self.logger.debug(
+                "%s page size %s -> %s (%.1fs, %s rows)",
+                self.name, requested_size, page_size, latency, rows,
+            )
+        with _SYNC_LOCK:
+            page_sizes = self.stream_state.setdefault("page_sizes", {})
+            page_sizes[(context or {}).get("company_id", "")] = page_size
+
     def get_next_page_token(
         self, response: requests.Response, previous_token: Optional[Any]
     ) -> Optional[Any]:
         """Return a token for identifying next page or None if no more pages."""
         if self.next_page_token_jsonpath:
             all_matches = extract_jsonpath(
-                self.next_page_token_jsonpath, response.json()
+                self.next_page_token_jsonpath, response_json(response)
             )
             first_match = next(iter(all_matches), None)
             next_page_link = first_match
@@ -137,71 +247,451 @@ class dynamicsBcStream(RESTStream):
             params["$skiptoken"] = next_page_token.split("$skiptoken=")[-1]
         return params
 
+    def apply_projection(self, params: dict, headers: dict, context: Optional[dict]) -> None:
+        """Narrow the request to the catalog-selected fields (in place).
+
+        Enabled with ``select_catalog_fields``. Adds ``$select``, prunes and
+        projects ``$expand`` and asks for ``odata.metadata=none`` unless a
+        selected field is an OData annotation.
+        """
+        if not self.config.get("select_catalog_fields"):
+            return
+        required = list(self.primary_keys or []) + list(self.projection_required_fields)
+        if self.replication_key:
+            required.append(self.replication_key)
+        select, expand, keeps_annotations = build_projection(
+            self.schema,
+            self.mask,
+            params.get("$expand"),
+            required=required,
+            excluded=(context or {}).keys(),
+        )
+        if select:
+            params["$select"] = select
+        if expand:
+            params["$expand"] = expand
+        else:
+            params.pop("$expand", None)
+        if not keeps_annotations:
+            headers["Accept"] = "application/json;odata.metadata=none"
+
+    def prepare_request(
+        self, context: Optional[dict], next_page_token: Optional[Any]
+    ) -> requests.PreparedRequest:
+        """Prepare the page request, applying backfill windows and projection."""
+        params = self.get_url_params(context, next_page_token)
+        window = (context or {}).get("backfill_window")
+        if window:
+            params["$filter"] = window_filter(
+                self.replication_key, params.get("$filter"), window
+            )
+        headers = self.http_headers
+        self.apply_projection(params, headers, context)
+        return self.build_prepared_request(
+            method=self.rest_method,
+            url=self.get_url(context),
+            params=params,
+            headers=headers,
+            json=self.prepare_request_payload(context, next_page_token),
+        )
+
+    def _call_api(self, url):
+        """GET an absolute URL with the stream's auth headers and retry logic."""
+        headers = self.http_headers
+        if self.authenticator:
+            headers.update(self.authenticator.auth_headers or {})
+
+        prepared_request = cast(
+            requests.PreparedRequest,
+            self.requests_session.prepare_request(
+                requests.Request(
+                    method="GET",
+                    url=url,
+                    headers=headers,
+                ),
+            ),
+        )
+        decorated_request = self.request_decorator(self._request)
+        with request_kind(KIND_CALL):
+            return decorated_request(prepared_request, {})
+
+    def _call_api_batch(self, urls: List[str]) -> List[Optional[Any]]:
+        """GET many URLs through OData ``$batch``, 100 sub-requests per POST.
+
+        Returns one decoded body per URL, in the order of ``urls``. Failed
+        sub-requests yield ``None`` so callers can apply their own fallback;
+        throttled or transient ones are first retried individually. If the
+        ``$batch`` call itself fails, every URL is fetched one by one.
+        """
+        results: List[Optional[Any]] = []
+        for chunk in chunked(urls):
+            try:
+                items = self._post_batch(chunk)
+            except Exception as error:
+                self.logger.warning(
+                    "$batch request failed for %s, fetching %s URLs individually: %s",
+                    self.name,
+                    len(chunk),
+                    error,
+                )
+                items = {}
+
+            for index, url in enumerate(chunk):
+                item = items.get(str(index))
+                if item is not None and item["status"] < 400:
+                    results.append(item["body"])
+                elif is_retriable_item(item):
+                    results.append(self._call_api_or_none(url))
+                else:
+                    self.logger.warning(
+                        "$batch sub-request failed for %s (%s): %s",
+                        self.name,
+                        item["status"],
+                        item["body"],
+                    )
+                    results.append(None)
+        return results
+
+    def _post_batch(self, urls: List[str]):
+        payload = build_batch_payload(urls, self.url_base)
+        headers = self.http_headers
+        headers["Prefer"] = f"{headers['Prefer']}, odata.continue-on-error"
+        headers["Content-Type"] = "application/json"
+        headers["Accept"] = "application/json"
+        if self.authenticator:
+            headers.update(self.authenticator.auth_headers or {})
+
+        prepared_request = cast(
+            requests.PreparedRequest,
+            self.requests_session.prepare_request(
+                requests.Request(
+                    method="POST",
+                    url=f"{self.url_base}/$batch",
+                    headers=headers,
+                    json=payload,
+                ),
+            ),
+        )
+        decorated_request = self.request_decorator(self._request)
+        with request_kind(KIND_BATCH):
+            return parse_batch_response(decorated_request(prepared_request, {}))
+
+    def _fetch_count(self, context: Optional[dict], filter_clause: Optional[str]) -> Optional[int]:
+        """Return ``$count`` of the stream's rows matching ``filter_clause``.
+
+        Returns None when the service cannot count the entity set.
+        """
+        url = f"{self.get_url(context)}/$count"
+        if filter_clause:
+            url = f"{url}?{urlencode({'$filter': filter_clause})}"
+        try:
+            return int(response_json(self._call_api(url)))
+        except Exception as error:
+            self.logger.info("Could not count %s rows (%s): %s", self.name, filter_clause, error)
+            return None
+
+    def _fetch_counts(
+        self, context: Optional[dict], filter_clauses: List[Optional[str]]
+    ) -> List[Optional[int]]:
+        """Return ``$count`` for each of ``filter_clauses``, through ``$batch``.
+
+        Counts the service could not give are None.
+        """
+        url = f"{self.get_url(context)}/$count"
+        counts: List[Optional[int]] = []
+        for body in self._call_api_batch(
+            [
+                f"{url}?{urlencode({'$filter': filter_clause})}" if filter_clause else url
+                for filter_clause in filter_clauses
+            ]
+        ):
+            try:
+                counts.append(int(body))
+            except (TypeError, ValueError):
+                counts.append(None)
+        return counts
+
+    def _fetch_by_ids(self, fetch, fallback, ids: List[Any]) -> StreamedRecords:
+        """Fetch records by id in concurrent batches; see ``batching.iter_by_ids``.
+
+        Batches are sized to ``max_filter_length`` and up to
+        ``id_batch_concurrency`` of them are in flight at once.
+        """
+
+        def on_split(batch, error):
+            self.logger.warning(
+                "Batch of %s %s records failed, retrying in halves: %s",
+                len(batch), self.name, error,
+            )
+
+        def on_missing(missing):
+            # Records deleted between the id listing and the fetch.
+            self.logger.warning(
+                "%s %s records were not returned by id, e.g. %s",
+                len(missing), self.name, missing[0],
+            )
+
+        records = iter_by_ids(
+            fetch,
+            fallback,
+            ids,
+            max_length=int(self.config.get("max_filter_length") or DEFAULT_MAX_FILTER_LENGTH),
+            max_workers=int(self.config.get("id_batch_concurrency") or DEFAULT_FETCH_WORKERS),
+            on_split=on_split,
+            on_missing=on_missing,
+        )
+        return StreamedRecords(records, len(ids))
+
+    def _call_api_or_none(self, url):
+        try:
+            return response_json(self._call_api(url))
+        except Exception as error:
+            self.logger.warning("Request failed for %s url %s: %s", self.name, url, error)
+            return None
+
     def make_request(self, context, next_page_token):
+        return self.make_request_with_adaptive_page_size(context, next_page_token)
+
+    def _make_page_request(self, context, next_page_token):
+        """Send one page request. Streams with request fallbacks override this."""
         prepared_request = self.prepare_request(
             context, next_page_token=next_page_token
         )
         resp = self._request(prepared_request, context)
         return resp
 
-    def make_request_with_adaptive_page_size(
-        self,
-        context,
-        next_page_token,
-        *,
-        minimum_page_size: int = 10,
-    ):
+    def make_request_with_adaptive_page_size(self, context, next_page_token):
         """Retry with smaller page sizes when a page exceeds the read timeout.
 
-        Halves ``page_size`` on each ``ReadTimeout`` until the request succeeds
-        or ``minimum_page_size`` is reached. The winning size is kept on the
-        stream instance for subsequent pages in the same company partition.
+        Halves the partition's page size on each ``ReadTimeout`` until the
+        request succeeds or the controller's minimum is reached.
         """
-        page_size = self.page_size
-        last_error = None
-
-        while page_size >= minimum_page_size:
-            self.page_size = page_size
+        controller = self.get_page_size_controller(context)
+        while True:
+            page_size = controller.page_size
             try:
-                prepared_request = self.prepare_request(
-                    context, next_page_token=next_page_token
-                )
-                return self._request(prepared_request, context)
-            except requests.exceptions.ReadTimeout as err:
-                last_error = err
-                next_page_size = max(minimum_page_size, page_size // 2)
-                if next_page_size >= page_size:
-                    break
+                return self._make_page_request(context, next_page_token)
+            except requests.exceptions.ReadTimeout:
+                if not controller.on_timeout():
+                    raise
                 self.logger.warning(
                     "Read timeout fetching %s at page_size=%s; retrying with page_size=%s",
                     self.name,
                     page_size,
-                    next_page_size,
+                    controller.page_size,
                 )
-                page_size = next_page_size
 
-        raise last_error
-    
     def request_records(self, context: Optional[dict]):
+        prefetch_depth = int(self.config.get("page_prefetch_depth") or 0)
+        if prefetch_depth > 0:
+            yield from self._request_records_pipelined(context, prefetch_depth)
+            return
+
+        for resp in self._iter_pages(context):
+            yield from self.parse_response(resp)
+
+    def parse_response(self, response: requests.Response):
+        """Yield records from the page payload, which is decoded only once."""
+        payload = response_json(response)
+        if self.records_jsonpath == "$.value[*]":
+            yield from payload.get("value", [])
+        else:
+            yield from extract_jsonpath(self.records_jsonpath, input=payload)
+
+    def _iter_pages(self, context: Optional[dict]):
+        """Fetch pages one after another, following the pagination token."""
         next_page_token: Any = None
         finished = False
         decorated_request = self.request_decorator(self.make_request)
+        self._active_page_size.controller = self.get_page_size_controller(context)
+
+        try:
+            while not finished:
+                started = time.monotonic()
+                resp = decorated_request(context, next_page_token)
+                latency = time.monotonic() - started
+                requested_size = self.page_size
+                previous_token = copy.deepcopy(next_page_token)
+                next_page_token = self.get_next_page_token(
+                    response=resp, previous_token=previous_token
+                )
+                if next_page_token and next_page_token == previous_token:
+                    raise RuntimeError(
+                        f"Loop detected in pagination. "
+                        f"Pagination token {next_page_token} is identical to prior token."
+                    )
+                # Resize only after the token is computed: analytics paging
+                # compares the page length with the size it was requested at.
+                self._observe_page(context, requested_size, resp, latency)
+                yield resp
+                # Cycle until get_next_page_token() no longer returns a value
+                finished = not next_page_token
+        finally:
+            self._active_page_size.controller = None
+
+    @staticmethod
+    def _put_until_stopped(pages: queue.Queue, item: Any, stop: threading.Event) -> bool:
+        """Put ``item`` on the bounded ``pages`` queue unless ``stop`` is set first.
+
+        Returns whether the item was queued; a full queue is retried so that a
+        fetcher thread never blocks past the consumer giving up.
+        """
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _request_records_pipelined(self, context: Optional[dict], depth: int):
+        """Fetch pages on a background thread while rows are parsed and emitted.
+
+        The fetcher requests the next page as soon as its token is known and
+        hands responses over through a queue holding at most ``depth`` pages,
+        so memory stays bounded and a slow consumer blocks the fetcher.
+        """
+        pages: queue.Queue = queue.Queue(maxsize=depth)
+        stop = threading.Event()
 
-        while not finished:
-            resp = decorated_request(context, next_page_token)
-            for row in self.parse_response(resp):
-                yield row
-            previous_token = copy.deepcopy(next_page_token)
-            next_page_token = self.get_next_page_token(
-                response=resp, previous_token=previous_token
-            )
-            if next_page_token and next_page_token == previous_token:
-                raise RuntimeError(
-                    f"Loop detected in pagination. "
-                    f"Pagination token {next_page_token} is identical to prior token."
+        def fetch_pages() -> None:
+            try:
+                for resp in self._iter_pages(context):
+                    if not self._put_until_stopped(pages, resp, stop):
+                        return
+                self._put_until_stopped(pages, _PAGES_DONE, stop)
+            except BaseException as error:
+                self._put_until_stopped(pages, _PageFetchError(error), stop)
+
+        fetcher = threading.Thread(
+            target=fetch_pages, name=f"{self.name}-page-fetcher", daemon=True
+        )
+        fetcher.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is _PAGES_DONE:
+                    break
+                if isinstance(item, _PageFetchError):
+                    raise item.error
+                yield from self.parse_response(item)
+        finally:
+            stop.set()
+
+    @cached_property
+    def request_scheduler(self) -> RequestScheduler:
+        """Scheduler shared by every stream of the configured environment."""
+        environment = (
+            self.config.get("tenant_id") or self.config.get("client_id") or "",
+            self.config.get("environment_name", "production").split("?")[0].lower(),
+        )
+        return get_scheduler(
+            environment,
+            requests_per_second=self.config.get("max_requests_per_second"),
+            max_in_flight=int(
+                self.config.get("max_requests_in_flight", DEFAULT_MAX_IN_FLIGHT)
+            ),
+        )
+
+    def _request(
+        self, prepared_request: requests.PreparedRequest, context: Optional[dict]
+    ) -> requests.Response:
+        """Send a request through the environment's scheduler.
+
+        Throttled responses (429, or 503 with ``Retry-After``) pause the whole
+        environment for the advertised delay and are retried here; once the
+        retries are used up the response is handed to ``validate_response``
+        and the regular backoff takes over.
+        """
+        scheduler = self.request_scheduler
+        retries = take_backoff_tries()
+        started = time.monotonic()
+        for attempt in range(THROTTLE_RETRIES + 1):
+            try:
+                with scheduler.slot():
+                    response = self.requests_session.send(
+                        prepared_request, timeout=self.timeout
+                    )
+            except requests.exceptions.RequestException as error:
+                self._record_request(
+                    prepared_request, context, started, retries=retries + attempt, error=error
                 )
-            # Cycle until get_next_page_token() no longer returns a value
-            finished = not next_page_token
+                raise
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            throttled = response.status_code == 429 or (
+                response.status_code == 503 and retry_after is not None
+            )
+            if not throttled or attempt == THROTTLE_RETRIES:
+                break
+            delay = retry_after if retry_after is not None else DEFAULT_RETRY_AFTER
+            self.logger.warning(
+                "Throttled by Business Central (%s) on %s; pausing requests for %.1fs",
+                response.status_code,
+                self.name,
+                delay,
+            )
+            scheduler.pause(delay)
+
+        self._record_request(
+            prepared_request, context, started, retries=retries + attempt, response=response
+        )
+        self.validate_response(response)
+        return response
+
+    @cached_property
+    def request_metrics(self) -> RequestMetrics:
+        """Per-request metrics collector shared by every stream."""
+        return get_request_metrics(self.config)
+
+    def _record_request(
+        self,
+        request: requests.PreparedRequest,
+        context: Optional[dict],
+        started: float,
+        kind: Optional[str] = None,
+        retries: int = 0,
+        response: Optional[requests.Response] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """Record the metric of an HTTP call and log it as a Singer METRIC."""
+        url = request.url or ""
+        metric = RequestMetric(
+            stream=self.name,
+            company=company_of(context, url),
+            kind=kind or current_kind(),
+            page_size=page_size_of(url, request.headers),
+            status=response.status_code if response is not None else None,
+            retries=retries,
+            bytes=len(response.content) if response is not None else 0,
+            latency=time.monotonic() - started,
+            error=type(error).__name__ if error is not None else None,
+        )
+        self.request_metrics.record(metric)
+        if self._LOG_REQUEST_METRICS:
+            extra_tags = {"endpoint": self.path}
+            if self._LOG_REQUEST_METRIC_URLS:
+                extra_tags["url"] = request.path_url
+            self._write_metric_log(metric.singer_metric(), extra_tags=extra_tags)
+
+    def timed_get(self, kind: str, url: str, **kwargs: Any) -> requests.Response:
+        """GET ``url`` with the stream's session, outside ``_request``, and record it.
+
+        For the tap's setup calls (environment list, ``$metadata``) that bypass
+        the scheduler and the backoff.
+        """
+        started = time.monotonic()
+        try:
+            response = self.requests_session.get(url, **kwargs)
+        except requests.exceptions.RequestException as error:
+            request = requests.Request("GET", url, headers=kwargs.get("headers")).prepare()
+            self._record_request(request, None, started, kind=kind, error=error)
+            raise
+        self._record_request(response.request, None, started, kind=kind, response=response)
+        return response
+
+    def backoff_handler(self, details: dict) -> None:
+        super().backoff_handler(details)
+        note_backoff(details["tries"])
 
     def validate_response(self, response: requests.Response) -> None:
         if response.status_code in [401]:
@@ -235,36 +725,112 @@ class dynamicsBcStream(RESTStream):
             )
             raise RetriableAPIError(msg)
     
-    def _write_state_message(self) -> None:
-        """Write out a STATE message with the latest state."""
-        tap_state = self.tap_state
+    def get_context_state(self, context: Optional[dict]) -> dict:
+        # Partition entries are created lazily; serialize so concurrent company
+        # workers cannot both create the stream's ``partitions`` list.
+        with _SYNC_LOCK:
+            return super().get_context_state(context)
+
+    def _increment_stream_state(
+        self, latest_record: Dict[str, Any], *, context: Optional[dict] = None
+    ) -> None:
+        with _SYNC_LOCK:
+            super()._increment_stream_state(latest_record, context=context)
+
+    @cached_property
+    def message_writer(self) -> MessageWriter:
+        """Buffered stdout writer shared by every stream."""
+        return get_message_writer(self.config)
+
+    def _write_schema_message(self) -> None:
+        schema_messages = [format_message(m) for m in self._generate_schema_messages()]
+        with _SYNC_LOCK:
+            for schema_message in schema_messages:
+                self.message_writer.write(schema_message, flush=True)
+
+    @cached_property
+    def record_plan(self) -> RecordPlan:
+        """Record transformations prepared once from the stream's schema."""
+        return RecordPlan(self.name, self.schema, self.mask)
+
+    def _generate_record_messages(self, record: dict):
+        """Generate the RECORD messages of ``record`` through the stream's plan."""
+        plan = self.record_plan
+        if plan.has_deselected:
+            pop_deselected_record_properties(record, self.schema, self.mask, self.logger)
+        record = plan.conform(record, self.logger)
+        for stream_map in self.stream_maps:
+            mapped_record = stream_map.transform(record)
+            if mapped_record is not None:
+                yield RecordMessage(
+                    stream=stream_map.stream_alias,
+                    record=mapped_record,
+                    version=None,
+                    time_extracted=utc_now(),
+                )
+
+    @cached_property
+    def file_sink(self) -> Optional[FileSink]:
+        """Partitioned file output shared by every stream, when ``output_dir`` is set."""
+        return get_file_sink(self.config, self.message_writer)
+
+    @cached_property
+    def _output_schemas(self) -> Dict[str, dict]:
+        return {
+            stream_map.stream_alias: stream_map.transformed_schema
+            for stream_map in self.stream_maps
+        }
 
-        if tap_state and tap_state.get("bookmarks"):
-            for stream_name in tap_state.get("bookmarks").keys():
-                if stream_name in [
-                    "gl_entries_dimensions",
-                ] and tap_state["bookmarks"][stream_name].get("partitions"):
-                    tap_state["bookmarks"][stream_name] = {"partitions": []}
+    def _write_record_message(self, record: dict) -> None:
+        if self.file_sink is not None:
+            for record_message in self._generate_record_messages(record):
+                self.file_sink.write(
+                    record_message.stream,
+                    record_message.record,
+                    self._output_schemas[record_message.stream],
+                )
+            return
+        # Typing, stream maps and serialization run outside the lock; only the
+        # write is serialized.
+        record_messages = [format_message(m) for m in self._generate_record_messages(record)]
+        with _SYNC_LOCK:
+            for record_message in record_messages:
+                self.message_writer.write(record_message)
 
-        singer.write_message(StateMessage(value=tap_state))
+    def _write_state_message(self) -> None:
+        """Write out a STATE message with the latest state."""
+        with _SYNC_LOCK:
+            tap_state = self.tap_state
+
+            if tap_state and tap_state.get("bookmarks"):
+                for stream_name in tap_state.get("bookmarks").keys():
+                    if stream_name in [
+                        "gl_entries_dimensions",
+                    ] and tap_state["bookmarks"][stream_name].get("partitions"):
+                        tap_state["bookmarks"][stream_name] = {"partitions": []}
+
+            if self.file_sink is not None:
+                # Held until the files holding the records it covers are finished.
+                self.file_sink.write_state(StateMessage(value=tap_state))
+                return
+            # Flushes the records buffered so far, then the state itself.
+            self.message_writer.write_message(StateMessage(value=tap_state), flush=True)
 
     def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        for schema_field in self.schema.get("properties", {}).keys():
-            if schema_field in (context or {}) and schema_field not in row:
-                row[schema_field] = context[schema_field]
-        
-        return row
+        return self.record_plan.inject_context(row, context)
 
 class DynamicsBCODataStream(dynamicsBcStream):
     """Dynamics BC OData stream class."""
 
     @cached_property
     def url_base(self):
-        environments = self.get_environments_list()['value']
-        chosen_environment = next((env for env in environments if env['name'] == self.config.get('environment_name', 'Production')), None)
-        if not chosen_environment:
-            raise Exception("No environment with name: " + self.config.get('environment_name', 'Production'))
-        return f"https://api.businesscentral.dynamics.com/v2.0/{chosen_environment['aadTenantId']}/{chosen_environment['name']}/ODataV4"
+        chosen_environment = find_environment(
+            self, self.config.get('environment_name', 'Production')
+        )
+        return (
+            f"{api_host(self.config)}/v2.0/"
+            f"{chosen_environment['aadTenantId']}/{chosen_environment['name']}/ODataV4"
+        )
 
     def _is_initial_sync(self, context: Optional[dict]) -> bool:
         """Return True only for the first sync, when no bookmark exists yet.
@@ -283,7 +849,7 @@ class DynamicsBCODataStream(dynamicsBcStream):
     
     def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
         # Header records appear with empty values and should be skipped
-        if all(value == '' for k, value in row.items() if k != '@odata.etag'):
+        if is_empty_row(row):
             return None
         return super().post_process(row, context)
 
@@ -307,38 +873,127 @@ class DynamicsBCODataStream(dynamicsBcStream):
 class DynamicsBCAnalyticsStream(dynamicsBcStream):
     """Dynamics BC Analytics stream class."""
 
-    page_size = 1000
+    default_page_size = 1000
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Base $filter of the partition being synced, per company.
+        self._keyset_filters: Dict[str, Optional[str]] = {}
 
     @cached_property
     def url_base(self):
         environment = self.get_environment()
-        return f"https://api.businesscentral.dynamics.com/v2.0/{environment}/api/microsoft/analytics/v1.0"
+        return f"{api_host(self.config)}/v2.0/{environment}/api/microsoft/analytics/v1.0"
     
 
+    # Pages are ordered by these keys and continue after the last row seen
+    # (keyset pagination); they must identify a row uniquely.
+    keyset_keys: List[str] = ["entryNo"]
+
     def get_next_page_token(
         self, response: requests.Response, previous_token: Optional[Any]
     ) -> Optional[Any]:
-        """Return a token for identifying next page or None if no more pages."""
-        records = response.json().get("value", [])
-        if not records:
-            return None
-        previous_token = previous_token or 0
-        next_skip = previous_token + len(records)
-        if len(records) < self.page_size:
+        """Return the key of the page's last row, or None if no more pages."""
+        records = response_json(response).get("value", [])
+        if not records or len(records) < self.page_size:
             return None
-        return next_skip
+        return {key: records[-1].get(key) for key in self.keyset_keys}
+
+    def _keyset_filter(self, last_key: Dict[str, Any]) -> str:
+        """Return the ``$filter`` selecting rows ordered after ``last_key``."""
+
+        def literal(value: Any) -> str:
+            if isinstance(value, str):
+                return "'{}'".format(value.replace("'", "''"))
+            return str(value)
+
+        clauses = []
+        for index, key in enumerate(self.keyset_keys):
+            equal = [
+                f"{previous} eq {literal(last_key[previous])}"
+                for previous in self.keyset_keys[:index]
+            ]
+            clauses.append(
+                " and ".join(equal + [f"{key} gt {literal(last_key[key])}"])
+            )
+        if len(clauses) == 1:
+            return clauses[0]
+        return " or ".join(f"({clause})" for clause in clauses)
 
-    def get_url_params(
-        self, context: Optional[dict], next_page_token: Optional[Any]
-    ) -> Dict[str, Any]:
-        """Return a dictionary of values to be used in URL parameterization."""
+    def _keyset_checkpoint_key(self, context: Optional[dict]) -> str:
+        return (context or {}).get("company_id", "")
+
+    def get_base_url_params(self, context: Optional[dict]) -> Dict[str, Any]:
+        """Return the query parameters shared by every page of a partition."""
         params: dict = {}
-        params["$top"] = self.page_size
         if self.replication_key:
             start_date = self.get_starting_timestamp(context)
             if start_date:
                 date = start_date.strftime("%Y-%m-%dT%H:%M:%SZ")
                 params["$filter"] = f"{self.replication_key} gt {date}"
-        if next_page_token:
-            params["$skip"] = next_page_token
-        return params
\ No newline at end of file
+        return params
+
+    def get_url_params(
+        self, context: Optional[dict], next_page_token: Optional[Any]
+    ) -> Dict[str, Any]:
+        """Return the partition's parameters, ordered and continued by key.
+
+        On a partition's first page, resume after the key checkpointed in the
+        stream state by an interrupted run of the same query.
+        """
+        params = self.get_base_url_params(context)
+        base_filter = params.get("$filter")
+        last_key = next_page_token
+        if last_key is None:
+            with _SYNC_LOCK:
+                checkpoint = self.stream_state.get("keyset_checkpoints", {}).get(
+                    self._keyset_checkpoint_key(context)
+                )
+            if checkpoint and checkpoint.get("filter") == base_filter:
+                last_key = checkpoint["last_key"]
+        params["$top"] = self.page_size
+        params["$orderby"] = ",".join(self.keyset_keys)
+        if last_key:
+            keyset_filter = self._keyset_filter(last_key)
+            params["$filter"] = (
+                f"({base_filter}) and ({keyset_filter})" if base_filter else keyset_filter
+            )
+        return params
+
+    def request_records(self, context: Optional[dict]):
+        checkpoint_key = self._keyset_checkpoint_key(context)
+        base_filter = self.get_base_url_params(context).get("$filter")
+        with _SYNC_LOCK:
+            checkpoint = self.stream_state.get("keyset_checkpoints", {}).get(checkpoint_key)
+            if checkpoint and checkpoint.get("filter") == base_filter:
+                self.logger.info(
+                    "Resuming %s after %s from the state checkpoint",
+                    self.name,
+                    checkpoint["last_key"],
+                )
+            self._keyset_filters[checkpoint_key] = base_filter
+        yield from super().request_records(context)
+        # The partition is complete: the next run starts from its bookmark.
+        with _SYNC_LOCK:
+            checkpoints = self.stream_state.get("keyset_checkpoints", {})
+            checkpoints.pop(checkpoint_key, None)
+            if not checkpoints:
+                self.stream_state.pop("keyset_checkpoints", None)
+
+    def _increment_stream_state(
+        self, latest_record: Dict[str, Any], *, context: Optional[dict] = None
+    ) -> None:
+        with _SYNC_LOCK:
+            super()._increment_stream_state(latest_record, context=context)
+            # Rows arrive in key order, so the last written row is a safe
+            # place to resume an interrupted partition.
+            self._advance_keyset_checkpoint(latest_record, context)
+
+    def _advance_keyset_checkpoint(self, row: Dict[str, Any], context: Optional[dict]) -> None:
+        """Make the partition's key checkpoint point after ``row``."""
+        checkpoint_key = self._keyset_checkpoint_key(context)
+        with _SYNC_LOCK:
+            self.stream_state.setdefault("keyset_checkpoints", {})[checkpoint_key] = {
+                "filter": self._keyset_filters.get(checkpoint_key),
+                "last_key": {key: row.get(key) for key in self.keyset_keys},
+            }
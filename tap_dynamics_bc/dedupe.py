@@ -0,0 +1,104 @@
+"""Memory-capped "already seen" set for per-partition key dedupe.
+
+:class:`BoundedSeenSet` stores 64-bit hashes of its keys in open-addressing
+``array('Q')`` tables, eight bytes per slot instead of a Python ``set``'s
+object per key. Memory stays below ``max_bytes``: when the current table is
+full it becomes the previous generation and a new table starts, and the
+generation before that is dropped.
+
+Forgetting old keys can only produce false negatives ("not seen" for a key
+that was seen), i.e. some work is repeated; a "seen" answer is exact up to a
+64-bit hash collision.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from array import array
+from typing import Any, Optional
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+_INITIAL_SLOTS = 1024
+_MAX_LOAD = 0.7
+
+
+def _hash(key: Any) -> int:
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+    # Slot value 0 marks an empty slot.
+    return int.from_bytes(digest, "little") or 1
+
+
+class _HashTable:
+    """Linear-probing hash set of non-zero 64-bit integers."""
+
+    def __init__(self, slots: int) -> None:
+        self.slots = array("Q", bytes(8 * slots))
+        self.mask = slots - 1
+        self.count = 0
+
+    @property
+    def full(self) -> bool:
+        return self.count >= _MAX_LOAD * len(self.slots)
+
+    def _probe(self, value: int) -> int:
+        index = value & self.mask
+        while self.slots[index] and self.slots[index] != value:
+            index = (index + 1) & self.mask
+        return index
+
+    def __contains__(self, value: int) -> bool:
+        return self.slots[self._probe(value)] == value
+
+    def add(self, value: int) -> None:
+        index = self._probe(value)
+        if not self.slots[index]:
+            self.slots[index] = value
+            self.count += 1
+
+    def resized(self, slots: int) -> "_HashTable":
+        table = _HashTable(slots)
+        for value in self.slots:
+            if value:
+                table.add(value)
+        return table
+
+
+class BoundedSeenSet:
+    """Set of seen keys using at most ``max_bytes`` for its tables."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        # Two generations share the budget.
+        max_slots = max(_INITIAL_SLOTS, max_bytes // 16)
+        self.max_slots = 1 << (max_slots.bit_length() - 1)
+        self._current = _HashTable(min(_INITIAL_SLOTS, self.max_slots))
+        self._previous: Optional[_HashTable] = None
+        self.forgotten = 0
+
+    def __contains__(self, key: Any) -> bool:
+        value = _hash(key)
+        return value in self._current or (
+            self._previous is not None and value in self._previous
+        )
+
+    def add(self, key: Any) -> None:
+        value = _hash(key)
+        if value in self._current:
+            return
+        if self._current.full:
+            if len(self._current.slots) < self.max_slots:
+                self._current = self._current.resized(2 * len(self._current.slots))
+            else:
+                if self._previous is not None:
+                    self.forgotten += self._previous.count
+                self._previous = self._current
+                self._current = _HashTable(self.max_slots)
+        self._current.add(value)
+
+    def __len__(self) -> int:
+        return self._current.count + (self._previous.count if self._previous else 0)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the hash tables."""
+        tables = [self._current] + ([self._previous] if self._previous else [])
+        return sum(len(table.slots) * table.slots.itemsize for table in tables)
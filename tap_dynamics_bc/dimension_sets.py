@@ -0,0 +1,171 @@
+"""Dimension set cache for G/L entry dimension lookups.
+
+The ``dimensionSetLines`` of a G/L entry are fully determined by the entry's
+dimension set, and most entries of a company share a few hundred sets. With
+``enable_dimension_set_cache``, :class:`DimensionSetCache` maps entry numbers
+to their ``Dimension_Set_ID`` in bulk through the ``G_LEntries`` OData web
+service (one request per :data:`ENTRY_RANGE` entry numbers) and keeps the
+lines of each set in an LRU cache of ``dimension_set_cache_size`` sets.
+
+Only the first entry seen with a given set has its lines requested; every
+other entry reuses them with its own ``parentId``. The lines are taken from
+the API rather than from the ``DimensionSetEntries`` OData page, which lacks
+the dimension and value ids (and consolidation codes) of ``dimensionSetLines``.
+If the web service is not published, the cache disables itself and callers
+fall back to one request per entry.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from tap_dynamics_bc.environments import api_host, find_environment
+from tap_dynamics_bc.serialization import response_json
+
+if TYPE_CHECKING:
+    from tap_dynamics_bc.client import dynamicsBcStream
+
+DEFAULT_CACHE_SIZE = 10000
+# Entry numbers mapped to their dimension set per OData request.
+ENTRY_RANGE = 1000
+GL_ENTRIES_ENTITY = "G_LEntries"
+
+_registry_lock = threading.Lock()
+_caches: Dict[Tuple[str, str], "DimensionSetCache"] = {}
+
+
+class DimensionSetCache:
+    """Entry-to-set map and LRU cache of dimension set lines for one company."""
+
+    def __init__(
+        self,
+        stream: "dynamicsBcStream",
+        company_name: str,
+        maxsize: int = DEFAULT_CACHE_SIZE,
+    ) -> None:
+        self.stream = stream
+        self.company_name = company_name
+        self.maxsize = max(1, maxsize)
+        self.available = True
+        self._sets: "OrderedDict[int, List[dict]]" = OrderedDict()
+        self._entry_sets: "OrderedDict[int, Optional[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entries_url(self) -> str:
+        environment = find_environment(
+            self.stream, self.stream.config.get("environment_name", "Production")
+        )
+        company = quote(self.company_name.replace("'", "''"))
+        return (
+            f"{api_host(self.stream.config)}/v2.0/"
+            f"{environment['aadTenantId']}/{environment['name']}/ODataV4/"
+            f"Company('{company}')/{GL_ENTRIES_ENTITY}"
+        )
+
+    def _load_entry_range(self, entry_number: int) -> None:
+        params = {
+            "$filter": (
+                f"Entry_No ge {entry_number} and "
+                f"Entry_No lt {entry_number + ENTRY_RANGE}"
+            ),
+            "$select": "Entry_No,Dimension_Set_ID",
+        }
+        try:
+            response = self.stream._call_api(f"{self._entries_url()}?{urlencode(params)}")
+        except Exception as error:
+            self.stream.logger.warning(
+                "Dimension set cache disabled, could not read %s: %s",
+                GL_ENTRIES_ENTITY, error,
+            )
+            self.available = False
+            return
+        with self._lock:
+            for row in response_json(response).get("value", []):
+                self._entry_sets[row["Entry_No"]] = row["Dimension_Set_ID"]
+            # Remember entries the web service does not know, too.
+            self._entry_sets.setdefault(entry_number, None)
+            while len(self._entry_sets) > 4 * ENTRY_RANGE:
+                self._entry_sets.popitem(last=False)
+
+    def dimension_set_id(self, entry_number: Optional[int]) -> Optional[int]:
+        """Return the dimension set of a G/L entry, or None when unknown."""
+        if entry_number is None or not self.available:
+            return None
+        with self._lock:
+            if entry_number in self._entry_sets:
+                return self._entry_sets[entry_number]
+        self._load_entry_range(entry_number)
+        with self._lock:
+            return self._entry_sets.get(entry_number)
+
+    def get(self, set_id: int) -> Optional[List[dict]]:
+        """Return the cached lines of ``set_id``; set 0 has no lines."""
+        if set_id == 0:
+            return []
+        with self._lock:
+            lines = self._sets.get(set_id)
+            if lines is not None:
+                self._sets.move_to_end(set_id)
+            return lines
+
+    def put(self, set_id: int, lines: List[dict]) -> None:
+        with self._lock:
+            self._sets[set_id] = lines
+            self._sets.move_to_end(set_id)
+            while len(self._sets) > self.maxsize:
+                self._sets.popitem(last=False)
+
+    def lines_for_entries(self, gl_entries_url: str, entries: List[dict]) -> List[Optional[List[dict]]]:
+        """Return the ``dimensionSetLines`` of each of ``entries``.
+
+        The lines of sets not cached yet are requested through ``$batch``,
+        once per set. Entries whose set cannot be resolved yield None.
+        """
+        set_ids = [self.dimension_set_id(entry.get("entryNumber")) for entry in entries]
+        missing: Dict[int, Any] = {}
+        for entry, set_id in zip(entries, set_ids):
+            if set_id is not None and self.get(set_id) is None:
+                missing.setdefault(set_id, entry["id"])
+        if missing:
+            bodies = self.stream._call_api_batch(
+                [f"{gl_entries_url}({entry_id})/dimensionSetLines" for entry_id in missing.values()]
+            )
+            for set_id, body in zip(missing, bodies):
+                if isinstance(body, dict):
+                    self.put(set_id, body.get("value", []))
+
+        results: List[Optional[List[dict]]] = []
+        for entry, set_id in zip(entries, set_ids):
+            lines = None if set_id is None else self.get(set_id)
+            results.append(
+                None if lines is None else [dict(line, parentId=entry["id"]) for line in lines]
+            )
+        return results
+
+
+def get_dimension_set_cache(
+    stream: "dynamicsBcStream", context: Optional[dict]
+) -> Optional[DimensionSetCache]:
+    """Return the process-wide cache of the context's company.
+
+    Returns None when ``enable_dimension_set_cache`` is off, there is no
+    company in ``context``, or the cache disabled itself.
+    """
+    if not stream.config.get("enable_dimension_set_cache") or not context:
+        return None
+    if not context.get("company_id") or context.get("company_name") is None:
+        return None
+    key = (stream.config.get("environment_name", "Production").lower(), context["company_id"])
+    with _registry_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = DimensionSetCache(
+                stream,
+                context["company_name"],
+                int(stream.config.get("dimension_set_cache_size") or DEFAULT_CACHE_SIZE),
+            )
+            _caches[key] = cache
+    return cache if cache.available else None
@@ -17,9 +17,9 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Type
 from xml.etree import ElementTree as ET
 
-import requests
-
-from tap_dynamics_bc.client import DynamicsBCODataStream
+from tap_dynamics_bc.client import DynamicsBCODataStream, dynamicsBcStream
+from tap_dynamics_bc.environments import api_host, find_environment
+from tap_dynamics_bc.request_metrics import KIND_METADATA
 from tap_dynamics_bc.streams import CompaniesStream
 
 if TYPE_CHECKING:
@@ -27,9 +27,7 @@ if TYPE_CHECKING:
 
 EDM_NS = "{http://docs.oasis-open.org/odata/ns/edm}"
 
-ODATA_BASE_TEMPLATE = (
-    "https://api.businesscentral.dynamics.com/v2.0/{tenant}/{environment}/ODataV4"
-)
+ODATA_BASE_TEMPLATE = "{host}/v2.0/{tenant}/{environment}/ODataV4"
 
 # Property names that, when present on an entity AND typed as a timestamp,
 # are used as the replication key. Order is significant: the first match wins.
@@ -233,35 +231,31 @@ def build_dynamic_stream_classes(
     return classes
 
 
-def fetch_metadata_xml(tap: "TapdynamicsBc") -> str:
+def fetch_metadata_xml(
+    tap: "TapdynamicsBc", helper_stream: Optional[dynamicsBcStream] = None
+) -> str:
     """Download the OData ``$metadata`` document for the tap's environment.
 
-    Reuses the tap's existing OAuth flow via a transient ``CompaniesStream``
-    instance, so token refresh and environment validation behave exactly as
-    they do during normal sync.
+    Reuses the tap's existing OAuth flow via ``helper_stream`` (a transient
+    ``CompaniesStream`` when not given), so token refresh behaves exactly as
+    it does during normal sync. The environment is resolved through the
+    shared environment cache.
     """
-    helper_stream = CompaniesStream(tap=tap)
-    environments = helper_stream.get_environments_list().get("value", [])
-    target_name = tap.config.get("environment_name", "Production")
-    chosen = next(
-        (e for e in environments if e.get("name", "").lower() == target_name.lower()),
-        None,
+    if helper_stream is None:
+        helper_stream = CompaniesStream(tap=tap)
+    chosen = find_environment(
+        helper_stream, tap.config.get("environment_name", "Production")
     )
-    if chosen is None:
-        raise RuntimeError(
-            f"Could not find Business Central environment {target_name!r}; "
-            f"available: {[e.get('name') for e in environments]}"
-        )
 
     odata_base = ODATA_BASE_TEMPLATE.format(
-        tenant=chosen["aadTenantId"], environment=chosen["name"]
+        host=api_host(tap.config), tenant=chosen["aadTenantId"], environment=chosen["name"]
     )
     url = f"{odata_base}/$metadata"
     headers = dict(helper_stream.authenticator.auth_headers or {})
     headers.setdefault("Accept", "application/xml")
 
     tap.logger.info("Fetching OData $metadata for discovery: %s", url)
-    response = requests.get(url, headers=headers, timeout=120)
+    response = helper_stream.timed_get(KIND_METADATA, url, headers=headers, timeout=120)
     response.raise_for_status()
     return response.text
 
@@ -273,6 +267,7 @@ def discover_dynamic_streams(
     include_prefixes: Optional[Iterable[str]] = None,
     exclude_prefixes: Optional[Iterable[str]] = None,
     skip_names: Optional[Iterable[str]] = None,
+    helper_stream: Optional[dynamicsBcStream] = None,
 ) -> List[DynamicsBCODataStream]:
     """High-level entry point: fetch metadata and instantiate dynamic streams.
 
@@ -282,7 +277,7 @@ def discover_dynamic_streams(
     here is treated as a configuration / connectivity problem that should
     surface immediately instead of silently shrinking the catalog.
     """
-    xml_text = fetch_metadata_xml(tap)
+    xml_text = fetch_metadata_xml(tap, helper_stream)
     entity_sets = parse_metadata_xml(xml_text)
     tap.logger.info("OData $metadata declared %d entity sets", len(entity_sets))
 
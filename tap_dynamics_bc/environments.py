@@ -0,0 +1,155 @@
+"""Shared resolver for the tenant's Business Central environments.
+
+Every stream needs the environment list: the REST streams validate the
+configured ``environment_name`` against it and the OData streams read the
+environment's ``aadTenantId`` to build their base URL. The list is fetched once
+per tenant and kept in a process-wide cache, so all static and dynamically
+discovered streams resolve their base URLs without further HTTP calls.
+
+The cache is also persisted to a small JSON file so consecutive runs skip the
+lookup. Entries expire after ``environment_cache_ttl`` seconds (default one
+hour); a TTL of ``0`` keeps the list in memory for the current run only. The
+file lives in the system temp directory unless ``environment_cache_path`` is
+configured.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Tuple
+
+from tap_dynamics_bc.request_metrics import KIND_ENVIRONMENTS
+from tap_dynamics_bc.serialization import response_json, write_json_atomic
+
+if TYPE_CHECKING:
+    from tap_dynamics_bc.client import dynamicsBcStream
+
+DEFAULT_CACHE_TTL = 3600
+
+API_HOST = "https://api.businesscentral.dynamics.com"
+# Delegated (refresh token) and application (client credentials) auth use
+# different endpoints to list the tenant's environments.
+DELEGATED_ENVIRONMENTS_PATH = "/environments/v1.1"
+ADMIN_ENVIRONMENTS_PATH = "/admin/v2.0/applications/BusinessCentral/environments"
+
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def api_host(config: Mapping[str, Any]) -> str:
+    """Return the Business Central API root, ``api_host`` when configured."""
+    return (config.get("api_host") or API_HOST).rstrip("/")
+
+
+def _environments_url(config: Mapping[str, Any]) -> str:
+    if config.get("refresh_token"):
+        return api_host(config) + DELEGATED_ENVIRONMENTS_PATH
+    return api_host(config) + ADMIN_ENVIRONMENTS_PATH
+
+
+def _cache_key(config: Mapping[str, Any]) -> str:
+    parts = (
+        _environments_url(config),
+        config.get("client_id") or "",
+        config.get("tenant_id") or "",
+    )
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def _cache_path(config: Mapping[str, Any], key: str) -> str:
+    if config.get("environment_cache_path"):
+        return config["environment_cache_path"]
+    return os.path.join(
+        tempfile.gettempdir(), f"tap-dynamics-bc-environments-{key}.json"
+    )
+
+
+def _read_disk_cache(path: str, key: str, ttl: float) -> Optional[Tuple[float, Dict]]:
+    try:
+        with open(path) as cache_file:
+            entry = json.load(cache_file).get(key)
+    except (OSError, ValueError, AttributeError):
+        return None
+    if not entry or time.time() - entry.get("fetched_at", 0) >= ttl:
+        return None
+    return entry["fetched_at"], entry["environments"]
+
+
+def _write_disk_cache(path: str, key: str, fetched_at: float, environments: Dict) -> None:
+    try:
+        with open(path) as cache_file:
+            entries = json.load(cache_file)
+        if not isinstance(entries, dict):
+            entries = {}
+    except (OSError, ValueError):
+        entries = {}
+    entries[key] = {"fetched_at": fetched_at, "environments": environments}
+    write_json_atomic(path, entries)
+
+
+def get_environments(stream: "dynamicsBcStream") -> Dict[str, Any]:
+    """Return the tenant's environment list, fetching it at most once per TTL.
+
+    Lookups are served from the in-process cache, then from the disk cache,
+    and only then from the API using ``stream``'s authenticator.
+    """
+    config = stream.config
+    ttl = float(config.get("environment_cache_ttl", DEFAULT_CACHE_TTL))
+    key = _cache_key(config)
+
+    with _lock:
+        cached = _cache.get(key)
+        # With a TTL of 0 the list is only kept in memory for this run.
+        if cached and (ttl <= 0 or time.time() - cached[0] < ttl):
+            return cached[1]
+
+        path = _cache_path(config, key)
+        cached = _read_disk_cache(path, key, ttl) if ttl > 0 else None
+        if cached:
+            _cache[key] = cached
+            return cached[1]
+
+        headers = {}
+        authenticator = stream.authenticator
+        if authenticator:
+            headers.update(authenticator.auth_headers or {})
+        response = stream.timed_get(
+            KIND_ENVIRONMENTS, _environments_url(config), headers=headers, timeout=stream.timeout
+        )
+        stream.validate_response(response)
+        environments = response_json(response)
+
+        fetched_at = time.time()
+        _cache[key] = (fetched_at, environments)
+        if ttl > 0:
+            try:
+                _write_disk_cache(path, key, fetched_at, environments)
+            except OSError as error:
+                stream.logger.warning(
+                    "Could not persist environment cache to %s: %s", path, error
+                )
+        return environments
+
+
+def find_environment(stream: "dynamicsBcStream", name: str) -> Dict[str, Any]:
+    """Return the environment named ``name`` (case-insensitive).
+
+    Raises:
+        RuntimeError: If the tenant has no environment with that name.
+    """
+    environments = get_environments(stream).get("value", [])
+    chosen = next(
+        (env for env in environments if env.get("name", "").lower() == name.lower()),
+        None,
+    )
+    if chosen is None:
+        raise RuntimeError(
+            f"Could not find Business Central environment {name!r}; "
+            f"available: {[env.get('name') for env in environments]}"
+        )
+    return chosen
@@ -0,0 +1,349 @@
+"""File output mode: records written to partitioned files instead of stdout.
+
+With ``output_dir`` set, RECORD messages are not written to stdout. Each
+stream, and with ``output_partition_by_company`` each company, gets its own
+gzip-compressed JSONL file (or Parquet file with ``output_format: parquet``,
+which needs ``pyarrow``) under ``output_dir``. Records are serialized into
+chunks that a pool of ``output_writer_concurrency`` threads compresses and
+writes, one chunk at a time per file.
+
+stdout then only carries SCHEMA messages, BATCH messages listing the
+finished files (the Singer SDK's batch message format) and STATE. STATE
+messages are held back until every record they cover is in a finished file:
+at a checkpoint all open files are closed, their BATCH messages are written,
+and then the latest STATE. Checkpoints happen when a file reaches
+``output_max_file_size`` bytes, every ``output_commit_interval`` seconds and
+when the sync ends (:func:`close_file_sink`, called by the tap's ``sync_all``).
+"""
+
+from __future__ import annotations
+
+import datetime
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import singer
+
+from tap_dynamics_bc.output import MessageWriter, dumps_line, format_message
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+DEFAULT_FORMAT = "jsonl"
+DEFAULT_MAX_FILE_SIZE = 128 * 1024 * 1024
+DEFAULT_WRITER_CONCURRENCY = 4
+DEFAULT_COMMIT_INTERVAL = 300.0
+# Serialized bytes collected before a chunk is handed to the writer pool.
+CHUNK_SIZE = 1024 * 1024
+
+_sink_lock = threading.Lock()
+_sink: Optional["FileSink"] = None
+
+
+class BatchMessage(singer.Message):
+    """BATCH message pointing a target at files holding a stream's records."""
+
+    def __init__(self, stream: str, encoding: Dict[str, str], manifest: List[str]) -> None:
+        self.stream = stream
+        self.encoding = encoding
+        self.manifest = manifest
+
+    def asdict(self) -> dict:
+        return {
+            "type": "BATCH",
+            "stream": self.stream,
+            "encoding": self.encoding,
+            "manifest": self.manifest,
+        }
+
+
+def _types(property_schema: dict) -> List[str]:
+    types = property_schema.get("type", ["string"])
+    return types if isinstance(types, list) else [types]
+
+
+def _is_nested(property_schema: dict) -> bool:
+    return bool({"object", "array"} & set(_types(property_schema)))
+
+
+def _arrow_type(property_schema: dict):
+    types = _types(property_schema)
+    if _is_nested(property_schema):
+        # Nested values are stored as JSON text.
+        return pyarrow.string()
+    if "boolean" in types:
+        return pyarrow.bool_()
+    if "integer" in types:
+        return pyarrow.int64()
+    if "number" in types:
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def arrow_schema(schema: dict):
+    """Return the Arrow schema of a stream's JSON schema."""
+    return pyarrow.schema(
+        (name, _arrow_type(property_schema))
+        for name, property_schema in schema.get("properties", {}).items()
+    )
+
+
+class _JsonlFile:
+    encoding = {"format": "jsonl", "compression": "gzip"}
+    suffix = ".jsonl.gz"
+
+    def __init__(self, path: str, schema: dict) -> None:
+        self._raw = open(path, "wb")
+        try:
+            self._file = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        except BaseException:
+            self._raw.close()
+            raise
+
+    def prepare(self, record: dict) -> bytes:
+        return dumps_line(record)
+
+    def chunk_size(self, item: bytes) -> int:
+        return len(item)
+
+    def write(self, items: List[bytes]) -> None:
+        self._file.write(b"".join(items))
+
+    def size(self) -> int:
+        return self._raw.tell()
+
+    def close(self) -> None:
+        self._file.close()
+        self._raw.close()
+
+
+class _ParquetFile:
+    encoding = {"format": "parquet", "compression": "snappy"}
+    suffix = ".parquet"
+
+    def __init__(self, path: str, schema: dict) -> None:
+        self._schema = arrow_schema(schema)
+        self._nested = [
+            name for name, property_schema in schema.get("properties", {}).items()
+            if _is_nested(property_schema)
+        ]
+        self._raw = open(path, "wb")
+        try:
+            self._writer = pyarrow.parquet.ParquetWriter(self._raw, self._schema)
+        except BaseException:
+            self._raw.close()
+            raise
+
+    def prepare(self, record: dict) -> dict:
+        for name in self._nested:
+            if record.get(name) is not None:
+                record[name] = json.dumps(record[name], default=str)
+        return record
+
+    def chunk_size(self, item: dict) -> int:
+        # Rough in-memory size; only used to cut chunks.
+        return 64 * len(item)
+
+    def write(self, items: List[dict]) -> None:
+        self._writer.write_table(pyarrow.Table.from_pylist(items, schema=self._schema))
+
+    def size(self) -> int:
+        return self._raw.tell()
+
+    def close(self) -> None:
+        self._writer.close()
+        self._raw.close()
+
+
+class _PartitionFile:
+    """Open output file of one stream partition and its queued chunk."""
+
+    def __init__(self, path: str, file_type, schema: dict) -> None:
+        self.path = path
+        self.file = file_type(path, schema)
+        self.records = 0
+        self._chunk: List[Any] = []
+        self._chunk_size = 0
+        self._future: Optional[Future] = None
+
+    def add(self, record: dict) -> bool:
+        """Queue ``record``; return whether the chunk is full."""
+        item = self.file.prepare(record)
+        self._chunk.append(item)
+        self._chunk_size += self.file.chunk_size(item)
+        self.records += 1
+        return self._chunk_size >= CHUNK_SIZE
+
+    def submit(self, executor: ThreadPoolExecutor) -> None:
+        """Hand the chunk to the pool once the previous one is written."""
+        self.wait()
+        if self._chunk:
+            self._future = executor.submit(self.file.write, self._chunk)
+            self._chunk, self._chunk_size = [], 0
+
+    def wait(self) -> None:
+        if self._future is not None:
+            self._future.result()
+            self._future = None
+
+    def finish(self) -> None:
+        self.wait()
+        if self._chunk:
+            self.file.write(self._chunk)
+            self._chunk = []
+        self.file.close()
+
+
+class FileSink:
+    """Write records to rotating, partitioned files and announce them on stdout."""
+
+    def __init__(
+        self,
+        writer: MessageWriter,
+        output_dir: str,
+        output_format: str = DEFAULT_FORMAT,
+        partition_by_company: bool = False,
+        max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+        max_workers: int = DEFAULT_WRITER_CONCURRENCY,
+        commit_interval: float = DEFAULT_COMMIT_INTERVAL,
+    ) -> None:
+        if output_format == "parquet":
+            if pyarrow is None:
+                raise RuntimeError(
+                    "output_format 'parquet' requires pyarrow "
+                    "(pip install tap-dynamics-bc[parquet])."
+                )
+            self.file_type = _ParquetFile
+        elif output_format == DEFAULT_FORMAT:
+            self.file_type = _JsonlFile
+        else:
+            raise RuntimeError(f"Unsupported output_format: {output_format!r}")
+        self.writer = writer
+        self.output_dir = output_dir
+        self.partition_by_company = partition_by_company
+        self.max_file_size = max_file_size
+        self.commit_interval = commit_interval
+        self.run_id = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self._files: Dict[Tuple[str, Optional[str]], _PartitionFile] = {}
+        self._parts: Dict[Tuple[str, Optional[str]], int] = {}
+        self._state: Optional[bytes] = None
+        self._committed_at = time.monotonic()
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="file-sink"
+        )
+
+    def _partition(self, record: dict) -> Optional[str]:
+        if not self.partition_by_company:
+            return None
+        return str(record.get("company_id") or "none")
+
+    def _open(self, stream: str, partition: Optional[str], schema: dict) -> _PartitionFile:
+        key = (stream, partition)
+        part = self._parts.get(key, 0)
+        self._parts[key] = part + 1
+        directory = os.path.join(self.output_dir, stream, *([partition] if partition else []))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"{stream}-{self.run_id}-{part:05d}{self.file_type.suffix}"
+        )
+        partition_file = _PartitionFile(path, self.file_type, schema)
+        self._files[key] = partition_file
+        return partition_file
+
+    def write(self, stream: str, record: dict, schema: dict) -> None:
+        """Queue a record of ``stream``; checkpoint when its file is full."""
+        with self._lock:
+            partition = self._partition(record)
+            partition_file = self._files.get((stream, partition))
+            if partition_file is None:
+                partition_file = self._open(stream, partition, schema)
+            if partition_file.add(record):
+                partition_file.submit(self._executor)
+                if partition_file.file.size() >= self.max_file_size:
+                    self.checkpoint()
+
+    def write_state(self, state_message: singer.StateMessage) -> None:
+        """Hold ``state_message`` until the records it covers are in finished files."""
+        line = format_message(state_message)
+        with self._lock:
+            self._state = line
+            if time.monotonic() - self._committed_at >= self.commit_interval:
+                self.checkpoint()
+
+    def checkpoint(self, inline: bool = False) -> None:
+        """Finish every open file, then write its BATCH message and the held STATE.
+
+        With ``inline`` the files are finished on the calling thread rather
+        than through the writer pool.
+        """
+        with self._lock:
+            files, self._files = self._files, {}
+            if inline:
+                for partition_file in files.values():
+                    partition_file.finish()
+            else:
+                futures = [
+                    self._executor.submit(partition_file.finish)
+                    for partition_file in files.values()
+                ]
+                for future in futures:
+                    future.result()
+            for (stream, _), partition_file in files.items():
+                self.writer.write_message(
+                    BatchMessage(
+                        stream,
+                        dict(self.file_type.encoding),
+                        [Path(partition_file.path).absolute().as_uri()],
+                    )
+                )
+            if self._state is not None:
+                self.writer.write(self._state)
+                self._state = None
+            self.writer.flush()
+            self._committed_at = time.monotonic()
+
+    def close(self) -> None:
+        """Write the last chunks, close every file and write the final BATCH and STATE."""
+        try:
+            self.checkpoint(inline=True)
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+def get_file_sink(config: dict, writer: MessageWriter) -> Optional[FileSink]:
+    """Return the process-wide sink when ``output_dir`` is set, creating it once."""
+    global _sink
+    if not config.get("output_dir"):
+        return None
+    with _sink_lock:
+        if _sink is None:
+            commit_interval = config.get("output_commit_interval")
+            _sink = FileSink(
+                writer,
+                config["output_dir"],
+                config.get("output_format") or DEFAULT_FORMAT,
+                bool(config.get("output_partition_by_company")),
+                int(config.get("output_max_file_size") or DEFAULT_MAX_FILE_SIZE),
+                int(config.get("output_writer_concurrency") or DEFAULT_WRITER_CONCURRENCY),
+                DEFAULT_COMMIT_INTERVAL if commit_interval is None else float(commit_interval),
+            )
+        return _sink
+
+
+def close_file_sink() -> None:
+    """Close the process-wide sink, if any; the next ``get_file_sink`` opens a new one."""
+    global _sink
+    with _sink_lock:
+        sink, _sink = _sink, None
+    if sink is not None:
+        sink.close()
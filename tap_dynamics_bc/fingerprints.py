@@ -0,0 +1,329 @@
+"""Change detection for the rolling posting-date window of G/L streams.
+
+After the initial sync, the posting-date G/L streams re-read the last
+``report_periods`` months on every run, because entries can still be posted
+into open periods. With ``enable_change_detection``, :class:`FingerprintMixin`
+keeps a local index of the rows already emitted, mapping each entry key to a
+hash of its content, and drops rows whose content has not changed since.
+
+The index holds three columns per stream and company, sorted by key hash:
+key hash and content hash (``array('Q')``) and posting month (``array('I')``,
+as ``YYYYMM``). It is saved as a flat binary file under
+``change_detection_dir`` once a partition has been emitted completely,
+without the entries posted before the window, so its size follows the
+window rather than the whole history. Twenty bytes per entry keep millions
+of entries cheap to load and look up.
+
+With ``change_detection_month_precheck``, the months of the window are first
+checked with ``$count`` queries sent together in one ``$batch`` call: each
+month's row count, then, for the months whose count is unchanged and whose
+rows are in the index, the number of rows modified since the last check.
+Months whose count is unchanged and that have no modified rows are not
+requested at all.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+
+from tap_dynamics_bc.serialization import write_json_atomic
+
+_MAGIC = b"TDBCFP2\n"
+_HEADER = struct.Struct("<8sQ")
+_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def _digest(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def key_hash(key: Any) -> int:
+    """Return the 64-bit hash of an entry key."""
+    return _digest(str(key).encode("utf-8"))
+
+
+def content_hash(row: dict) -> int:
+    """Return the 64-bit hash of a row's content."""
+    return _digest(json.dumps(row, sort_keys=True, default=str).encode("utf-8"))
+
+
+def posting_month(value: Any) -> int:
+    """Return the month of an ISO date or datetime as ``YYYYMM``; 0 when unknown."""
+    if isinstance(value, datetime.date):
+        return value.year * 100 + value.month
+    try:
+        return int(value[:4]) * 100 + int(value[5:7])
+    except (TypeError, ValueError):
+        return 0
+
+
+class FingerprintIndex:
+    """Sorted, array-backed map of entry key hash to content hash and posting month.
+
+    Lookups bisect the loaded columns; rows changed during the run are kept in
+    a dict and merged into the columns by :meth:`save`.
+    """
+
+    def __init__(
+        self,
+        keys: Optional[array] = None,
+        hashes: Optional[array] = None,
+        months: Optional[array] = None,
+    ) -> None:
+        self.keys = keys if keys is not None else array("Q")
+        self.hashes = hashes if hashes is not None else array("Q")
+        self.months = months if months is not None else array("I")
+        self._updates: Dict[int, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def posted_months(self) -> set:
+        """Return the posting months (``YYYYMM``) of the loaded entries."""
+        return set(self.months)
+
+    def _get(self, key: int) -> Optional[int]:
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.hashes[position]
+        return None
+
+    def changed(self, key: Any, row: dict, month: int = 0) -> bool:
+        """Record ``row`` posted in ``month`` (``YYYYMM``); return whether it is new or changed."""
+        hashed_key = key_hash(key)
+        digest = content_hash(row)
+        update = self._updates.get(hashed_key)
+        previous = update[0] if update is not None else self._get(hashed_key)
+        if previous == digest:
+            return False
+        self._updates[hashed_key] = (digest, month)
+        return True
+
+    def _merged(self, keep_since: int) -> Tuple[array, array, array]:
+        keys, hashes, months = array("Q"), array("Q"), array("I")
+
+        def keep(position: int) -> None:
+            if self.months[position] >= keep_since:
+                keys.append(self.keys[position])
+                hashes.append(self.hashes[position])
+                months.append(self.months[position])
+
+        position = 0
+        for key, (digest, month) in sorted(self._updates.items()):
+            while position < len(self.keys) and self.keys[position] < key:
+                keep(position)
+                position += 1
+            if position < len(self.keys) and self.keys[position] == key:
+                position += 1
+            if month >= keep_since:
+                keys.append(key)
+                hashes.append(digest)
+                months.append(month)
+        for index in range(position, len(self.keys)):
+            keep(index)
+        return keys, hashes, months
+
+    @classmethod
+    def load(cls, path: str) -> "FingerprintIndex":
+        """Read the index at ``path``; a missing or unreadable file yields an empty one."""
+        try:
+            with open(path, "rb") as index_file:
+                magic, count = _HEADER.unpack(index_file.read(_HEADER.size))
+                if magic != _MAGIC:
+                    return cls()
+                keys, hashes, months = array("Q"), array("Q"), array("I")
+                keys.fromfile(index_file, count)
+                hashes.fromfile(index_file, count)
+                months.fromfile(index_file, count)
+        except (OSError, EOFError, struct.error):
+            return cls()
+        return cls(keys, hashes, months)
+
+    def save(self, path: str, keep_since: int = 0) -> None:
+        """Merge the rows recorded during the run and write the index atomically.
+
+        Entries posted before ``keep_since`` (``YYYYMM``) are dropped.
+        """
+        self.keys, self.hashes, self.months = self._merged(keep_since)
+        self._updates = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".bin")
+        try:
+            with os.fdopen(fd, "wb") as index_file:
+                index_file.write(_HEADER.pack(_MAGIC, len(self.keys)))
+                self.keys.tofile(index_file)
+                self.hashes.tofile(index_file)
+                self.months.tofile(index_file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def window_months(report_periods: int, today: Optional[datetime.date] = None) -> List[datetime.datetime]:
+    """Return the first day of each month of the rolling window, oldest first."""
+    today = today or datetime.date.today()
+    current = datetime.datetime.combine(today.replace(day=1), datetime.datetime.min.time())
+    return [current - relativedelta(months=back) for back in reversed(range(report_periods))]
+
+
+def months_filter(field: str, months: Iterable[datetime.datetime]) -> str:
+    """Return a ``$filter`` selecting the rows whose ``field`` is in ``months``."""
+    return " or ".join(
+        f"({field} ge {month.strftime(_TIMESTAMP_FORMAT)} and "
+        f"{field} lt {(month + relativedelta(months=1)).strftime(_TIMESTAMP_FORMAT)})"
+        for month in months
+    )
+
+
+class FingerprintMixin:
+    """Emit only new or changed rows of a rolling posting-date window.
+
+    Mix into a posting-date G/L stream ahead of its other bases, so the index
+    wraps every way the stream pages. The stream must provide
+    ``_is_initial_sync``; its window filter is narrowed to the changed months
+    through :meth:`restrict_to_changed_months`.
+    """
+
+    # Row field identifying an entry; None disables change detection.
+    fingerprint_key: Optional[str] = "id"
+    # Timestamp field used by the month pre-check.
+    modified_field = "lastModifiedDateTime"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Open partitions by company id: their index and the months requested.
+        self._fingerprint_partitions: Dict[Any, dict] = {}
+
+    @property
+    def change_detection_enabled(self) -> bool:
+        return bool(self.fingerprint_key and self.config.get("enable_change_detection"))
+
+    def _fingerprint_path(self, context: Optional[dict]) -> str:
+        directory = self.config.get("change_detection_dir") or os.path.join(
+            tempfile.gettempdir(), "tap-dynamics-bc-fingerprints"
+        )
+        environment = self.config.get("environment_name", "Production").lower()
+        company_id = (context or {}).get("company_id")
+        return os.path.join(directory, f"{environment}-{self.name}-{company_id}.bin")
+
+    def _load_months(self, path: str) -> Dict[str, dict]:
+        try:
+            with open(f"{path}.months.json") as months_file:
+                return json.load(months_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _precheck_months(
+        self, context: dict, path: str, index: FingerprintIndex
+    ) -> Tuple[Optional[List[datetime.datetime]], Dict[str, dict]]:
+        """Return the months of the window that changed since the last run.
+
+        Returns ``(None, {})`` when the pre-check is disabled, and the counts
+        to store once the partition has been emitted otherwise. Months without
+        entries in ``index`` are changed unless they are still empty; their
+        modified rows are not counted.
+        """
+        if not self.config.get("change_detection_month_precheck"):
+            return None, {}
+        checked_at = datetime.datetime.now(datetime.timezone.utc).strftime(_TIMESTAMP_FORMAT)
+        previous = self._load_months(path)
+        indexed = index.posted_months()
+        months = window_months(self.config.get("report_periods", 3))
+        month_filters = [months_filter(self.replication_key, [month]) for month in months]
+        counts = dict(zip(months, self._fetch_counts(context, month_filters)))
+        candidates = [
+            (month, month_filter)
+            for month, month_filter in zip(months, month_filters)
+            if counts[month] is not None
+            and previous.get(month.strftime("%Y-%m"), {}).get("count") == counts[month]
+            and (counts[month] == 0 or posting_month(month) in indexed)
+        ]
+        modified: List[Optional[int]] = []
+        if candidates:
+            modified = self._fetch_counts(
+                context,
+                [
+                    f"({month_filter}) and {self.modified_field} gt "
+                    f"{previous[month.strftime('%Y-%m')]['checked_at']}"
+                    for month, month_filter in candidates
+                ],
+            )
+        unchanged = {
+            month for (month, _), count in zip(candidates, modified) if count == 0
+        }
+        changed = [month for month in months if month not in unchanged]
+        self.logger.info(
+            "%s: %d of %d months changed for company %s",
+            self.name, len(changed), len(months), context.get("company_id"),
+        )
+        return changed, {
+            month.strftime("%Y-%m"): {"count": count, "checked_at": checked_at}
+            for month, count in counts.items()
+            if count is not None
+        }
+
+    def restrict_to_changed_months(self, params: dict, context: Optional[dict]) -> dict:
+        """Narrow the window ``$filter`` of ``params`` to the changed months."""
+        partition = self._fingerprint_partitions.get((context or {}).get("company_id"))
+        months = partition and partition.get("months")
+        if months and params.get("$filter"):
+            params["$filter"] = (
+                f"({params['$filter']}) and "
+                f"({months_filter(self.replication_key, months)})"
+            )
+        return params
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        if not self.change_detection_enabled or not context:
+            yield from super().request_records(context)
+            return
+        path = self._fingerprint_path(context)
+        index = FingerprintIndex.load(path)
+        months, counts = None, {}
+        if not self._is_initial_sync(context):
+            months, counts = self._precheck_months(context, path, index)
+            if months == []:
+                self.logger.info(
+                    "%s: window unchanged for company %s, skipping",
+                    self.name, context.get("company_id"),
+                )
+                return
+        partition = {"index": index, "months": months}
+        self._fingerprint_partitions[context.get("company_id")] = partition
+        try:
+            yield from super().request_records(context)
+            # Every row of the partition has been written: persist what was
+            # seen, without the months that left the window.
+            oldest = window_months(self.config.get("report_periods", 3))[0]
+            partition["index"].save(path, keep_since=posting_month(oldest))
+            if counts:
+                write_json_atomic(f"{path}.months.json", counts)
+        finally:
+            self._fingerprint_partitions.pop(context.get("company_id"), None)
+
+    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
+        row = super().post_process(row, context)
+        if row is None or not self.change_detection_enabled:
+            return row
+        partition = self._fingerprint_partitions.get((context or {}).get("company_id"))
+        if partition is None or self.fingerprint_key not in row:
+            return row
+        month = posting_month(row.get(self.replication_key))
+        if not partition["index"].changed(row[self.fingerprint_key], row, month):
+            return None
+        return row
@@ -0,0 +1,155 @@
+"""OData ``$batch`` support for Dynamics 365 Business Central.
+
+The dimension fallback paths need one small GET per document (lines, header
+dimensions, G/L entry dimensions). Business Central accepts up to 100
+sub-requests in a single ``POST {service root}/$batch``, so those lookups are
+packed into JSON batch requests and the replies are mapped back to the
+originating URL by sub-request id.
+
+The service answers with the JSON batch format when the request is sent as
+``application/json``. Older environments may still reply with
+``multipart/mixed``, so both reply formats are parsed.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+from tap_dynamics_bc.serialization import loads, response_json
+
+# Business Central rejects batches with more than 100 operations.
+MAX_BATCH_REQUESTS = 100
+
+_BOUNDARY_RE = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_STATUS_LINE_RE = re.compile(r"^HTTP/\d(?:\.\d)?\s+(\d{3})")
+
+
+class BatchItemResult(Dict[str, Any]):
+    """Typed-dict-like container for one ``$batch`` sub-response.
+
+    Keys:
+        id: sub-request id as sent in the batch payload.
+        status: HTTP status code of the sub-response.
+        body: decoded JSON body, the raw text when it is not JSON, or ``None``.
+    """
+
+
+def chunked(items: List[Any], size: int = MAX_BATCH_REQUESTS) -> Iterable[List[Any]]:
+    """Yield consecutive slices of ``items`` holding at most ``size`` entries."""
+    for index in range(0, len(items), size):
+        yield items[index : index + size]
+
+
+def relative_to_service_root(url: str, service_root: str) -> str:
+    """Return ``url`` relative to ``service_root`` when it lives under it.
+
+    Batch sub-requests are resolved against the service root, so absolute
+    URLs built by the streams are trimmed to their relative form. URLs outside
+    the root are returned unchanged (OData also accepts absolute URLs).
+    """
+    root = service_root.rstrip("/") + "/"
+    if url.startswith(root):
+        return url[len(root) :]
+    return url
+
+
+def build_batch_payload(urls: List[str], service_root: str) -> Dict[str, Any]:
+    """Build a JSON ``$batch`` body with one GET sub-request per URL.
+
+    Sub-request ids are the positional index of the URL in ``urls``.
+    """
+    if len(urls) > MAX_BATCH_REQUESTS:
+        raise ValueError(
+            f"A $batch request holds at most {MAX_BATCH_REQUESTS} operations, "
+            f"got {len(urls)}."
+        )
+    return {
+        "requests": [
+            {
+                "id": str(index),
+                "method": "GET",
+                "url": relative_to_service_root(url, service_root),
+                "headers": {"Accept": "application/json"},
+            }
+            for index, url in enumerate(urls)
+        ]
+    }
+
+
+def _decode_body(body: Any) -> Any:
+    if isinstance(body, str):
+        stripped = body.strip()
+        if not stripped:
+            return None
+        try:
+            return loads(stripped)
+        except ValueError:
+            return stripped
+    return body
+
+
+def _parse_json_batch(payload: Dict[str, Any]) -> Dict[str, BatchItemResult]:
+    results: Dict[str, BatchItemResult] = {}
+    for item in payload.get("responses", []):
+        item_id = str(item.get("id"))
+        results[item_id] = BatchItemResult(
+            id=item_id,
+            status=int(item.get("status", 0)),
+            body=_decode_body(item.get("body")),
+        )
+    return results
+
+
+def _parse_multipart_batch(text: str, boundary: str) -> Dict[str, BatchItemResult]:
+    results: Dict[str, BatchItemResult] = {}
+    position = 0
+    for part in text.replace("\r\n", "\n").split(f"--{boundary}"):
+        part = part.strip("\n")
+        if not part or part == "--":
+            continue
+        part_headers, _, http_message = part.partition("\n\n")
+        content_id = None
+        for line in part_headers.splitlines():
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-id":
+                content_id = value.strip()
+        status_block, _, body = http_message.partition("\n\n")
+        match = _STATUS_LINE_RE.match(status_block.strip())
+        if not match:
+            continue
+        item_id = content_id if content_id is not None else str(position)
+        results[item_id] = BatchItemResult(
+            id=item_id, status=int(match.group(1)), body=_decode_body(body)
+        )
+        position += 1
+    return results
+
+
+def parse_batch_response(response: requests.Response) -> Dict[str, BatchItemResult]:
+    """Parse a ``$batch`` reply into sub-responses keyed by sub-request id.
+
+    Handles both the JSON batch format and ``multipart/mixed``. Sub-requests
+    missing from the reply (e.g. the service stopped at the first error) are
+    simply absent from the returned mapping.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    if content_type.startswith("multipart/"):
+        match = _BOUNDARY_RE.search(content_type)
+        if not match:
+            raise ValueError(f"Missing multipart boundary in {content_type!r}")
+        return _parse_multipart_batch(response.text, match.group(1))
+    return _parse_json_batch(response_json(response))
+
+
+def is_retriable_item(item: Optional[BatchItemResult]) -> bool:
+    """Return True when a sub-response failed with a throttling/transient error."""
+    if item is None:
+        return True
+    status = item["status"]
+    if status == 429 or 500 <= status < 600:
+        return True
+    return status == 400 and "Please try again later." in json.dumps(item["body"])
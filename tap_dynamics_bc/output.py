@@ -0,0 +1,123 @@
+"""Buffered Singer message output.
+
+``singer.write_message`` serializes every message with ``simplejson`` and
+writes and flushes stdout once per message. :class:`MessageWriter` collects
+serialized messages instead and writes them to stdout in one call once
+``output_buffer_size`` bytes are pending or ``output_flush_interval`` seconds
+have passed since the last write. STATE and SCHEMA messages always flush:
+a STATE message reaches stdout right after the records it covers, never
+before them and never later than itself.
+
+When `orjson <https://github.com/ijl/orjson>`_ is installed (the
+``fast-json`` extra) messages are serialized with it; messages it cannot
+serialize (e.g. ``Decimal`` values) fall back to ``simplejson``, as in
+``singer.format_message``.
+"""
+
+from __future__ import annotations
+
+import atexit
+import sys
+import threading
+import time
+from typing import Any, List, Optional
+
+import simplejson
+import singer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+DEFAULT_BUFFER_SIZE = 0
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+_writer_lock = threading.Lock()
+_writer: Optional["MessageWriter"] = None
+
+
+def dumps_line(payload: Any) -> bytes:
+    """Return ``payload`` as one newline-terminated JSON line."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            pass
+    # What singer.format_message uses.
+    return (simplejson.dumps(payload, use_decimal=True) + "\n").encode("utf-8")
+
+
+def format_message(message: singer.Message) -> bytes:
+    """Return ``message`` as one newline-terminated JSON line."""
+    return dumps_line(message.asdict())
+
+
+class MessageWriter:
+    """Write serialized Singer messages to stdout in buffered chunks.
+
+    A ``buffer_size`` of 0 writes and flushes every message, like
+    ``singer.write_message``. stdout is looked up on every flush so it can be
+    redirected after the writer is created.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ) -> None:
+        self.buffer_size = max(0, buffer_size)
+        self.flush_interval = flush_interval
+        self._lines: List[bytes] = []
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.RLock()
+
+    def write(self, line: bytes, flush: bool = False) -> None:
+        """Queue a serialized message; write the buffer out when it is due."""
+        with self._lock:
+            self._lines.append(line)
+            self._pending += len(line)
+            if (
+                flush
+                or self._pending >= self.buffer_size
+                or time.monotonic() - self._flushed_at >= self.flush_interval
+            ):
+                self.flush()
+
+    def write_message(self, message: singer.Message, flush: bool = False) -> None:
+        self.write(format_message(message), flush)
+
+    def flush(self) -> None:
+        """Write every queued message to stdout and flush it."""
+        with self._lock:
+            self._flushed_at = time.monotonic()
+            if not self._lines:
+                return
+            data = b"".join(self._lines)
+            self._lines, self._pending = [], 0
+            stdout = sys.stdout
+            binary = getattr(stdout, "buffer", None)
+            if binary is not None:
+                # Text written through sys.stdout so far must come first.
+                stdout.flush()
+                binary.write(data)
+                binary.flush()
+            else:
+                stdout.write(data.decode("utf-8"))
+                stdout.flush()
+
+
+def get_message_writer(config: dict) -> MessageWriter:
+    """Return the process-wide writer, creating it from ``config`` once."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            buffer_size = config.get("output_buffer_size")
+            flush_interval = config.get("output_flush_interval")
+            _writer = MessageWriter(
+                DEFAULT_BUFFER_SIZE if buffer_size is None else int(buffer_size),
+                DEFAULT_FLUSH_INTERVAL if flush_interval is None else float(flush_interval),
+            )
+            atexit.register(_writer.flush)
+        return _writer
@@ -0,0 +1,80 @@
+"""Adaptive page sizing for Business Central list requests.
+
+Each (stream, company) pair owns a :class:`PageSizeController`. It follows
+an AIMD policy: full pages answered well below the target latency grow the
+page size by a fixed step (additive increase), and pages slower than the
+target shrink it in proportion to the overshoot, by at most half
+(multiplicative decrease). A read timeout halves it. The observed response
+size also caps the page so one page stays under a byte budget.
+
+The learned sizes are persisted in the stream state (``page_sizes``, keyed by
+company id), so the next run starts from them instead of relearning.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+# Business Central refuses odata.maxpagesize values above 20,000.
+MAX_PAGE_SIZE = 20000
+MIN_PAGE_SIZE = 10
+DEFAULT_TARGET_LATENCY = 30.0
+DEFAULT_TARGET_PAGE_BYTES = 32 * 1024 * 1024
+
+
+class PageSizeController:
+    """AIMD page-size controller for one stream and company."""
+
+    def __init__(
+        self,
+        default_size: int,
+        *,
+        initial_size: Optional[int] = None,
+        target_latency: float = DEFAULT_TARGET_LATENCY,
+        target_bytes: int = DEFAULT_TARGET_PAGE_BYTES,
+        minimum: int = MIN_PAGE_SIZE,
+        maximum: int = MAX_PAGE_SIZE,
+    ) -> None:
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.target_latency = target_latency
+        self.target_bytes = target_bytes
+        self.increase_step = max(minimum, default_size // 4)
+        self.page_size = self._clamp(initial_size or default_size)
+
+    def _clamp(self, size: float) -> int:
+        return int(min(self.maximum, max(self.minimum, size)))
+
+    def on_timeout(self) -> bool:
+        """Halve the page size after a read timeout.
+
+        Returns False when the size is already at the minimum, i.e. retrying
+        with a smaller page is not possible.
+        """
+        smaller = self._clamp(self.page_size // 2)
+        if smaller >= self.page_size:
+            return False
+        self.page_size = smaller
+        return True
+
+    def observe(self, requested_size: int, rows: int, latency: float, nbytes: int) -> int:
+        """Adjust the page size from one page fetched at ``requested_size``.
+
+        Args:
+            requested_size: Page size the request was sent with.
+            rows: Number of rows in the page.
+            latency: Seconds the request took.
+            nbytes: Size of the response body.
+
+        Returns:
+            The new page size.
+        """
+        size = self.page_size
+        if latency > self.target_latency:
+            size = size * max(0.5, self.target_latency / latency)
+        elif rows >= requested_size and latency < self.target_latency / 2:
+            size = size + self.increase_step
+        if rows and nbytes:
+            size = min(size, self.target_bytes / (nbytes / rows))
+        self.page_size = self._clamp(size)
+        return self.page_size
@@ -0,0 +1,186 @@
+"""Catalog-driven ``$select`` / ``$expand`` projection for Business Central.
+
+Every stream downloads all columns of an entity (and of its expanded
+navigation properties) by default, even when the catalog selects only a few
+fields. When ``select_catalog_fields`` is enabled, the stream's catalog
+selection is turned into OData query options:
+
+* deselected top-level properties are left out of a ``$select`` clause;
+* deselected navigation properties are dropped from ``$expand``;
+* selected navigation properties get a nested ``($select=...)`` built from the
+  selection of their item properties (e.g. ``salesInvoiceLines`` or
+  ``dimensionSetLines``).
+
+A ``$select`` is only sent for a level where at least one schema property is
+deselected, so fully selected entities are requested exactly as before.
+Primary keys, the replication key and any stream-specific required fields are
+always kept.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+Breadcrumb = Tuple[str, ...]
+
+
+class ExpandNode(Dict[str, Any]):
+    """Typed-dict-like container for one navigation property in ``$expand``.
+
+    Keys:
+        expand: nested navigation properties, keyed by name.
+        options: other query options of the item (e.g. ``$filter=...``), verbatim.
+        select: properties for a nested ``$select``, or ``None`` for all.
+    """
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    parts: List[str] = []
+    depth = 0
+    current = []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == separator and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+def parse_expand(expand: Optional[str]) -> Dict[str, ExpandNode]:
+    """Parse an ``$expand`` value into a tree of :class:`ExpandNode`.
+
+    Repeated items (``lines, lines($expand=dimensionSetLines)``) are merged.
+    """
+    tree: Dict[str, ExpandNode] = {}
+    for item in _split_top_level(expand or "", ","):
+        name, _, rest = item.partition("(")
+        name = name.strip()
+        node = tree.setdefault(name, ExpandNode(expand={}, options=[], select=None))
+        for option in _split_top_level(rest[:-1] if rest else "", ";"):
+            key, _, value = option.partition("=")
+            if key.strip() == "$expand":
+                for child_name, child in parse_expand(value).items():
+                    node["expand"].setdefault(child_name, child)
+            elif option not in node["options"]:
+                node["options"].append(option)
+    return tree
+
+
+def format_expand(tree: Mapping[str, ExpandNode]) -> str:
+    """Serialize an expand tree back to an ``$expand`` value."""
+    items = []
+    for name, node in tree.items():
+        options = list(node["options"])
+        if node["select"] is not None:
+            options.append("$select=" + ",".join(node["select"]))
+        if node["expand"]:
+            options.append("$expand=" + format_expand(node["expand"]))
+        items.append(f"{name}({';'.join(options)})" if options else name)
+    return ",".join(items)
+
+
+def _select_level(
+    properties: Mapping[str, Any],
+    mask: Mapping[Breadcrumb, bool],
+    breadcrumb: Breadcrumb,
+    navigation: Iterable[str],
+    required: Iterable[str],
+    excluded: Iterable[str],
+) -> Tuple[Optional[List[str]], bool]:
+    """Return the ``$select`` list for one level and whether annotations are kept.
+
+    The list is ``None`` when nothing at this level is deselected.
+    """
+    navigation = set(navigation)
+    required = set(required)
+    excluded = set(excluded)
+    selected = []
+    any_deselected = False
+    keeps_annotations = False
+    for name in properties:
+        if name in navigation or name in excluded:
+            continue
+        is_selected = name in required or mask[breadcrumb + ("properties", name)]
+        if not is_selected:
+            any_deselected = True
+        elif "@" in name:
+            # OData annotations (e.g. picture@odata.mediaReadLink) are not
+            # selectable and are only returned with odata.metadata=minimal.
+            keeps_annotations = True
+        else:
+            selected.append(name)
+    if not any_deselected or not selected:
+        return None, keeps_annotations
+    return selected, keeps_annotations
+
+
+def _project_expand(
+    tree: Dict[str, ExpandNode],
+    properties: Mapping[str, Any],
+    mask: Mapping[Breadcrumb, bool],
+    breadcrumb: Breadcrumb,
+) -> Tuple[Dict[str, ExpandNode], bool]:
+    projected: Dict[str, ExpandNode] = {}
+    keeps_annotations = False
+    for name, node in tree.items():
+        nav_breadcrumb = breadcrumb + ("properties", name)
+        if not mask[nav_breadcrumb]:
+            continue
+        schema = properties.get(name) or {}
+        if "items" in schema:
+            schema = schema["items"]
+            nav_breadcrumb = nav_breadcrumb + ("items",)
+        item_properties = schema.get("properties") or {}
+        child_tree, child_annotations = _project_expand(
+            node["expand"], item_properties, mask, nav_breadcrumb
+        )
+        select, level_annotations = _select_level(
+            item_properties, mask, nav_breadcrumb, node["expand"], (), ()
+        )
+        projected[name] = ExpandNode(
+            expand=child_tree, options=node["options"], select=select
+        )
+        keeps_annotations = keeps_annotations or child_annotations or level_annotations
+    return projected, keeps_annotations
+
+
+def build_projection(
+    schema: Mapping[str, Any],
+    mask: Mapping[Breadcrumb, bool],
+    expand: Optional[str],
+    required: Iterable[str] = (),
+    excluded: Iterable[str] = (),
+) -> Tuple[Optional[str], Optional[str], bool]:
+    """Build ``$select`` and ``$expand`` values from a catalog selection.
+
+    Args:
+        schema: The stream's JSON schema.
+        mask: The stream's selection mask (``Stream.mask``).
+        expand: The ``$expand`` value the stream would send without projection.
+        required: Properties that must always be requested.
+        excluded: Schema properties that are not returned by the service
+            (e.g. values copied from the partition context).
+
+    Returns:
+        A ``(select, expand, keeps_annotations)`` tuple. ``select`` is ``None``
+        when every property is selected. ``keeps_annotations`` tells whether a
+        selected property is an OData annotation, in which case the response
+        must keep ``odata.metadata=minimal``.
+    """
+    properties = schema.get("properties") or {}
+    requested = parse_expand(expand)
+    tree, keeps_annotations = _project_expand(requested, properties, mask, ())
+    select, level_annotations = _select_level(
+        properties, mask, (), requested, required, excluded
+    )
+    return (
+        ",".join(select) if select is not None else None,
+        format_expand(tree) or None,
+        keeps_annotations or level_annotations,
+    )
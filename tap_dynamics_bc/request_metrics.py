@@ -0,0 +1,340 @@
+"""Per-request HTTP metrics.
+
+Every HTTP call the tap makes is timed: pages and ``_call_api`` lookups
+(through ``_request``), ``$batch`` posts, the environment list and the OData
+``$metadata`` document. Each call yields one :class:`RequestMetric` holding
+its stream, company, endpoint kind, requested page size, status, retries,
+response bytes and latency. The latency is the wall time of the call,
+including waits for the environment's scheduler and throttle pauses, since
+that is the time the sync spends on it.
+
+Streams log each metric as a Singer ``METRIC`` (an ``http_request_duration``
+timer, subject to ``metrics_log_level``). The process-wide
+:class:`RequestMetrics` also aggregates them per stream and company when
+``request_metrics_prometheus_path`` (a node_exporter textfile) or
+``request_metrics_summary_path`` (a JSON run summary with p50/p95/p99
+latencies) is set. Both files are rewritten every
+``request_metrics_write_interval`` seconds and when the tap exits.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import datetime
+import math
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from tap_dynamics_bc.serialization import write_json_atomic, write_text_atomic
+
+# Endpoint kinds.
+KIND_PAGE = "page"
+KIND_CALL = "call"
+KIND_BATCH = "batch"
+KIND_ENVIRONMENTS = "environments"
+KIND_METADATA = "metadata"
+
+DEFAULT_WRITE_INTERVAL = 60.0
+QUANTILES = (0.5, 0.95, 0.99)
+PROMETHEUS_PREFIX = "tap_dynamics_bc"
+
+_COMPANY_RE = re.compile(r"companies\(([^)]+)\)|Company\('((?:[^']|'')*)'\)")
+_PAGE_SIZE_RE = re.compile(r"odata\.maxpagesize=(\d+)")
+
+_local = threading.local()
+_metrics_lock = threading.Lock()
+_metrics: Optional["RequestMetrics"] = None
+
+
+@contextlib.contextmanager
+def request_kind(kind: str) -> Iterator[None]:
+    """Label the requests this thread sends within the block as ``kind``."""
+    previous = getattr(_local, "kind", None)
+    _local.kind = kind
+    try:
+        yield
+    finally:
+        _local.kind = previous
+
+
+def current_kind() -> str:
+    return getattr(_local, "kind", None) or KIND_PAGE
+
+
+def note_backoff(tries: int) -> None:
+    """Remember that the next request of this thread is a backoff retry."""
+    _local.tries = tries
+
+
+def take_backoff_tries() -> int:
+    """Return (and clear) the failed tries preceding this thread's request."""
+    tries = getattr(_local, "tries", 0)
+    _local.tries = 0
+    return tries
+
+
+def company_of(context: Optional[Mapping[str, Any]], url: str) -> str:
+    """Return the company a request belongs to, or ``""`` when there is none."""
+    if context and context.get("company_id"):
+        return str(context["company_id"])
+    match = _COMPANY_RE.search(url)
+    if not match:
+        return ""
+    return match.group(1) or match.group(2).replace("''", "'")
+
+
+def page_size_of(url: str, headers: Mapping[str, str]) -> Optional[int]:
+    """Return the page size a request asked for (``$top`` or ``maxpagesize``)."""
+    top = parse_qs(urlsplit(url).query).get("$top")
+    if top:
+        return int(top[0])
+    match = _PAGE_SIZE_RE.search(headers.get("Prefer", ""))
+    return int(match.group(1)) if match else None
+
+
+def percentile(values: List[float], quantile: float) -> Optional[float]:
+    """Return the nearest-rank ``quantile`` of sorted ``values``."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(quantile * len(values)) - 1)]
+
+
+class RequestMetric:
+    """One timed HTTP call."""
+
+    __slots__ = (
+        "bytes",
+        "company",
+        "error",
+        "kind",
+        "latency",
+        "page_size",
+        "retries",
+        "status",
+        "stream",
+    )
+
+    def __init__(
+        self,
+        stream: str,
+        company: str,
+        kind: str,
+        page_size: Optional[int],
+        status: Optional[int],
+        retries: int,
+        bytes: int,
+        latency: float,
+        error: Optional[str] = None,
+    ) -> None:
+        self.stream = stream
+        self.company = company
+        self.kind = kind
+        self.page_size = page_size
+        self.status = status
+        self.retries = retries
+        self.bytes = bytes
+        self.latency = latency
+        self.error = error
+
+    @property
+    def failed(self) -> bool:
+        return self.status is None or self.status >= 400
+
+    def singer_metric(self) -> Dict[str, Any]:
+        """Return the metric as a Singer ``http_request_duration`` timer."""
+        tags: Dict[str, Any] = {
+            "stream": self.stream,
+            "company": self.company,
+            "kind": self.kind,
+            "page_size": self.page_size,
+            "http_status_code": self.status,
+            "status": "failed" if self.failed else "succeeded",
+            "retries": self.retries,
+            "bytes": self.bytes,
+        }
+        if self.error:
+            tags["error"] = self.error
+        return {
+            "type": "timer",
+            "metric": "http_request_duration",
+            "value": round(self.latency, 6),
+            "tags": tags,
+        }
+
+
+class _Series:
+    """Aggregated metrics of one stream and company."""
+
+    def __init__(self) -> None:
+        self.requests: Counter = Counter()
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.latencies = array("d")
+
+    def add(self, metric: RequestMetric) -> None:
+        status = "error" if metric.status is None else str(metric.status)
+        self.requests[(metric.kind, status)] += 1
+        self.errors += metric.failed
+        self.retries += metric.retries
+        self.bytes += metric.bytes
+        self.seconds += metric.latency
+        self.latencies.append(metric.latency)
+
+    def merge(self, other: "_Series") -> None:
+        self.requests.update(other.requests)
+        self.errors += other.errors
+        self.retries += other.retries
+        self.bytes += other.bytes
+        self.seconds += other.seconds
+        self.latencies.extend(other.latencies)
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        kinds: Counter = Counter()
+        for (kind, _), count in self.requests.items():
+            kinds[kind] += count
+        summary: Dict[str, Any] = {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "kinds": dict(kinds),
+        }
+        for quantile in QUANTILES:
+            value = percentile(latencies, quantile)
+            summary[f"p{round(quantile * 100)}"] = None if value is None else round(value, 4)
+        return summary
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestMetrics:
+    """Aggregate request metrics per stream and company and write them out."""
+
+    def __init__(
+        self,
+        prometheus_path: Optional[str] = None,
+        summary_path: Optional[str] = None,
+        write_interval: float = DEFAULT_WRITE_INTERVAL,
+    ) -> None:
+        self.prometheus_path = prometheus_path
+        self.summary_path = summary_path
+        self.write_interval = write_interval
+        self.enabled = bool(prometheus_path or summary_path)
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._written_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, metric: RequestMetric) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            key = (metric.stream, metric.company)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.add(metric)
+            due = time.monotonic() - self._written_at >= self.write_interval
+            if due:
+                self._written_at = time.monotonic()
+        if due:
+            self.write()
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the run summary: totals, then per stream and per company."""
+        streams: Dict[str, Dict[str, Any]] = {}
+        totals: Dict[str, _Series] = {}
+        with self._lock:
+            for (stream, company), company_series in sorted(self._series.items()):
+                total = totals.setdefault(stream, _Series())
+                total.merge(company_series)
+                entry = streams.setdefault(stream, {"companies": {}})
+                entry["companies"][company] = company_series.summary()
+        run = _Series()
+        for stream, total in totals.items():
+            streams[stream].update(total.summary())
+            run.merge(total)
+        return {
+            "started_at": self.started_at.isoformat(),
+            "written_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            **run.summary(),
+            "streams": streams,
+        }
+
+    def prometheus_text(self) -> str:
+        """Return the aggregated metrics in the Prometheus text format."""
+        with self._lock:
+            series = sorted(self._series.items())
+            latencies = {key: sorted(value.latencies) for key, value in series}
+        prefix = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {prefix}_requests_total HTTP requests sent by the tap.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        for (stream, company), value in series:
+            for (kind, status), count in sorted(value.requests.items()):
+                lines.append(
+                    f'{prefix}_requests_total{{stream="{_label(stream)}",'
+                    f'company="{_label(company)}",kind="{kind}",status="{status}"}} {count}'
+                )
+        counters = (
+            ("request_retries_total", "Retried HTTP requests.", "retries"),
+            ("response_bytes_total", "Bytes of HTTP response bodies.", "bytes"),
+        )
+        for name, help_text, attribute in counters:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for (stream, company), value in series:
+                lines.append(
+                    f'{prefix}_{name}{{stream="{_label(stream)}",company="{_label(company)}"}} '
+                    f"{getattr(value, attribute)}"
+                )
+        lines.append(f"# HELP {prefix}_request_duration_seconds HTTP request latency.")
+        lines.append(f"# TYPE {prefix}_request_duration_seconds summary")
+        for (stream, company), value in series:
+            labels = f'stream="{_label(stream)}",company="{_label(company)}"'
+            for quantile in QUANTILES:
+                lines.append(
+                    f'{prefix}_request_duration_seconds{{{labels},quantile="{quantile}"}} '
+                    f"{percentile(latencies[(stream, company)], quantile)}"
+                )
+            lines.append(f"{prefix}_request_duration_seconds_sum{{{labels}}} {value.seconds}")
+            lines.append(
+                f"{prefix}_request_duration_seconds_count{{{labels}}} {len(value.latencies)}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        """Rewrite the configured Prometheus textfile and JSON summary."""
+        if self.prometheus_path:
+            write_text_atomic(self.prometheus_path, self.prometheus_text(), suffix=".prom")
+        if self.summary_path:
+            write_json_atomic(self.summary_path, self.summary(), indent=2)
+
+
+def get_request_metrics(config: Mapping[str, Any]) -> RequestMetrics:
+    """Return the process-wide collector, creating it from ``config`` once."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            write_interval = config.get("request_metrics_write_interval")
+            _metrics = RequestMetrics(
+                config.get("request_metrics_prometheus_path"),
+                config.get("request_metrics_summary_path"),
+                DEFAULT_WRITE_INTERVAL if write_interval is None else float(write_interval),
+            )
+            if _metrics.enabled:
+                atexit.register(_metrics.write)
+        return _metrics
@@ -0,0 +1,118 @@
+"""Shared request scheduler for one Business Central environment.
+
+Business Central enforces its rate and concurrency limits per environment,
+not per stream. Every request the tap sends goes through the
+:class:`RequestScheduler` of its environment, which provides:
+
+* a token bucket capping requests per second (``max_requests_per_second``);
+* a cap on requests in flight at once (``max_requests_in_flight``);
+* a shared pause: when the service answers ``429`` (or ``503``) with a
+  ``Retry-After`` header, every caller waits until that moment instead of
+  each retrying on its own backoff schedule.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import email.utils
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+# Fallback pause when a throttled response carries no usable Retry-After.
+DEFAULT_RETRY_AFTER = 5.0
+# Upper bound for a single pause, in case of a bogus Retry-After value.
+MAX_RETRY_AFTER = 300.0
+DEFAULT_MAX_IN_FLIGHT = 5
+
+_registry_lock = threading.Lock()
+_schedulers: Dict[Tuple[str, str], "RequestScheduler"] = {}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return the delay in seconds of a ``Retry-After`` header value.
+
+    Accepts both the delta-seconds and the HTTP-date forms. Returns ``None``
+    when the value is missing or cannot be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RequestScheduler:
+    """Token bucket, in-flight limit and shared pause for one environment."""
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    ) -> None:
+        self.requests_per_second = requests_per_second or None
+        self.burst = max(1.0, self.requests_per_second or 1.0)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max(1, max_in_flight))
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request of the environment for ``seconds``."""
+        seconds = min(max(0.0, seconds), MAX_RETRY_AFTER)
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_for_token(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._paused_until - now
+                if delay <= 0 and self.requests_per_second:
+                    self._tokens = min(
+                        self.burst,
+                        self._tokens + (now - self._refilled_at) * self.requests_per_second,
+                    )
+                    self._refilled_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    delay = (1 - self._tokens) / self.requests_per_second
+                elif delay <= 0:
+                    return
+            time.sleep(delay)
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """Wait for a free in-flight slot and a token, then hold the slot."""
+        with self._in_flight:
+            self._wait_for_token()
+            yield
+
+
+def get_scheduler(
+    environment: Tuple[str, str],
+    requests_per_second: Optional[float] = None,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+) -> RequestScheduler:
+    """Return the process-wide scheduler of ``environment``.
+
+    ``environment`` is a ``(tenant, environment name)`` pair. The limits of the
+    first caller win; all streams of a run share the same configuration.
+    """
+    with _registry_lock:
+        scheduler = _schedulers.get(environment)
+        if scheduler is None:
+            scheduler = RequestScheduler(requests_per_second, max_in_flight)
+            _schedulers[environment] = scheduler
+        return scheduler
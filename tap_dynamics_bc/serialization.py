@@ -0,0 +1,85 @@
+"""JSON decoding helpers shared by the Business Central streams.
+
+Each page body is decoded once and the result is cached on the
+``requests.Response`` object. Record parsing, pagination and the dimension
+fallbacks all read that cached payload instead of calling
+``response.json()`` again.
+
+When `orjson <https://github.com/ijl/orjson>`_ is installed (``pip install
+tap-dynamics-bc[fast-json]``) it is used as the decoder. Otherwise the standard
+library ``json`` module is used.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from typing import Any, Optional, Union
+
+import requests
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Attribute used to cache the decoded body on a ``requests.Response``.
+_PAYLOAD_ATTR = "_tap_dynamics_bc_payload"
+_MISSING = object()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode a JSON document, preferring orjson when it is available."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than the stdlib (e.g. integers above 64 bits).
+            pass
+    return json.loads(data)
+
+
+def response_json(response: requests.Response) -> Any:
+    """Return the decoded body of ``response``, decoding it at most once."""
+    payload = getattr(response, _PAYLOAD_ATTR, _MISSING)
+    if payload is _MISSING:
+        payload = loads(response.content)
+        setattr(response, _PAYLOAD_ATTR, payload)
+    return payload
+
+
+def set_response_json(response: requests.Response, payload: Any) -> requests.Response:
+    """Replace the decoded body of ``response`` without re-serializing it."""
+    setattr(response, _PAYLOAD_ATTR, payload)
+    return response
+
+
+def write_text_atomic(path: str, text: str, suffix: str = ".tmp") -> None:
+    """Write ``text`` to ``path`` so readers never see a partial file.
+
+    The text is written to a temporary file in the same directory and moved
+    over ``path`` with ``os.replace``. An existing file keeps its
+    permissions; new files are created with mode 0600.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=suffix)
+    try:
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except OSError:
+            pass
+        with os.fdopen(fd, "w") as tmp_file:
+            tmp_file.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, payload: Any, indent: Optional[int] = None) -> None:
+    """Write ``payload`` as JSON to ``path``; see :func:`write_text_atomic`."""
+    write_text_atomic(path, json.dumps(payload, indent=indent), suffix=".json")
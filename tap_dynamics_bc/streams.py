@@ -1,21 +1,40 @@
 """Stream type classes for tap-dynamics-bc."""
 
-import json
-from typing import Optional, cast, Any, Dict
+import contextlib
+import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Optional, cast
 from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+import pendulum
 import requests
+from backports.cached_property import cached_property
+from dateutil.relativedelta import relativedelta
 from hotglue_singer_sdk import typing as th
 from hotglue_singer_sdk.exceptions import FatalAPIError
-import datetime
+
+from tap_dynamics_bc.backfill import BackfillWindowMixin
+from tap_dynamics_bc.batching import (
+    DEFAULT_MAX_FILTER_LENGTH,
+    BatchedChildSync,
+    eq_clause,
+    or_filter,
+)
 from tap_dynamics_bc.client import (
     BC_DEFAULT_MODIFIED_SENTINEL,
-    dynamicsBcStream,
-    DynamicsBCODataStream,
     DynamicsBCAnalyticsStream,
+    DynamicsBCODataStream,
+    dynamicsBcStream,
 )
-from dateutil.relativedelta import relativedelta
-import pendulum
-import re
+from tap_dynamics_bc.dedupe import DEFAULT_MAX_BYTES as DEFAULT_DEDUPE_MAX_BYTES
+from tap_dynamics_bc.dedupe import BoundedSeenSet
+from tap_dynamics_bc.dimension_sets import get_dimension_set_cache
+from tap_dynamics_bc.environments import api_host
+from tap_dynamics_bc.fingerprints import FingerprintMixin
+from tap_dynamics_bc.serialization import response_json, set_response_json
+
 
 class CompaniesStream(dynamicsBcStream):
     """Define custom stream."""
@@ -23,6 +42,7 @@ class CompaniesStream(dynamicsBcStream):
     name = "companies"
     path = "/companies"
     primary_keys = ["id"]
+    projection_required_fields = ["name"]
     replication_key = None
 
     schema = th.PropertiesList(
@@ -72,6 +92,14 @@ class CompaniesStream(dynamicsBcStream):
                 f"Company unacessible: '{record['name']}' ({record['id']})."
             )
 
+    def get_child_threads(self) -> int:
+        """Return how many company partitions are synced concurrently.
+
+        Child streams run one company per worker thread; output and state
+        writes are serialized in ``dynamicsBcStream``.
+        """
+        return max(1, int(self.config.get("max_company_concurrency", 1)))
+
     def _sync_children(self, child_context: dict):
         if child_context is not None:
             super()._sync_children(child_context)
@@ -121,7 +149,7 @@ class ItemsStream(dynamicsBcStream):
     replication_key = "lastModifiedDateTime"
     parent_stream_type = CompaniesStream
     expand = "itemCategory,picture"
-    page_size = 1000
+    default_page_size = 1000
 
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
@@ -188,25 +216,7 @@ class _InvoiceDimensionExpansionMixin:
         message = str(error)
         return any(marker in message for marker in self._DIMENSION_EXPANSION_ERROR_MARKERS)
 
-    def _call_api(self, url):
-        headers = self.http_headers
-        if self.authenticator:
-            headers.update(self.authenticator.auth_headers or {})
-
-        prepared_request = cast(
-            requests.PreparedRequest,
-            self.requests_session.prepare_request(
-                requests.Request(
-                    method="GET",
-                    url=url,
-                    headers=headers,
-                ),
-            ),
-        )
-        decorated_request = self.request_decorator(self._request)
-        return decorated_request(prepared_request, {})
-
-    def _make_request_with_dimension_fallback(self, context, next_page_token):
+    def _make_page_request(self, context, next_page_token):
         try:
             prepared_request = self.prepare_request(
                 context, next_page_token=next_page_token
@@ -221,14 +231,14 @@ class _InvoiceDimensionExpansionMixin:
         """Handle dimension expansion failure by fetching invoices in batches."""
         self.logger.warning(
             "Dimension expansion failed for %s: %s. "
-            "Now trying to fetch records in batches of 200.",
+            "Now trying to fetch records in batches.",
             self.name,
             error,
         )
 
         base_url = prepared_request.url.split("?")[0]
         ids_resp = self._fetch_record_ids(prepared_request)
-        record_ids = [record["id"] for record in ids_resp.json()["value"]]
+        record_ids = [record["id"] for record in response_json(ids_resp)["value"]]
         enriched_records = self._fetch_records_in_batches(base_url, record_ids)
         return self._create_enriched_response(ids_resp, enriched_records)
 
@@ -241,55 +251,40 @@ class _InvoiceDimensionExpansionMixin:
         ids_url = urlunparse(parsed._replace(query=urlencode(params, doseq=True)))
         return self._call_api(ids_url)
 
-    def _fetch_records_in_batches(self, base_url, record_ids, batch_size=200):
-        all_records = []
-
-        for index in range(0, len(record_ids), batch_size):
-            batch = record_ids[index : index + batch_size]
-            batch_records = self._fetch_batch_with_dimensions(
-                base_url, batch, index, len(record_ids)
-            )
-            all_records.extend(batch_records)
-
-        return all_records
+    def _fetch_records_in_batches(self, base_url, record_ids):
+        return self._fetch_by_ids(
+            lambda batch: self._fetch_batch_with_dimensions(base_url, batch),
+            lambda batch: self._fetch_batch_without_dimensions(base_url, batch),
+            record_ids,
+        )
 
-    def _fetch_batch_with_dimensions(self, base_url, batch_ids, batch_index, total_ids):
-        """Attempt to fetch a batch of invoices with full dimension expansion."""
-        filter_clause = " or ".join([f"id eq {record_id}" for record_id in batch_ids])
+    def _fetch_batch_with_dimensions(self, base_url, batch_ids):
+        """Fetch a batch of invoices with full dimension expansion."""
+        filter_clause = or_filter("id", batch_ids, quote=False)
         batch_url = f"{base_url}?{urlencode({'$filter': filter_clause, '$expand': self.expand})}"
-
-        try:
-            batch_resp = self._call_api(batch_url)
-            self.logger.info(
-                "Batch %s of %s fetched successfully for %s",
-                batch_index,
-                total_ids,
-                self.name,
-            )
-            return batch_resp.json()["value"]
-        except Exception as error:
-            self.logger.warning(
-                "Failed to fetch batch with dimensions for %s: %s",
-                self.name,
-                error,
-            )
-            return self._fetch_batch_without_dimensions(
-                base_url, batch_ids, filter_clause, batch_index
-            )
+        batch_resp = self._call_api(batch_url)
+        self.logger.info(
+            "Fetched %s %s records with dimensions", len(batch_ids), self.name
+        )
+        return response_json(batch_resp)["value"]
 
     def _lines_with_dimensions_expand(self) -> str:
         return f"{self.lines_property}($expand=dimensionSetLines)"
 
-    def _fetch_batch_without_dimensions(
-        self, base_url, batch_ids, filter_clause, batch_index
-    ):
+    def _fetch_batch_without_dimensions(self, base_url, batch_ids):
         """Fallback: fetch lines with dimensions, then enrich header dimensions."""
+        self.logger.warning(
+            "Fetching %s %s records without header dimension expansion",
+            len(batch_ids),
+            self.name,
+        )
+        filter_clause = or_filter("id", batch_ids, quote=False)
         lines_expand = self._lines_with_dimensions_expand()
         try:
             records_resp = self._call_api(
                 f"{base_url}?{urlencode({'$filter': filter_clause, '$expand': lines_expand})}"
             )
-            records = records_resp.json()["value"]
+            records = response_json(records_resp)["value"]
         except Exception as error:
             self.logger.warning(
                 "Failed to fetch batch with lines and dimensions for %s: %s",
@@ -300,81 +295,98 @@ class _InvoiceDimensionExpansionMixin:
                 records_resp = self._call_api(
                     f"{base_url}?{urlencode({'$filter': filter_clause})}"
                 )
-                records = records_resp.json()["value"]
-                for record in records:
-                    record[self.lines_property] = self._fetch_lines(base_url, record["id"])
+                records = response_json(records_resp)["value"]
+                lines = self._fetch_lines(base_url, [record["id"] for record in records])
+                for record, record_lines in zip(records, lines):
+                    record[self.lines_property] = record_lines
             except Exception as inner_error:
                 self.logger.warning(
-                    "Failed to fetch records for batch %s of %s: %s",
-                    batch_index,
+                    "Failed to fetch a batch of %s %s records: %s",
+                    len(batch_ids),
                     self.name,
                     inner_error,
                 )
                 return []
 
-        for record in records:
-            self._enrich_record_dimensions(base_url, record)
-
+        self._enrich_records_dimensions(base_url, records)
         return records
 
-    def _enrich_record_dimensions(self, base_url, record):
-        record["dimensionSetLines"] = self._fetch_header_dimensions(
-            base_url, record["id"]
+    def _enrich_records_dimensions(self, base_url, records):
+        dimensions = self._fetch_header_dimensions(
+            base_url, [record["id"] for record in records]
         )
+        for record, record_dimensions in zip(records, dimensions):
+            record["dimensionSetLines"] = record_dimensions
 
-    def _fetch_lines(self, base_url, record_id):
+    def _fetch_lines(self, base_url, record_ids):
+        """Fetch document lines for each record id through OData $batch."""
         lines_expand = self._lines_with_dimensions_expand()
-        try:
-            record_resp = self._call_api(
+        bodies = self._call_api_batch(
+            [
                 f"{base_url}({record_id})?{urlencode({'$expand': lines_expand})}"
-            )
-            return record_resp.json().get(self.lines_property, [])
-        except Exception as error:
+                for record_id in record_ids
+            ]
+        )
+        missing = [
+            index for index, body in enumerate(bodies) if not isinstance(body, dict)
+        ]
+        if missing:
             self.logger.warning(
-                "Failed to fetch %s with dimensions for %s record %s: %s",
+                "Failed to fetch %s with dimensions for %s of %s %s records, "
+                "retrying without dimensions.",
                 self.lines_property,
+                len(missing),
+                len(record_ids),
                 self.name,
-                record_id,
-                error,
             )
-            try:
-                lines_resp = self._call_api(
-                    f"{base_url}({record_id})/{self.lines_property}"
-                )
-                return lines_resp.json()["value"]
-            except Exception as fallback_error:
+            fallback_bodies = self._call_api_batch(
+                [
+                    f"{base_url}({record_ids[index]})/{self.lines_property}"
+                    for index in missing
+                ]
+            )
+            for index, body in zip(missing, fallback_bodies):
+                if isinstance(body, dict):
+                    bodies[index] = {self.lines_property: body.get("value", [])}
+                else:
+                    self.logger.warning(
+                        "Failed to fetch %s for %s record %s",
+                        self.lines_property,
+                        self.name,
+                        record_ids[index],
+                    )
+
+        return [
+            body.get(self.lines_property, []) if isinstance(body, dict) else []
+            for body in bodies
+        ]
+
+    def _fetch_header_dimensions(self, base_url, record_ids):
+        """Fetch header dimensionSetLines for each record id through OData $batch."""
+        bodies = self._call_api_batch(
+            [f"{base_url}({record_id})/dimensionSetLines" for record_id in record_ids]
+        )
+        dimensions = []
+        for record_id, body in zip(record_ids, bodies):
+            if not isinstance(body, dict):
                 self.logger.warning(
-                    "Failed to fetch %s for %s record %s: %s",
-                    self.lines_property,
+                    "Failed to fetch header dimensions for %s record %s",
                     self.name,
                     record_id,
-                    fallback_error,
                 )
-                return []
-
-    def _fetch_header_dimensions(self, base_url, record_id):
-        try:
-            dimensions_resp = self._call_api(
-                f"{base_url}({record_id})/dimensionSetLines"
-            )
-            return dimensions_resp.json()["value"]
-        except Exception as error:
-            self.logger.warning(
-                "Failed to fetch header dimensions for %s record %s: %s",
-                self.name,
-                record_id,
-                error,
-            )
-            return []
+            dimensions.append(body.get("value", []) if isinstance(body, dict) else [])
+        return dimensions
 
     def _create_enriched_response(self, original_response, enriched_data):
-        data = original_response.json()
+        """Attach the (streamed) enriched records to the response's decoded payload."""
+        data = dict(response_json(original_response))
         data["value"] = enriched_data
-        original_response._content = json.dumps(data).encode()
-        return original_response
+        return set_response_json(original_response, data)
 
 
-class SalesInvoicesStream(_InvoiceDimensionExpansionMixin, dynamicsBcStream):
+class SalesInvoicesStream(
+    _InvoiceDimensionExpansionMixin, BackfillWindowMixin, dynamicsBcStream
+):
     """Define custom stream."""
 
     name = "sales_invoices"
@@ -384,27 +396,9 @@ class SalesInvoicesStream(_InvoiceDimensionExpansionMixin, dynamicsBcStream):
     parent_stream_type = CompaniesStream
     expand = "dimensionSetLines, salesInvoiceLines($expand=dimensionSetLines)"
     lines_property = "salesInvoiceLines"
-    page_size = 1000
-    _default_page_size = 1000
-
-    @property
-    def timeout(self) -> int:
-        # lower timeout since we have adaptive page size logic below
-        return 120
-
-    def make_request(self, context, next_page_token):
-        # Reset page size on each company's first page (one stream instance, many companies).
-        if next_page_token is None:
-            self.page_size = self._default_page_size
-        try:
-            return self.make_request_with_adaptive_page_size(context, next_page_token)
-        except FatalAPIError as error:
-            if self._is_dimension_expansion_error(error):
-                prepared_request = self.prepare_request(
-                    context, next_page_token=next_page_token
-                )
-                return self._handle_dimension_failure(error, prepared_request)
-            raise
+    default_page_size = 1000
+    # lower timeout since we have adaptive page size logic
+    default_timeout = 120
 
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
@@ -678,10 +672,7 @@ class PurchaseInvoicesStream(_InvoiceDimensionExpansionMixin, dynamicsBcStream):
     parent_stream_type = CompaniesStream
     expand = "purchaseInvoiceLines, dimensionSetLines, purchaseInvoiceLines($expand=dimensionSetLines)"
     lines_property = "purchaseInvoiceLines"
-    page_size = 1000
-
-    def make_request(self, context, next_page_token):
-        return self._make_request_with_dimension_fallback(context, next_page_token)
+    default_page_size = 1000
 
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
@@ -1049,7 +1040,7 @@ class SalesOrdersStream(dynamicsBcStream):
     def get_child_context(self, record, context):
         return {"company_id": context["company_id"], "company_name": context["company_name"]}
 
-class GeneralLedgerEntriesStream(dynamicsBcStream):
+class GeneralLedgerEntriesStream(FingerprintMixin, dynamicsBcStream):
     """Define custom stream."""
 
     name = "general_ledger_entries"
@@ -1058,7 +1049,8 @@ class GeneralLedgerEntriesStream(dynamicsBcStream):
     replication_key = "postingDate"
     parent_stream_type = CompaniesStream
     expand = "dimensionSetLines"
-    synced_doc_nos = set()
+    # documentNumber keys the vendor ledger lookups, entryNumber the dimension-set cache.
+    projection_required_fields = ["documentNumber", "entryNumber"]
 
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
@@ -1093,10 +1085,96 @@ class GeneralLedgerEntriesStream(dynamicsBcStream):
         )),
     ).to_dict()
     
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Per running partition (company id): document numbers whose vendor
+        # ledger entries were synced, and the batched lookups if enabled.
+        self._synced_doc_nos: Dict[str, BoundedSeenSet] = {}
+        self._doc_no_batchers: Dict[str, BatchedChildSync] = {}
+
     def _is_initial_sync(self, context: dict) -> bool:
         bookmark_date = self.get_starting_timestamp(context)
         configured_start = pendulum.parse(self.config.get("start_date"))
         return bookmark_date == configured_start
+
+    def get_records(self, context: Optional[dict]):
+        """Return the partition's records while its document numbers are tracked.
+
+        Wraps every paging path (including the backfill windows of
+        ``general_ledger_entries_incremental``), since children are synced
+        while these records are iterated.
+        """
+        with self._tracking_document_numbers(context):
+            yield from super().get_records(context)
+
+    @contextlib.contextmanager
+    def _tracking_document_numbers(self, context: Optional[dict]):
+        """Track the partition's synced document numbers.
+
+        Document numbers are deduplicated per company in a memory-capped set
+        that is released, and its size reported, when the partition ends.
+
+        With ``batch_vendor_ledger_lookups``, document numbers are collected
+        while paging and vendor ledger entries are fetched for many of them at
+        once in the background; the last batches are awaited when the
+        partition ends, or cancelled if it fails.
+        """
+        if not context:
+            yield
+            return
+        company_id = context["company_id"]
+        vendor_ledger_entries = next(
+            (
+                child_stream
+                for child_stream in self.child_streams
+                if child_stream.name == "vendor_ledger_entries"
+                and (child_stream.selected or child_stream.has_selected_descendents)
+            ),
+            None,
+        )
+        batcher = None
+        if vendor_ledger_entries is not None and self.config.get("batch_vendor_ledger_lookups"):
+            batcher = BatchedChildSync(
+                vendor_ledger_entries,
+                {"company_id": company_id, "company_name": context["company_name"]},
+                key="gl_doc_nos",
+                field="Document_No",
+                max_length=int(
+                    self.config.get("max_filter_length") or DEFAULT_MAX_FILTER_LENGTH
+                ),
+            )
+            self._doc_no_batchers[company_id] = batcher
+        synced_doc_nos = BoundedSeenSet(
+            int(self.config.get("doc_no_dedupe_max_bytes") or DEFAULT_DEDUPE_MAX_BYTES)
+        )
+        self._synced_doc_nos[company_id] = synced_doc_nos
+        try:
+            try:
+                yield
+            except BaseException:
+                # Don't sync lookups for a partition that failed, and don't
+                # let a lookup error hide the one that stopped it.
+                if batcher is not None:
+                    batcher.cancel()
+                raise
+            if batcher is not None:
+                batcher.close()
+        finally:
+            self._doc_no_batchers.pop(company_id, None)
+            self._synced_doc_nos.pop(company_id, None)
+            self._write_metric_log(
+                {
+                    "type": "gauge",
+                    "metric": "doc_no_dedupe",
+                    "value": synced_doc_nos.nbytes,
+                    "tags": {
+                        "stream": self.name,
+                        "entries": len(synced_doc_nos),
+                        "forgotten": synced_doc_nos.forgotten,
+                    },
+                },
+                extra_tags={"context": context},
+            )
     
     def get_url_params(
         self, context: Optional[dict], next_page_token: Optional[Any]
@@ -1112,6 +1190,7 @@ class GeneralLedgerEntriesStream(dynamicsBcStream):
             date = (beginning_of_month - relativedelta(months=report_periods - 1)).strftime("%Y-%m-%dT%H:%M:%SZ")
             self.logger.info(f"Not initial sync, fetching GL entries for last {report_periods} months, starting from {date}")
             params["$filter"] = f"{self.replication_key} gt {date}"
+            self.restrict_to_changed_months(params, context)
         else:
             self.logger.info("Initial sync, fetching GL entries for all time")
             start_date = self.get_starting_timestamp(context)
@@ -1126,29 +1205,7 @@ class GeneralLedgerEntriesStream(dynamicsBcStream):
             params["$skiptoken"] = next_page_token.split("$skiptoken=")[-1]
         return params
 
-    def _call_api(self, url):
-        # Use proper authentication headers
-        headers = self.http_headers
-        if self.authenticator:
-            headers.update(self.authenticator.auth_headers or {})
-
-        # Use prepare_request for consistent authentication and retry logic
-        prepared_request = cast(
-            requests.PreparedRequest,
-            self.requests_session.prepare_request(
-                requests.Request(
-                    method="GET",
-                    url=url,
-                    headers=headers,
-                ),
-            ),
-        )
-        # Use the SDK's request method with all retry logic
-        decorated_request = self.request_decorator(self._request)
-        response = decorated_request(prepared_request, {})
-        return response
-    
-    def make_request(self, context, next_page_token):
+    def _make_page_request(self, context, next_page_token):
         """Make request with fallback logic for dimension expansion failures."""        
         try:
             prepared_request = self.prepare_request(
@@ -1158,87 +1215,117 @@ class GeneralLedgerEntriesStream(dynamicsBcStream):
             return resp
         except FatalAPIError as e:
             if "Dimension Value does not exist" in str(e):
-                return self._handle_dimension_failure(e, prepared_request)
+                return self._handle_dimension_failure(e, prepared_request, context)
             else:
                 # Re-raise the error if it's not dimension-related
                 raise
 
-    def _handle_dimension_failure(self, error, prepared_request):
+    def _handle_dimension_failure(self, error, prepared_request, context=None):
         """Handle dimension expansion failure by fetching data in batches."""
         self.logger.warning(
             f"Dimension expansion failed for {self.name}: {str(error)}. "
-            "Now trying to fetch GL entries in batches of 200."
+            "Now trying to fetch GL entries in batches."
         )
         
         base_url = prepared_request.url.split('?')[0]
         gl_ids_resp = self._fetch_gl_ids(prepared_request)
-        gl_ids = [_gl_id["id"] for _gl_id in gl_ids_resp.json()["value"]]
+        gl_ids = [_gl_id["id"] for _gl_id in response_json(gl_ids_resp)["value"]]
         
-        all_gls = self._fetch_gl_entries_in_batches(base_url, gl_ids)
-        return self._create_enriched_response(gl_ids_resp, all_gls)
+        enriched_gls = self._fetch_gl_entries_in_batches(
+            base_url, gl_ids, dimension_sets=get_dimension_set_cache(self, context)
+        )
+        return self._create_enriched_response(gl_ids_resp, enriched_gls)
 
     def _fetch_gl_ids(self, prepared_request):
         """Fetch only GL entry IDs to minimize data transfer."""
-        ids_url = prepared_request.url.replace('expand=dimensionSetLines', 'select=id')
+        parsed = urlparse(prepared_request.url)
+        params = parse_qs(parsed.query, keep_blank_values=True)
+        params.pop("$expand", None)
+        params["$select"] = ["id"]
+        ids_url = urlunparse(parsed._replace(query=urlencode(params, doseq=True)))
         return self._call_api(ids_url)
 
-    def _fetch_gl_entries_in_batches(self, base_url, gl_ids, batch_size=200):
-        """Fetch GL entries with dimensions in batches."""
-        all_gls = []
-        
-        for i in range(0, len(gl_ids), batch_size):
-            batch = gl_ids[i:i+batch_size]
-            batch_entries = self._fetch_batch_with_dimensions(base_url, batch, i, len(gl_ids))
-            all_gls.extend(batch_entries)
-            
-        return all_gls
+    def _fetch_gl_entries_in_batches(self, base_url, gl_ids, dimension_sets=None):
+        """Fetch GL entries with dimensions in concurrent batches.
 
-    def _fetch_batch_with_dimensions(self, base_url, batch_ids, batch_index, total_ids):
-        """Attempt to fetch a batch of GL entries with dimensions."""
-        filter_clause = ' or '.join([f"id eq {id}" for id in batch_ids])
-        batch_url = f"{base_url}?{urlencode({'$filter': filter_clause, '$expand': 'dimensionSetLines'})}"
-        
-        try:
-            batch_resp = self._call_api(batch_url)
-            self.logger.info(f"Batch {batch_index} of {total_ids} fetched successfully")
-            return batch_resp.json()["value"]
-        except Exception as e:
-            self.logger.warning(f"Failed to fetch batch with dimensions: {str(e)}")
-            return self._fetch_batch_without_dimensions(base_url, batch_ids, filter_clause, batch_index)
+        Returns the entries lazily, in id order, batch by batch as they arrive.
+        """
+        return self._fetch_by_ids(
+            lambda batch: self._fetch_batch_with_dimensions(base_url, batch),
+            lambda batch: self._fetch_batch_without_dimensions(
+                base_url, batch, dimension_sets
+            ),
+            gl_ids,
+        )
 
-    def _fetch_batch_without_dimensions(self, base_url, batch_ids, filter_clause, batch_index):
-        """Fallback: fetch batch without dimensions, then add dimensions individually."""
+    def _fetch_batch_with_dimensions(self, base_url, batch_ids):
+        """Fetch a batch of GL entries with dimensions."""
+        filter_clause = or_filter("id", batch_ids, quote=False)
+        batch_url = f"{base_url}?{urlencode({'$filter': filter_clause, '$expand': 'dimensionSetLines'})}"
+        batch_resp = self._call_api(batch_url)
+        self.logger.info(f"Fetched {len(batch_ids)} GL entries with dimensions")
+        return response_json(batch_resp)["value"]
+
+    def _fetch_batch_without_dimensions(self, base_url, batch_ids, dimension_sets=None):
+        """Fallback: fetch batch without dimensions, then add dimensions via $batch."""
+        self.logger.warning(f"Fetching {len(batch_ids)} GL entries without dimension expansion")
+        filter_clause = or_filter("id", batch_ids, quote=False)
         try:
             gl_resp = self._call_api(f"{base_url}?{urlencode({'$filter': filter_clause})}")
-            gl_entries = gl_resp.json()["value"]
-            
-            for gl_entry in gl_entries:
-                gl_entry["dimensionSetLines"] = self._fetch_individual_dimensions(base_url, gl_entry['id'])
-                
+            gl_entries = response_json(gl_resp)["value"]
+            dimensions = self._fetch_dimensions(base_url, gl_entries, dimension_sets)
+            for gl_entry, gl_dimensions in zip(gl_entries, dimensions):
+                gl_entry["dimensionSetLines"] = gl_dimensions
+
             return gl_entries
         except Exception as e:
-            self.logger.warning(f"Failed to fetch GL entries for batch {batch_index}: {str(e)}")
+            self.logger.warning(f"Failed to fetch a batch of {len(batch_ids)} GL entries: {str(e)}")
             return []
 
-    def _fetch_individual_dimensions(self, base_url, gl_entry_id):
-        """Fetch dimensions for a single GL entry."""
-        try:
-            dimensions_resp = self._call_api(f"{base_url}({gl_entry_id})/dimensionSetLines")
-            return dimensions_resp.json()["value"]
-        except Exception as e:
-            self.logger.warning(f"Failed to fetch dimensions for GL entry {gl_entry_id}: {str(e)}")
-            return []
+    def _fetch_dimensions(self, base_url, gl_entries, dimension_sets=None):
+        """Return the dimensions of ``gl_entries``, from the dimension set cache if enabled."""
+        if dimension_sets is None:
+            return self._fetch_individual_dimensions(
+                base_url, [gl_entry["id"] for gl_entry in gl_entries]
+            )
+        dimensions = dimension_sets.lines_for_entries(base_url, gl_entries)
+        unresolved = [
+            index for index, gl_dimensions in enumerate(dimensions) if gl_dimensions is None
+        ]
+        if unresolved:
+            fetched = self._fetch_individual_dimensions(
+                base_url, [gl_entries[index]["id"] for index in unresolved]
+            )
+            for index, gl_dimensions in zip(unresolved, fetched):
+                dimensions[index] = gl_dimensions
+        return dimensions
+
+    def _fetch_individual_dimensions(self, base_url, gl_entry_ids):
+        """Fetch dimensions for each GL entry, packed into OData $batch requests."""
+        bodies = self._call_api_batch(
+            [f"{base_url}({gl_entry_id})/dimensionSetLines" for gl_entry_id in gl_entry_ids]
+        )
+        dimensions = []
+        for gl_entry_id, body in zip(gl_entry_ids, bodies):
+            if not isinstance(body, dict):
+                self.logger.warning(f"Failed to fetch dimensions for GL entry {gl_entry_id}")
+            dimensions.append(body.get("value", []) if isinstance(body, dict) else [])
+        return dimensions
 
     def _create_enriched_response(self, original_response, enriched_data):
-        """Create a response object with enriched GL entries data."""
-        data = original_response.json()
+        """Attach the enriched GL entries to the response's decoded payload.
+
+        ``enriched_data`` is streamed: the batches are only fetched while
+        ``parse_response`` iterates the page, so the page is never held whole.
+        """
+        data = dict(response_json(original_response))
         data["value"] = enriched_data
-        original_response._content = json.dumps(data).encode()
-        return original_response
+        return set_response_json(original_response, data)
 
     def get_child_context(self, record, context):
         return {
             "gl_entry_id": record["id"], 
+            "gl_entry_number": record.get("entryNumber"),
             "company_id": context["company_id"], 
             "company_name": context["company_name"], 
             "gl_doc_no": record["documentNumber"]
@@ -1250,20 +1337,31 @@ class GeneralLedgerEntriesStream(dynamicsBcStream):
 
         for child_stream in self.child_streams:
             if child_stream.selected or child_stream.has_selected_descendents:
-                should_not_sync = child_stream.name == "vendor_ledger_entries" and child_context["gl_doc_no"] in self.synced_doc_nos
+                synced_doc_nos = self._synced_doc_nos.get(child_context["company_id"])
+                should_not_sync = (
+                    child_stream.name == "vendor_ledger_entries"
+                    and synced_doc_nos is not None
+                    and child_context["gl_doc_no"] in synced_doc_nos
+                )
                 if not should_not_sync:
-                    child_stream.sync(context=child_context)
-                    self.synced_doc_nos.add(child_context["gl_doc_no"])
+                    batcher = self._doc_no_batchers.get(child_context["company_id"])
+                    if child_stream.name == "vendor_ledger_entries" and batcher:
+                        batcher.add(child_context["gl_doc_no"])
+                    else:
+                        child_stream.sync(context=child_context)
+                    if synced_doc_nos is not None:
+                        synced_doc_nos.add(child_context["gl_doc_no"])
 
 
-class GeneralLedgerEntriesIncrementalStream(GeneralLedgerEntriesStream):
+class GeneralLedgerEntriesIncrementalStream(BackfillWindowMixin, GeneralLedgerEntriesStream):
     name = "general_ledger_entries_incremental"
     path = "/companies({company_id})/generalLedgerEntries"
     primary_keys = ["id"]
     replication_key = "lastModifiedDateTime"
     parent_stream_type = CompaniesStream
     expand = "dimensionSetLines"
-    synced_doc_nos = set()
+    # Incremental by lastModifiedDateTime: there is no window to re-read.
+    fingerprint_key = None
 
     def get_url_params(
         self, context: Optional[dict], next_page_token: Optional[Any]
@@ -1290,10 +1388,8 @@ class _PostingDateWindowMixin:
         configured_start = pendulum.parse(self.config.get("start_date"))
         return bookmark_date == configured_start
 
-    def get_url_params(
-        self, context: Optional[dict], next_page_token: Optional[Any]
-    ) -> Dict[str, Any]:
-        """Return a dictionary of values to be used in URL parameterization."""
+    def get_base_url_params(self, context: Optional[dict]) -> Dict[str, Any]:
+        """Return the postingDate filter shared by every page of a partition."""
         params: dict = {}
         report_periods = self.config.get("report_periods", 3)
 
@@ -1311,6 +1407,7 @@ class _PostingDateWindowMixin:
                 f"months, starting from {date}"
             )
             params["$filter"] = f"{self.replication_key} gt {date}"
+            self.restrict_to_changed_months(params, context)
         else:
             self.logger.info("Initial sync, fetching GL entries for all time")
             start_date = self.get_starting_timestamp(context)
@@ -1320,9 +1417,6 @@ class _PostingDateWindowMixin:
 
         if getattr(self, "expand", None):
             params["$expand"] = self.expand
-        params["$top"] = self.page_size
-        if next_page_token:
-            params["$skip"] = next_page_token
         return params
 
 
@@ -1332,13 +1426,73 @@ class AnalyticsGeneralLedgerEntriesStream(_PostingDateWindowMixin, DynamicsBCAna
     replication_key = "postingDate"
     parent_stream_type = CompaniesStream
 
-
-class BalanceSheetGeneralLedgerEntriesStream(AnalyticsGeneralLedgerEntriesStream):
+    def request_records(self, context: Optional[dict]):
+        """Fetch offset pages concurrently when ``analytics_page_concurrency`` > 1.
+
+        The partition's size is read with ``$count`` and the ``$skip`` offsets
+        of its pages (ordered by key) are fetched up to N at a time, then
+        emitted in order. Rows added after the count, and partitions resumed
+        from a key checkpoint, are paged by key as usual.
+        """
+        concurrency = int(self.config.get("analytics_page_concurrency") or 1)
+        checkpoint_key = self._keyset_checkpoint_key(context)
+        with self._state_lock:
+            resuming = checkpoint_key in self.stream_state.get("keyset_checkpoints", {})
+            # Checkpoints written while emitting offset pages must match the
+            # keyset query that continues after them.
+            self._keyset_filters[checkpoint_key] = self.get_base_url_params(context).get(
+                "$filter"
+            )
+        if concurrency > 1 and not resuming:
+            yield from self._request_offset_pages(context, concurrency)
+        # Continues after the last row fetched above (see _advance_keyset_checkpoint).
+        yield from super().request_records(context)
+
+    def _request_offset_pages(self, context: Optional[dict], concurrency: int):
+        params = self.get_base_url_params(context)
+        total = self._fetch_count(context, params.get("$filter"))
+        if not total:
+            return
+        page_size = self.get_page_size_controller(context).page_size
+        params["$orderby"] = ",".join(self.keyset_keys)
+        params["$top"] = page_size
+        url = self.get_url(context)
+
+        def fetch_page(skip: int):
+            return self._call_api(f"{url}?{urlencode(dict(params, **{'$skip': skip}))}")
+
+        offsets = iter(range(0, total, page_size))
+        self.logger.info(
+            "Fetching %s rows of %s in %s-row pages, %s at a time",
+            total, self.name, page_size, concurrency,
+        )
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # A sliding window of in-flight pages, consumed in offset order.
+            in_flight = deque(
+                executor.submit(fetch_page, skip) for skip in islice(offsets, concurrency)
+            )
+            while in_flight:
+                resp = in_flight.popleft().result()
+                next_skip = next(offsets, None)
+                if next_skip is not None:
+                    in_flight.append(executor.submit(fetch_page, next_skip))
+                rows = response_json(resp).get("value", [])
+                yield from self.parse_response(resp)
+                if rows:
+                    # Rows skipped as unchanged are not written and never move
+                    # the checkpoint; the key paging continues after the last
+                    # row fetched, not the last one written.
+                    self._advance_keyset_checkpoint(rows[-1], context)
+
+
+class BalanceSheetGeneralLedgerEntriesStream(FingerprintMixin, AnalyticsGeneralLedgerEntriesStream):
     """Balance sheet G/L entries from the Analytics API."""
 
     name = "balance_sheet_general_ledger_entries"
     path = "/companies({company_id})/balanceSheetGeneralLedgerEntries"
     primary_keys = ["entryNo", "company_id"]
+    fingerprint_key = "entryNo"
+    modified_field = "systemModifiedAt"
 
     schema = th.PropertiesList(
         th.Property("incomeBalance", th.StringType),
@@ -1357,12 +1511,14 @@ class BalanceSheetGeneralLedgerEntriesStream(AnalyticsGeneralLedgerEntriesStream
     ).to_dict()
 
 
-class IncomeStatementGeneralLedgerEntriesStream(AnalyticsGeneralLedgerEntriesStream):
+class IncomeStatementGeneralLedgerEntriesStream(FingerprintMixin, AnalyticsGeneralLedgerEntriesStream):
     """Income statement G/L entries from the Analytics API."""
 
     name = "income_statement_general_ledger_entries"
     path = "/companies({company_id})/incomeStatementGeneralLedgerEntries"
     primary_keys = ["entryNo", "company_id"]
+    fingerprint_key = "entryNo"
+    modified_field = "systemModifiedAt"
 
     schema = th.PropertiesList(
         th.Property("incomeBalance", th.StringType),
@@ -1403,6 +1559,28 @@ class GLEntriesDimensionsStream(dynamicsBcStream):
         th.Property("gl_entry_id", th.StringType),
     ).to_dict()
 
+    def request_records(self, context: Optional[dict]):
+        """Serve the entry's lines from the dimension set cache when enabled.
+
+        The lines of a set are requested for the first entry using it only;
+        the following entries get a copy with their own ``parentId``.
+        """
+        dimension_sets = get_dimension_set_cache(self, context)
+        set_id = dimension_sets and dimension_sets.dimension_set_id(
+            context.get("gl_entry_number")
+        )
+        if set_id is None:
+            yield from super().request_records(context)
+            return
+        lines = dimension_sets.get(set_id)
+        if lines is None:
+            lines = list(super().request_records(context))
+            if not lines:
+                return
+            dimension_sets.put(set_id, lines)
+        for line in lines:
+            yield dict(line, parentId=context["gl_entry_id"])
+
     def validate_response(self, response: requests.Response) -> None:
         if response.status_code == 404:
             self.logger.info(f"Not able to fetch dimensions for url: '{response.url}'. Error: {response.json().get('error', {}).get('message')}")
@@ -1438,17 +1616,11 @@ class DimensionValuesStream(dynamicsBcStream):
     primary_keys = ["id"]
     parent_stream_type = CompaniesStream
 
-    @property
+    @cached_property
     def url_base(self) -> str:
         """Return the API URL root, configurable via tap settings."""
-        url_template = "https://api.businesscentral.dynamics.com/v2.0/{}/api/microsoft/reportsFinance/beta"
-        env_name = self.config.get("environment_name", "production")
-        if "?" in env_name:
-            env_name = env_name.split("?")
-            if isinstance(env_name, list):
-                env_name = env_name[0]
-        self.validate_env(env_name)
-        return url_template.format(env_name)
+        environment = self.get_environment()
+        return f"{api_host(self.config)}/v2.0/{environment}/api/microsoft/reportsFinance/beta"
 
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
@@ -1469,7 +1641,7 @@ class DimensionValuesStream(dynamicsBcStream):
     def get_child_context(self, record, context):
         return {"company_id": context["company_id"], "company_name": context["company_name"]}
 
-class CustomersStream(dynamicsBcStream):
+class CustomersStream(BackfillWindowMixin, dynamicsBcStream):
     """Define custom stream."""
 
     name = "customers"
@@ -1580,9 +1752,11 @@ class VendorLedgerEntriesStream(DynamicsBCODataStream):
     ):
         """Return a dictionary of values to be used in URL parameterization."""
         params = super().get_url_params(context, next_page_token)
-        # Only replace single quotes that are not already doubled
-        escaped_gl_doc_no = re.sub(r"(?<!')'(?!')", "''", context['gl_doc_no'])
-        params.update({"$filter": f"Document_No eq '{escaped_gl_doc_no}'"})
+        if "gl_doc_nos" in context:
+            # Batched lookup, see GeneralLedgerEntriesStream.request_records.
+            params["$filter"] = or_filter("Document_No", context["gl_doc_nos"])
+        else:
+            params["$filter"] = eq_clause("Document_No", context["gl_doc_no"])
         return params
 
     schema = th.PropertiesList(
@@ -1623,6 +1797,7 @@ class ClosingGeneralLedgerEntriesStream(DynamicsBCAnalyticsStream):
     name = "closing_general_ledger_entries"
     path = "/companies({company_id})/closingGeneralLedgerEntries"
     primary_keys = ["entryNo", "glAccountNo", "company_id"]
+    keyset_keys = ["entryNo", "glAccountNo"]
     replication_key = "systemModifiedAt"
     parent_stream_type = CompaniesStream
 
@@ -7,6 +7,7 @@ from hotglue_singer_sdk import typing as th
 
 from tap_dynamics_bc.auth import TapDynamicsBCAuth
 from tap_dynamics_bc.discover import discover_dynamic_streams
+from tap_dynamics_bc.file_sink import close_file_sink
 
 from tap_dynamics_bc.streams import (
     AccountsStream,
@@ -134,6 +135,336 @@ class TapdynamicsBc(Tap):
             th.ArrayType(th.StringType),
             required=False,
         ),
+        th.Property(
+            "max_company_concurrency",
+            th.IntegerType,
+            required=False,
+            default=1,
+            description=(
+                "Number of companies whose child streams are synced in "
+                "parallel. Defaults to 1 (one company at a time)."
+            ),
+        ),
+        th.Property(
+            "page_prefetch_depth",
+            th.IntegerType,
+            required=False,
+            default=0,
+            description=(
+                "When greater than 0, the next page is fetched in the background "
+                "while the current one is emitted, buffering at most this many "
+                "pages. Defaults to 0 (fetch pages serially)."
+            ),
+        ),
+        th.Property(
+            "backfill_concurrency",
+            th.IntegerType,
+            required=False,
+            default=1,
+            description=(
+                "When greater than 1, long catch-up syncs of sales_invoices, "
+                "general_ledger_entries_incremental and customers are split "
+                "into time windows fetched this many at a time."
+            ),
+        ),
+        th.Property(
+            "backfill_window_days",
+            th.NumberType,
+            required=False,
+            default=30,
+            description="Initial width, in days, of a backfill window.",
+        ),
+        th.Property(
+            "backfill_max_window_records",
+            th.IntegerType,
+            required=False,
+            default=50000,
+            description=(
+                "Backfill windows whose $count exceeds this are split in half."
+            ),
+        ),
+        th.Property(
+            "analytics_page_concurrency",
+            th.IntegerType,
+            required=False,
+            default=1,
+            description=(
+                "When greater than 1, balance sheet and income statement G/L "
+                "entries are counted with $count and their offset pages are "
+                "fetched this many at a time."
+            ),
+        ),
+        th.Property(
+            "max_requests_per_second",
+            th.NumberType,
+            required=False,
+            description=(
+                "Cap on requests per second sent to the environment, shared "
+                "by all streams and companies. Unlimited when not set."
+            ),
+        ),
+        th.Property(
+            "max_requests_in_flight",
+            th.IntegerType,
+            required=False,
+            default=5,
+            description=(
+                "Maximum concurrent requests to the environment, shared by "
+                "all streams and companies."
+            ),
+        ),
+        th.Property(
+            "page_target_latency",
+            th.NumberType,
+            required=False,
+            default=30,
+            description=(
+                "Target seconds per page request. Page sizes grow while pages "
+                "are faster and shrink when they are slower; the learned size "
+                "is stored per stream and company in the state."
+            ),
+        ),
+        th.Property(
+            "environment_cache_ttl",
+            th.IntegerType,
+            required=False,
+            default=3600,
+            description=(
+                "Seconds the tenant's environment list is cached, in memory "
+                "and on disk, before it is fetched again. 0 disables the "
+                "on-disk cache."
+            ),
+        ),
+        th.Property(
+            "environment_cache_path",
+            th.StringType,
+            required=False,
+            description=(
+                "File used to persist the environment cache between runs. "
+                "Defaults to a per-tenant file in the system temp directory."
+            ),
+        ),
+        th.Property(
+            "api_host",
+            th.StringType,
+            required=False,
+            description=(
+                "Root URL of the Business Central API. Defaults to "
+                "https://api.businesscentral.dynamics.com; meant for stand-in "
+                "servers in tests and benchmarks."
+            ),
+        ),
+        th.Property(
+            "request_timeout",
+            th.IntegerType,
+            required=False,
+            description=(
+                "Seconds to wait for a response before the request times out. "
+                "A timed-out page is retried with half the page size. Defaults "
+                "to 600 (120 for sales invoices)."
+            ),
+        ),
+        th.Property(
+            "select_catalog_fields",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description=(
+                "When true, request only the catalog-selected fields using "
+                "$select (including nested $expand selections) and "
+                "odata.metadata=none."
+            ),
+        ),
+        th.Property(
+            "enable_change_detection",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description=(
+                "When true, the posting-date G/L streams keep a local index of "
+                "the rows they emitted and skip unchanged rows when re-reading "
+                "the report_periods window."
+            ),
+        ),
+        th.Property(
+            "change_detection_dir",
+            th.StringType,
+            required=False,
+            description=(
+                "Directory holding the change-detection indexes. Defaults to a "
+                "directory in the system temp dir."
+            ),
+        ),
+        th.Property(
+            "change_detection_month_precheck",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description=(
+                "When true, skip months of the window whose row count is "
+                "unchanged and that have no rows modified since the last run."
+            ),
+        ),
+        th.Property(
+            "enable_dimension_set_cache",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description=(
+                "When true, G/L entry dimensions are looked up by dimension set "
+                "(via the G_LEntries OData web service) and requested once per "
+                "set instead of once per entry."
+            ),
+        ),
+        th.Property(
+            "dimension_set_cache_size",
+            th.IntegerType,
+            required=False,
+            default=10000,
+            description="Maximum number of dimension sets cached per company.",
+        ),
+        th.Property(
+            "batch_vendor_ledger_lookups",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description=(
+                "When true, vendor ledger entries are fetched for batches of "
+                "G/L document numbers in the background instead of one "
+                "request per document number."
+            ),
+        ),
+        th.Property(
+            "max_filter_length",
+            th.IntegerType,
+            required=False,
+            default=2000,
+            description=(
+                "Maximum URL-encoded length of a batched 'eq ... or ...' $filter."
+            ),
+        ),
+        th.Property(
+            "id_batch_concurrency",
+            th.IntegerType,
+            required=False,
+            default=4,
+            description=(
+                "Number of id batches fetched at once when a dimension "
+                "expansion fails and records are re-fetched by id."
+            ),
+        ),
+        th.Property(
+            "doc_no_dedupe_max_bytes",
+            th.IntegerType,
+            required=False,
+            default=4194304,
+            description=(
+                "Memory cap, per G/L stream and company, of the set of document "
+                "numbers whose vendor ledger entries were already synced."
+            ),
+        ),
+        th.Property(
+            "output_buffer_size",
+            th.IntegerType,
+            required=False,
+            default=0,
+            description=(
+                "Bytes of serialized messages buffered before they are written "
+                "to stdout. STATE and SCHEMA messages always flush the buffer. "
+                "Defaults to 0 (write every message)."
+            ),
+        ),
+        th.Property(
+            "output_flush_interval",
+            th.NumberType,
+            required=False,
+            default=1,
+            description=(
+                "Maximum seconds between two writes of buffered messages to "
+                "stdout while messages keep coming."
+            ),
+        ),
+        th.Property(
+            "output_dir",
+            th.StringType,
+            required=False,
+            description=(
+                "When set, records are written to compressed files under this "
+                "directory and stdout only carries SCHEMA, BATCH and STATE messages."
+            ),
+        ),
+        th.Property(
+            "output_format",
+            th.StringType,
+            required=False,
+            default="jsonl",
+            description=(
+                "Format of the output_dir files: 'jsonl' (gzip-compressed) or "
+                "'parquet' (requires pyarrow)."
+            ),
+        ),
+        th.Property(
+            "output_partition_by_company",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description="When true, each company of a stream is written to its own files.",
+        ),
+        th.Property(
+            "output_max_file_size",
+            th.IntegerType,
+            required=False,
+            default=134217728,
+            description=(
+                "Size in bytes at which the output_dir files are finished and "
+                "announced with BATCH messages before new ones are started."
+            ),
+        ),
+        th.Property(
+            "output_writer_concurrency",
+            th.IntegerType,
+            required=False,
+            default=4,
+            description="Number of threads compressing and writing output_dir files.",
+        ),
+        th.Property(
+            "output_commit_interval",
+            th.NumberType,
+            required=False,
+            default=300,
+            description=(
+                "Maximum seconds between two checkpoints of the output_dir files. "
+                "STATE messages are only written at checkpoints."
+            ),
+        ),
+        th.Property(
+            "request_metrics_prometheus_path",
+            th.StringType,
+            required=False,
+            description=(
+                "Write per-stream and per-company request counts, retries, "
+                "bytes and latency quantiles to this Prometheus textfile."
+            ),
+        ),
+        th.Property(
+            "request_metrics_summary_path",
+            th.StringType,
+            required=False,
+            description=(
+                "Write a JSON summary of the run's requests, with p50/p95/p99 "
+                "latencies per stream and company, to this file."
+            ),
+        ),
+        th.Property(
+            "request_metrics_write_interval",
+            th.NumberType,
+            required=False,
+            default=60,
+            description=(
+                "Seconds between two rewrites of the request metrics files; "
+                "they are also written when the tap exits."
+            ),
+        ),
         th.Property(
             "enable_odata_discovery",
             th.BooleanType,
@@ -204,9 +535,17 @@ class TapdynamicsBc(Tap):
             include_prefixes=include_prefixes,
             exclude_prefixes=exclude_prefixes,
             skip_names=skip_names,
+            helper_stream=streams[0],
         )
         return streams + dynamic_streams
 
+    def sync_all(self) -> None:
+        """Sync all streams, then finish the output_dir files and write the last STATE."""
+        try:
+            super().sync_all()
+        finally:
+            close_file_sink()
+
 
 if __name__ == "__main__":
     TapdynamicsBc.cli()
@@ -0,0 +1,54 @@
+"""Shared fixtures of the tap's unit tests."""
+
+import json
+
+import pytest
+import requests
+
+from tap_dynamics_bc.tap import TapdynamicsBc
+
+CONFIG = {
+    "client_id": "test",
+    "client_secret": "test",
+    "environment_name": "Production",
+    "start_date": "2023-01-01T00:00:00Z",
+    # A token that is still valid, so requests can be prepared offline.
+    "refresh_token": "test",
+    "redirect_uri": "https://localhost",
+    "access_token": "test",
+    "access_token_expires_at": 4102444800,
+}
+
+
+def page(rows, **payload):
+    """Return a response whose JSON payload is ``{"value": rows, **payload}``."""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps({"value": rows, **payload}).encode("utf-8")
+    return response
+
+
+def deselect(catalog, stream_name, *properties):
+    """Return ``catalog`` with ``properties`` of ``stream_name`` deselected."""
+    for entry in catalog["streams"]:
+        if entry["tap_stream_id"] != stream_name:
+            continue
+        for metadata in entry["metadata"]:
+            breadcrumb = metadata["breadcrumb"]
+            if not breadcrumb:
+                metadata["metadata"]["selected"] = True
+            elif breadcrumb[-1] in properties:
+                metadata["metadata"]["selected"] = False
+    return catalog
+
+
+@pytest.fixture
+def make_tap(tmp_path):
+    """Return a factory of taps built offline from ``CONFIG`` plus settings."""
+
+    def make(state=None, catalog=None, **settings):
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps({**CONFIG, **settings}))
+        return TapdynamicsBc(config=[str(config_path)], catalog=catalog, state=state)
+
+    return make
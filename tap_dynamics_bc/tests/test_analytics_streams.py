@@ -0,0 +1,60 @@
+"""Tests of the analytics G/L streams' offset and key paging."""
+
+import datetime
+from urllib.parse import parse_qs, urlsplit
+
+from tap_dynamics_bc.tests.conftest import page
+
+CONTEXT = {"company_id": "c1", "company_name": "CRONUS"}
+
+
+def analytics_stream(make_tap, monkeypatch, tmp_path, total):
+    tap = make_tap(
+        analytics_page_concurrency=2,
+        enable_change_detection=True,
+        change_detection_dir=str(tmp_path / "fingerprints"),
+    )
+    stream = tap.streams["balance_sheet_general_ledger_entries"]
+    stream.__dict__["url_base"] = "https://bc.test/analytics"
+    # Posted in the current month, inside the change-detection window.
+    posted = datetime.date.today().replace(day=1).strftime("%Y-%m-%dT00:00:00Z")
+    rows = [
+        {"entryNo": number, "postingDate": posted, "amount": 1.0}
+        for number in range(1, total + 1)
+    ]
+
+    def call_api(url):
+        query = parse_qs(urlsplit(url).query)
+        skip, top = int(query["$skip"][0]), int(query["$top"][0])
+        return page(rows[skip:skip + top])
+
+    continuations = []
+
+    def iter_pages(context):
+        continuations.append(stream.get_url_params(context, None)["$filter"])
+        yield page([])
+
+    monkeypatch.setattr(stream, "_fetch_count", lambda context, filter_clause: total)
+    monkeypatch.setattr(stream, "_call_api", call_api)
+    monkeypatch.setattr(stream, "_iter_pages", iter_pages)
+    return stream, continuations
+
+
+def sync_partition(stream):
+    """Iterate the partition's records and advance the state, as the SDK does."""
+    records = []
+    for record in stream.get_records(CONTEXT):
+        stream._increment_stream_state(record, context=CONTEXT)
+        records.append(record)
+    return records
+
+
+def test_key_paging_continues_after_the_last_fetched_row(make_tap, monkeypatch, tmp_path):
+    stream, continuations = analytics_stream(make_tap, monkeypatch, tmp_path, total=2500)
+
+    assert len(sync_partition(stream)) == 2500
+    # Every row is unchanged on the second run and none is written.
+    assert sync_partition(stream) == []
+
+    assert len(continuations) == 2
+    assert all(continuation.endswith("(entryNo gt 2500)") for continuation in continuations)
@@ -0,0 +1,91 @@
+"""Tests of the time-sliced backfill planner."""
+
+import datetime
+from itertools import pairwise
+
+from tap_dynamics_bc.backfill import MIN_WINDOW, BackfillWindow, split_range, window_filter
+
+CONTEXT = {"company_id": "c1", "company_name": "CRONUS"}
+UTC = datetime.timezone.utc
+
+
+def parse(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=UTC)
+
+
+def test_split_range():
+    start = datetime.datetime(2024, 1, 1, tzinfo=UTC)
+    bounds = split_range(start, start + datetime.timedelta(days=70), 30)
+    assert [(upper - lower).days for lower, upper in bounds] == [30, 30, 10]
+
+
+def test_window_filter():
+    first = BackfillWindow(start="2024-01-01T00:00:00Z", end="2024-02-01T00:00:00Z", first=True)
+    last = BackfillWindow(start="2024-02-01T00:00:00Z", end=None, first=False)
+    assert window_filter("lastModifiedDateTime", "(a) or (b)", first) == (
+        "((a) or (b)) and (lastModifiedDateTime le 2024-02-01T00:00:00Z)"
+    )
+    assert window_filter("lastModifiedDateTime", "(a) or (b)", last) == (
+        "lastModifiedDateTime gt 2024-02-01T00:00:00Z"
+    )
+
+
+def test_plan_splits_dense_windows_by_count(make_tap, monkeypatch):
+    stream = make_tap(
+        backfill_concurrency=4, backfill_window_days=30, backfill_max_window_records=5000
+    ).streams["customers"]
+    now = datetime.datetime.now(UTC).replace(microsecond=0)
+    start = now - datetime.timedelta(days=200)
+    # 10 rows a day, plus a burst of 40,000 rows modified at one instant.
+    burst = now - datetime.timedelta(days=100)
+
+    def count_window(context, window):
+        lower, upper = parse(window["start"]), parse(window["end"])
+        count = int(10 * (upper - lower).total_seconds() / 86400)
+        if lower < burst <= upper:
+            count += 40000
+        return count
+
+    monkeypatch.setattr(stream, "_count_window", count_window)
+
+    windows = stream._plan_backfill(CONTEXT, start)
+
+    assert windows[0]["first"] and not any(window["first"] for window in windows[1:])
+    assert windows[-1]["end"] is None
+    bounds = [
+        (parse(window["start"]), parse(window["end"]) if window["end"] else now)
+        for window in windows
+    ]
+    assert bounds[0][0] == start
+    # Contiguous, without gaps or overlaps.
+    for (_, upper), (lower, _) in pairwise(bounds):
+        assert upper == lower
+    # The 30-day window holding the burst was halved down to the minimum span.
+    assert len(windows) > 7
+    dense = [(lower, upper) for lower, upper in bounds if lower < burst <= upper]
+    assert len(dense) == 1
+    assert dense[0][1] - dense[0][0] <= MIN_WINDOW
+    assert all(
+        count_window(CONTEXT, window) <= 5000
+        for window in windows[:-1]
+        if (parse(window["start"]), parse(window["end"])) not in dense
+    )
+
+
+def test_plan_is_resumed_from_the_state(make_tap, monkeypatch):
+    stream = make_tap(backfill_concurrency=4).streams["customers"]
+    start = datetime.datetime.now(UTC).replace(microsecond=0) - datetime.timedelta(days=400)
+    monkeypatch.setattr(stream, "_backfill_start", lambda context: start)
+    monkeypatch.setattr(stream, "_count_window", lambda context, window: 1)
+
+    plan = stream._get_backfill_plan(CONTEXT)
+    plan["completed"].append(0)
+    monkeypatch.setattr(
+        stream, "_plan_backfill", lambda context, start: (_ for _ in ()).throw(AssertionError)
+    )
+    assert stream._get_backfill_plan(CONTEXT) is plan
+
+    # Caught up: the finished plan is dropped from the state.
+    monkeypatch.setattr(stream, "_backfill_start", lambda context: None)
+    assert stream._get_backfill_plan(CONTEXT) is None
+    assert "backfill" not in stream.stream_state
@@ -0,0 +1,40 @@
+"""Tests of the batched OData filter helpers."""
+
+import re
+
+import pytest
+
+from tap_dynamics_bc.batching import eq_clause, escape_literal, iter_by_ids, or_filter
+
+_LITERAL_RE = re.compile(r"'((?:[^']|'')*)'")
+
+
+def odata_literals(filter_clause):
+    """Return the string literals of ``filter_clause`` as OData reads them."""
+    return [literal.replace("''", "'") for literal in _LITERAL_RE.findall(filter_clause)]
+
+
+@pytest.mark.parametrize("value", ["D-1", "O'Brien", "O''Brien", "'", "''", "a'''b", "it's'"])
+def test_string_literals_round_trip(value):
+    assert odata_literals(eq_clause("Document_No", value)) == [value]
+
+
+def test_or_filter_round_trips_every_value():
+    values = ["O'Brien", "O''Brien", "plain"]
+    assert odata_literals(or_filter("Document_No", values)) == values
+
+
+def test_escape_literal_doubles_every_quote():
+    assert escape_literal("O''Brien") == "O''''Brien"
+
+
+def test_iter_by_ids_reports_missing_ids():
+    missing = []
+
+    def fetch(batch):
+        return [{"id": record_id} for record_id in batch if record_id != "b"]
+
+    records = iter_by_ids(fetch, fetch, ["a", "b", "c"], on_missing=missing.extend)
+
+    assert [record["id"] for record in records] == ["a", "c"]
+    assert missing == ["b"]
@@ -0,0 +1,87 @@
+"""Tests of the output_dir file sink."""
+
+import gzip
+import json
+from urllib.parse import urlsplit
+
+import pytest
+import singer
+from hotglue_singer_sdk import Tap
+
+from tap_dynamics_bc import file_sink
+from tap_dynamics_bc.file_sink import FileSink, close_file_sink, get_file_sink
+from tap_dynamics_bc.output import MessageWriter
+
+SCHEMA = {"properties": {"id": {"type": ["integer"]}, "name": {"type": ["string", "null"]}}}
+
+
+def output_messages(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def read_manifest(batch):
+    rows = []
+    for uri in batch["manifest"]:
+        with gzip.open(urlsplit(uri).path, "rb") as data:
+            rows.extend(json.loads(line) for line in data)
+    return rows
+
+
+def test_close_finishes_files_then_writes_batch_and_state(tmp_path, capsys, monkeypatch):
+    # Several chunks per file, some of them written by the pool.
+    monkeypatch.setattr(file_sink, "CHUNK_SIZE", 256)
+    sink = FileSink(MessageWriter(), str(tmp_path), commit_interval=3600)
+    for index in range(1000):
+        sink.write("items", {"id": index, "name": f"item {index}"}, SCHEMA)
+    sink.write_state(singer.StateMessage(value={"bookmarks": {"items": {"id": 999}}}))
+    assert [message["type"] for message in output_messages(capsys)] == []
+
+    sink.close()
+
+    messages = output_messages(capsys)
+    assert [message["type"] for message in messages] == ["BATCH", "STATE"]
+    assert messages[0]["stream"] == "items"
+    assert read_manifest(messages[0]) == [
+        {"id": index, "name": f"item {index}"} for index in range(1000)
+    ]
+    assert messages[1]["value"] == {"bookmarks": {"items": {"id": 999}}}
+
+
+def test_sync_all_closes_the_sink(tmp_path, capsys, monkeypatch, make_tap):
+    def sync_all(tap):
+        sink = get_file_sink(tap.config, MessageWriter())
+        for index in range(10):
+            sink.write("items", {"id": index, "name": None}, SCHEMA)
+        sink.write_state(singer.StateMessage(value={"bookmarks": {}}))
+
+    monkeypatch.setattr(Tap, "sync_all", sync_all)
+    try:
+        make_tap(output_dir=str(tmp_path / "out")).sync_all()
+    finally:
+        close_file_sink()
+
+    messages = [
+        message for message in output_messages(capsys) if message["type"] != "SCHEMA"
+    ]
+    assert [message["type"] for message in messages] == ["BATCH", "STATE"]
+    assert len(read_manifest(messages[0])) == 10
+    assert file_sink._sink is None
+
+
+def test_file_is_closed_when_its_writer_fails(tmp_path, monkeypatch):
+    opened = []
+
+    def tracking_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+
+    def failing_gzip_file(**kwargs):
+        raise OSError("no space left")
+
+    monkeypatch.setattr(file_sink, "open", tracking_open, raising=False)
+    monkeypatch.setattr(file_sink.gzip, "GzipFile", failing_gzip_file)
+
+    with pytest.raises(OSError, match="no space left"):
+        file_sink._JsonlFile(str(tmp_path / "items.jsonl.gz"), SCHEMA)
+
+    assert [raw.closed for raw in opened] == [True]
@@ -0,0 +1,106 @@
+"""Tests of the change-detection fingerprint index."""
+
+import datetime
+from urllib.parse import unquote_plus
+
+from tap_dynamics_bc.fingerprints import FingerprintIndex, posting_month, window_months
+from tap_dynamics_bc.serialization import write_json_atomic
+
+
+def month_rows(month, count=100):
+    """Return ``count`` rows posted in ``month`` (``YYYYMM``) with unique keys."""
+    date = f"{month // 100}-{month % 100:02d}-15"
+    return [
+        {"id": f"{month}-{number}", "postingDate": date, "amount": number}
+        for number in range(count)
+    ]
+
+
+def add_months(month, count):
+    year, index = divmod(month // 100 * 12 + month % 100 - 1 + count, 12)
+    return year * 100 + index + 1
+
+
+def record(index, rows):
+    return [
+        index.changed(row["id"], row, posting_month(row["postingDate"])) for row in rows
+    ]
+
+
+def test_posting_month():
+    assert posting_month("2024-03-31T23:59:59Z") == 202403
+    assert posting_month(datetime.date(2024, 12, 1)) == 202412
+    assert posting_month(None) == 0
+
+
+def test_unchanged_rows_are_detected_after_a_reload(tmp_path):
+    path = str(tmp_path / "index.bin")
+    rows = month_rows(202401) + month_rows(202402)
+    index = FingerprintIndex()
+    assert all(record(index, rows))
+    index.save(path)
+
+    index = FingerprintIndex.load(path)
+    rows[3] = dict(rows[3], amount=-1)
+    assert record(index, rows) == [position == 3 for position in range(len(rows))]
+
+
+def test_index_size_follows_the_window(tmp_path):
+    path = str(tmp_path / "index.bin")
+    report_periods = 3
+    first = 202301
+    sizes = []
+    for run in range(24):
+        window = [add_months(first, run + back) for back in range(report_periods)]
+        index = FingerprintIndex.load(path)
+        for month in window:
+            record(index, month_rows(month))
+        index.save(path, keep_since=window[0])
+        sizes.append(len(FingerprintIndex.load(path)))
+
+    assert sizes[0] == 300
+    assert max(sizes) == 300
+    assert set(FingerprintIndex.load(path).months) == {202412, 202501, 202502}
+
+
+def test_month_precheck_batches_counts_and_skips_unindexed_months(make_tap, tmp_path, monkeypatch):
+    tap = make_tap(
+        enable_change_detection=True,
+        change_detection_month_precheck=True,
+        change_detection_dir=str(tmp_path),
+        report_periods=3,
+    )
+    stream = tap.streams["general_ledger_entries"]
+    stream.__dict__["url_base"] = "https://bc.test/api/v2.0"
+    context = {"company_id": "c1", "company_name": "CRONUS"}
+    path = stream._fingerprint_path(context)
+    months = window_months(3)
+    write_json_atomic(
+        f"{path}.months.json",
+        {
+            month.strftime("%Y-%m"): {"count": 100, "checked_at": "2024-01-01T00:00:00Z"}
+            for month in months
+        },
+    )
+    # The last month's rows are not in the index.
+    index = FingerprintIndex()
+    for month in months[:2]:
+        record(index, month_rows(posting_month(month)))
+    index.save(path)
+
+    batches = []
+
+    def call_api_batch(urls):
+        batches.append(urls)
+        return [100] * len(urls) if len(batches) == 1 else [0, 4]
+
+    monkeypatch.setattr(stream, "_call_api_batch", call_api_batch)
+
+    changed, counts = stream._precheck_months(context, path, FingerprintIndex.load(path))
+
+    assert [len(urls) for urls in batches] == [3, 2]
+    assert all(
+        "lastModifiedDateTime gt 2024-01-01T00:00:00Z" in unquote_plus(url) for url in batches[1]
+    )
+    assert changed == months[1:]
+    assert set(counts) == {month.strftime("%Y-%m") for month in months}
@@ -0,0 +1,103 @@
+"""Tests of the G/L entry streams' vendor ledger lookups."""
+
+import pytest
+
+from tap_dynamics_bc.tests.conftest import page
+
+CONTEXT = {"company_id": "c1", "company_name": "CRONUS"}
+# Two backfill windows sharing document numbers.
+WINDOW_ROWS = {
+    "2023-01-01T00:00:00Z": [("e1", "D1"), ("e2", "D1"), ("e3", "D2")],
+    "2023-02-01T00:00:00Z": [("e4", "D2"), ("e5", "D3"), ("e6", "D1")],
+}
+
+
+def gl_row(entry_id, document_number):
+    return {"id": entry_id, "documentNumber": document_number, "lastModifiedDateTime": None}
+
+
+@pytest.fixture
+def backfilling_stream(make_tap, monkeypatch):
+    """Return a factory of G/L incremental streams that take the backfill path."""
+
+    def make(**settings):
+        tap = make_tap(backfill_concurrency=2, **settings)
+        stream = tap.streams["general_ledger_entries_incremental"]
+        plan = {
+            "start": "2023-01-01T00:00:00Z",
+            "windows": [
+                {"start": start, "end": None, "first": index == 0}
+                for index, start in enumerate(WINDOW_ROWS)
+            ],
+            "completed": [],
+        }
+        monkeypatch.setattr(stream, "_get_backfill_plan", lambda context: plan)
+
+        def iter_pages(context):
+            rows = WINDOW_ROWS[context["backfill_window"]["start"]]
+            yield page([gl_row(*row) for row in rows])
+
+        monkeypatch.setattr(stream, "_iter_pages", iter_pages)
+        children = next(
+            child for child in stream.child_streams if child.name == "vendor_ledger_entries"
+        )
+        synced = []
+        monkeypatch.setattr(children, "sync", lambda context: synced.append(context))
+        metrics = []
+        monkeypatch.setattr(
+            stream, "_write_metric_log", lambda metric, extra_tags: metrics.append(metric)
+        )
+        return stream, synced, metrics
+
+    return make
+
+
+def sync_partition(stream):
+    """Iterate the partition's records and sync their children, as the SDK does."""
+    records = []
+    for record in stream.get_records(CONTEXT):
+        stream._sync_children(stream.get_child_context(record, CONTEXT))
+        records.append(record)
+    return records
+
+
+def test_backfill_syncs_each_document_number_once(backfilling_stream):
+    stream, synced, metrics = backfilling_stream()
+
+    records = sync_partition(stream)
+
+    assert len(records) == 6
+    assert sorted(context["gl_doc_no"] for context in synced) == ["D1", "D2", "D3"]
+    assert [metric["metric"] for metric in metrics] == ["doc_no_dedupe"]
+    assert metrics[0]["tags"]["entries"] == 3
+    assert stream._synced_doc_nos == {}
+
+
+def test_backfill_batches_vendor_ledger_lookups(backfilling_stream):
+    stream, synced, metrics = backfilling_stream(batch_vendor_ledger_lookups=True)
+
+    sync_partition(stream)
+
+    assert [context["gl_doc_nos"] for context in synced] == [["D1", "D2", "D3"]]
+    assert synced[0]["company_id"] == "c1"
+    assert [metric["metric"] for metric in metrics] == ["doc_no_dedupe"]
+    assert metrics[0]["tags"]["entries"] == 3
+    assert stream._doc_no_batchers == {}
+
+
+def test_failed_partition_cancels_batched_lookups(backfilling_stream, monkeypatch):
+    stream, synced, metrics = backfilling_stream(batch_vendor_ledger_lookups=True)
+
+    def iter_pages(context):
+        yield page([gl_row("e1", "D1")])
+        raise RuntimeError("page failed")
+
+    monkeypatch.setattr(stream, "_iter_pages", iter_pages)
+
+    with pytest.raises(RuntimeError, match="page failed"):
+        sync_partition(stream)
+
+    assert synced == []
+    assert [metric["metric"] for metric in metrics] == ["doc_no_dedupe"]
+    assert stream._doc_no_batchers == {}
+    assert stream._synced_doc_nos == {}
@@ -0,0 +1,169 @@
+"""Tests of the OData $batch request builder and reply parser."""
+
+import json
+
+import pytest
+import requests
+
+from tap_dynamics_bc.odata_batch import (
+    MAX_BATCH_REQUESTS,
+    BatchItemResult,
+    build_batch_payload,
+    chunked,
+    is_retriable_item,
+    parse_batch_response,
+)
+
+SERVICE_ROOT = "https://bc.test/v2.0/tenant/Production/api/v2.0"
+
+
+def reply(body, content_type):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = content_type
+    response._content = body.encode("utf-8") if isinstance(body, str) else body
+    response.encoding = "utf-8"
+    return response
+
+
+def test_build_batch_payload_uses_relative_urls_and_positional_ids():
+    payload = build_batch_payload(
+        [f"{SERVICE_ROOT}/companies(1)/items", "https://elsewhere.test/x"], SERVICE_ROOT
+    )
+    assert [(item["id"], item["method"], item["url"]) for item in payload["requests"]] == [
+        ("0", "GET", "companies(1)/items"),
+        ("1", "GET", "https://elsewhere.test/x"),
+    ]
+
+
+def test_build_batch_payload_rejects_oversized_batches():
+    with pytest.raises(ValueError):
+        build_batch_payload(["x"] * (MAX_BATCH_REQUESTS + 1), SERVICE_ROOT)
+    assert [len(chunk) for chunk in chunked(list(range(250)))] == [100, 100, 50]
+
+
+def test_parse_json_batch():
+    body = {
+        "responses": [
+            {"id": "0", "status": 200, "body": {"value": [{"id": "a"}]}},
+            {"id": "1", "status": 404, "body": {"error": {"code": "NotFound"}}},
+            {"id": "2", "status": 200, "body": "42"},
+        ]
+    }
+    items = parse_batch_response(reply(json.dumps(body), "application/json"))
+    assert items["0"] == {"id": "0", "status": 200, "body": {"value": [{"id": "a"}]}}
+    assert items["1"]["status"] == 404
+    assert items["2"]["body"] == 42
+
+
+MULTIPART = (
+    "--batchresponse_1\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-Transfer-Encoding: binary\r\n"
+    "Content-ID: 0\r\n"
+    "\r\n"
+    "HTTP/1.1 200 OK\r\n"
+    "Content-Type: application/json\r\n"
+    "\r\n"
+    '{"value": [{"id": "a"}]}\r\n'
+    "--batchresponse_1\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-ID: 1\r\n"
+    "\r\n"
+    "HTTP/1.1 429 Too Many Requests\r\n"
+    "Content-Type: application/json\r\n"
+    "\r\n"
+    '{"error": {"code": "Application_TooManyRequests"}}\r\n'
+    "--batchresponse_1\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-ID: 2\r\n"
+    "\r\n"
+    "HTTP/1.1 400 Bad Request\r\n"
+    "Content-Type: application/json\r\n"
+    "\r\n"
+    '{"error": {"message": "Dimension Value does not exist."}}\r\n'
+    "--batchresponse_1\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-ID: 3\r\n"
+    "\r\n"
+    "HTTP/1.1 204 No Content\r\n"
+    "\r\n"
+    "\r\n"
+    "--batchresponse_1--\r\n"
+)
+
+
+def test_parse_multipart_batch_with_failed_items():
+    items = parse_batch_response(
+        reply(MULTIPART, 'multipart/mixed; boundary="batchresponse_1"')
+    )
+    assert sorted(items) == ["0", "1", "2", "3"]
+    assert items["0"]["body"] == {"value": [{"id": "a"}]}
+    assert items["1"]["status"] == 429
+    assert items["1"]["body"] == {"error": {"code": "Application_TooManyRequests"}}
+    assert items["2"]["status"] == 400
+    assert items["3"] == {"id": "3", "status": 204, "body": None}
+
+
+def test_parse_multipart_batch_without_content_ids_uses_positions():
+    text = MULTIPART.replace("Content-ID: ", "X-Part: ")
+    items = parse_batch_response(reply(text, "multipart/mixed; boundary=batchresponse_1"))
+    assert [items[str(index)]["status"] for index in range(4)] == [200, 429, 400, 204]
+
+
+def test_parse_multipart_batch_requires_a_boundary():
+    with pytest.raises(ValueError):
+        parse_batch_response(reply(MULTIPART, "multipart/mixed"))
+
+
+@pytest.mark.parametrize(
+    "item, retriable",
+    [
+        (None, True),
+        (BatchItemResult(id="0", status=200, body={}), False),
+        (BatchItemResult(id="0", status=429, body=None), True),
+        (BatchItemResult(id="0", status=503, body="Service Unavailable"), True),
+        (
+            BatchItemResult(
+                id="0", status=400, body={"error": {"message": "Please try again later."}}
+            ),
+            True,
+        ),
+        (
+            BatchItemResult(
+                id="0", status=400, body={"error": {"message": "Dimension Value does not exist."}}
+            ),
+            False,
+        ),
+        (BatchItemResult(id="0", status=404, body=None), False),
+    ],
+)
+def test_is_retriable_item(item, retriable):
+    assert is_retriable_item(item) is retriable
+
+
+def test_call_api_batch_retries_only_transient_failures(make_tap, monkeypatch):
+    stream = make_tap().streams["items"]
+    items = parse_batch_response(
+        reply(MULTIPART, 'multipart/mixed; boundary="batchresponse_1"')
+    )
+    retried = []
+
+    def call_api_or_none(url):
+        retried.append(url)
+        return {"retried": url}
+
+    monkeypatch.setattr(stream, "_post_batch", lambda urls: items)
+    monkeypatch.setattr(stream, "_call_api_or_none", call_api_or_none)
+
+    results = stream._call_api_batch(["u0", "u1", "u2", "u3", "u4"])
+
+    # u1 was throttled and u4 is missing from the reply; u2 failed for good.
+    assert retried == ["u1", "u4"]
+    assert results == [
+        {"value": [{"id": "a"}]},
+        {"retried": "u1"},
+        None,
+        None,
+        {"retried": "u4"},
+    ]
@@ -0,0 +1,62 @@
+"""Tests of the adaptive page-size controller."""
+
+from tap_dynamics_bc.page_size import MAX_PAGE_SIZE, MIN_PAGE_SIZE, PageSizeController
+from tap_dynamics_bc.tests.conftest import page
+
+CONTEXT = {"company_id": "c1", "company_name": "CRONUS"}
+
+
+def test_fast_full_pages_grow_additively_up_to_the_maximum():
+    controller = PageSizeController(1000, target_latency=10)
+    assert controller.observe(1000, 1000, 1.0, 1000) == 1250
+    assert controller.observe(1250, 1250, 1.0, 1250) == 1500
+    for _ in range(200):
+        controller.observe(controller.page_size, controller.page_size, 1.0, 1000)
+    assert controller.page_size == MAX_PAGE_SIZE
+
+
+def test_partial_or_moderately_slow_pages_keep_the_size():
+    controller = PageSizeController(1000, target_latency=10)
+    # The last page of a partition is not full.
+    assert controller.observe(1000, 400, 1.0, 400) == 1000
+    # Under the target, but not fast enough to grow.
+    assert controller.observe(1000, 1000, 6.0, 1000) == 1000
+
+
+def test_slow_pages_shrink_in_proportion_by_at_most_half():
+    controller = PageSizeController(1000, target_latency=10)
+    assert controller.observe(1000, 1000, 12.5, 1000) == 800
+    assert controller.observe(800, 800, 100.0, 800) == 400
+
+
+def test_timeouts_halve_down_to_the_minimum():
+    controller = PageSizeController(40, target_latency=10)
+    assert controller.on_timeout()
+    assert controller.page_size == 20
+    assert controller.on_timeout()
+    assert controller.page_size == MIN_PAGE_SIZE
+    assert not controller.on_timeout()
+    assert controller.page_size == MIN_PAGE_SIZE
+
+
+def test_response_size_caps_the_page():
+    controller = PageSizeController(1000, target_latency=10, target_bytes=100_000)
+    # 200 bytes per row: at most 500 rows fit the byte budget.
+    assert controller.observe(1000, 1000, 1.0, 200_000) == 500
+
+
+def test_learned_sizes_are_persisted_per_company(make_tap):
+    stream = make_tap(page_target_latency=10).streams["items"]
+    controller = stream.get_page_size_controller(CONTEXT)
+    start = controller.page_size
+    rows = [{"id": str(number)} for number in range(start)]
+    stream._observe_page(CONTEXT, start, page(rows), 1.0)
+
+    learned = controller.page_size
+    assert learned > start
+    assert stream.stream_state["page_sizes"] == {"c1": learned}
+
+    state = {"bookmarks": {"items": {"page_sizes": {"c1": learned}}}}
+    resumed = make_tap(state=state, page_target_latency=10).streams["items"]
+    assert resumed.get_page_size_controller(CONTEXT).page_size == learned
+    assert resumed.get_page_size_controller({"company_id": "c2"}).page_size == start
@@ -0,0 +1,43 @@
+"""Tests of requests projected with ``select_catalog_fields``."""
+
+from urllib.parse import parse_qs, urlsplit
+
+from tap_dynamics_bc.tests.conftest import deselect
+
+CONTEXT = {"company_id": "c1", "company_name": "CRONUS"}
+
+
+def projected_stream(make_tap, name, *deselected):
+    catalog = deselect(make_tap().catalog_dict, name, *deselected)
+    stream = make_tap(catalog=catalog, select_catalog_fields=True).streams[name]
+    stream.__dict__["url_base"] = "https://bc.test/api/v2.0"
+    return stream
+
+
+def query(url):
+    return parse_qs(urlsplit(url).query)
+
+
+def test_gl_id_lookup_replaces_the_projection(make_tap, monkeypatch):
+    stream = projected_stream(make_tap, "general_ledger_entries", "description")
+    prepared_request = stream.prepare_request(CONTEXT, None)
+    assert "$select" in query(prepared_request.url)
+    assert "$expand" in query(prepared_request.url)
+
+    urls = []
+    monkeypatch.setattr(stream, "_call_api", urls.append)
+    stream._fetch_gl_ids(prepared_request)
+
+    ids_query = query(urls[0])
+    assert ids_query["$select"] == ["id"]
+    assert "$expand" not in ids_query
+    assert ids_query["$filter"] == query(prepared_request.url)["$filter"]
+
+
+def test_gl_entries_keep_the_dimension_set_cache_keys(make_tap):
+    stream = projected_stream(
+        make_tap, "general_ledger_entries", "entryNumber", "documentNumber", "description"
+    )
+    selected = query(stream.prepare_request(CONTEXT, None).url)["$select"][0].split(",")
+    assert {"entryNumber", "documentNumber"} <= set(selected)
+    assert "description" not in selected
@@ -0,0 +1,82 @@
+"""Tests of the per-environment request scheduler."""
+
+import email.utils
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tap_dynamics_bc.scheduler import (
+    MAX_RETRY_AFTER,
+    RequestScheduler,
+    get_scheduler,
+    parse_retry_after,
+)
+
+
+def test_slots_cap_requests_in_flight():
+    scheduler = RequestScheduler(max_in_flight=3)
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def request(_):
+        nonlocal in_flight, peak
+        with scheduler.slot():
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(request, range(30)))
+
+    assert peak == 3
+
+
+def test_token_bucket_limits_the_rate_after_the_burst():
+    scheduler = RequestScheduler(requests_per_second=50, max_in_flight=10)
+    started = time.monotonic()
+    for _ in range(60):
+        with scheduler.slot():
+            pass
+    # 50 tokens are available at once, the next 10 arrive at 50 per second.
+    assert 0.15 <= time.monotonic() - started < 1.0
+
+
+def test_pause_holds_every_request():
+    scheduler = RequestScheduler(max_in_flight=2)
+    scheduler.pause(0.2)
+    started = time.monotonic()
+    with scheduler.slot():
+        pass
+    assert time.monotonic() - started >= 0.19
+
+
+def test_pause_is_capped():
+    scheduler = RequestScheduler()
+    scheduler.pause(10 * MAX_RETRY_AFTER)
+    assert scheduler._paused_until - time.monotonic() <= MAX_RETRY_AFTER
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("7", 7.0), (" 1.5 ", 1.5), ("-3", 0.0), ("", None), (None, None), ("soon", None)],
+)
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    value = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= parse_retry_after(value) <= 30
+
+
+def test_environments_share_one_scheduler():
+    environment = ("tenant-test", "Sandbox-scheduler-test")
+    first = get_scheduler(environment, requests_per_second=5, max_in_flight=2)
+    assert get_scheduler(environment, requests_per_second=100) is first
+    assert first.requests_per_second == 5
+    assert get_scheduler(("tenant-test", "Other-scheduler-test")) is not first